@@ -5,12 +5,30 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+
+Deployment profile, for the async views (`orders.async_views`, under /delivery/async/) :
+
+    gunicorn grofers.asgi:application -k uvicorn.workers.UvicornWorker --workers <cores> --timeout 30
+
+- A worker holds its requests in flight on one event loop; the blocking work of the async views runs on
+  `ORDERS_ASYNC`'s threads. Synchronous views still take a thread each (Django's single sync thread,
+  per worker) : keep them on the WSGI deployment (`grofers.wsgi`, `gunicorn -k gthread --threads <n>`).
+- Each worker opens up to the database's `POOL['MAX_SIZE']` connections, shared by its threads (see
+  `grofers.db.pool`) : workers * MAX_SIZE must stay under the database's connection limit, and MAX_SIZE
+  should cover `ORDERS_ASYNC['DB_WORKERS']`, so that the async views do not wait for connections.
+- `python manage.py benchmark_asgi` compares both paths in process, against the configured database.
 """
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grofers.settings')
 
 application = get_asgi_application()
+
+if settings.ORDERS_WARM_FLEET_CACHE:
+    from orders import fleet
+
+    fleet.warm()
@@ -0,0 +1,83 @@
+"""PostgreSQL backend whose connections come from a process-level pool (see `grofers.db.pool`)
+
+Opening a Django connection checks one out of the pool, closing it gives it back : keep `CONN_MAX_AGE` at 0,
+so that every request (and every unit of work of the async views) returns its connection. The pool is
+configured by the database's `POOL` settings :
+    'MAX_SIZE' : connections open at most, per process
+    'TIMEOUT' : seconds a connection is waited for, once they are all checked out
+    'HEALTH_CHECK_INTERVAL' : seconds a connection may stay idle before `SELECT 1` checks it again
+    'MAX_AGE' : seconds a connection is used for before being replaced, forever if None
+Session state set on a connection (eg : `SET ...`) outlives its checkout; open transactions do not.
+"""
+
+import functools
+
+import psycopg2
+from django.db.backends.postgresql import base
+
+from grofers.db import pool
+
+from .creation import DatabaseCreation
+
+DEFAULT_POOL = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 5.0,
+    'HEALTH_CHECK_INTERVAL': 30.0,
+    'MAX_AGE': None,
+}
+
+
+def check(connection):
+    """Returns whether a psycopg2 connection still reaches the server"""
+
+    if connection.closed:
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    reset(connection)
+
+    return True
+
+
+def reset(connection):
+    """Rolls back the transaction a psycopg2 connection was returned in, if any"""
+
+    if connection.closed:
+        raise psycopg2.InterfaceError("connection already closed")
+    if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        """Returns the process' pool for this database and connection parameters
+
+        :rtype: `ConnectionPool`
+        """
+
+        config = {**DEFAULT_POOL, **self.settings_dict.get('POOL', {})}
+        key = (self.alias, tuple(sorted((name, repr(value)) for name, value in conn_params.items())))
+
+        return pool.get_pool(key, lambda: pool.ConnectionPool(
+            functools.partial(base.DatabaseWrapper.get_new_connection, self, conn_params),
+            check=check, reset=reset, max_size=config['MAX_SIZE'], timeout=config['TIMEOUT'],
+            health_check_interval=config['HEALTH_CHECK_INTERVAL'], max_age=config['MAX_AGE']))
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.get_pool(conn_params)
+        connection = self._pool.checkout()
+
+        # As `base.DatabaseWrapper.get_new_connection` sets it, for connections opened by another wrapper
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # A connection that raised since its last commit / rollback is not reused
+                self._pool.checkin(self.connection, broken=self.errors_occurred)
@@ -0,0 +1,17 @@
+from django.db.backends.postgresql import creation
+
+from grofers.db import pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Closes the pooled connections before a test database is dropped or cloned, which Postgres refuses while
+    connections to it are open
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        pool.close_idle_connections()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        pool.close_idle_connections()
+        super()._clone_test_db(suffix, verbosity, keepdb=keepdb)
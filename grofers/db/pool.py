@@ -0,0 +1,249 @@
+"""Process-level pools of database connections
+
+A `ConnectionPool` keeps up to `max_size` connections open for the whole process : Django's connections
+(one per thread, the async views' database threads included) check one out when they connect, and give
+it back when they close, at the end of each request. Connections are reused most recently returned
+first, and checked before being handed out again :
+    - a connection idle for more than `health_check_interval` seconds must pass `check`
+    - a connection older than `max_age` seconds is closed, and replaced
+When every connection is checked out, `checkout` waits for one to come back, up to `timeout` seconds.
+
+The pool is agnostic of the database driver : it is given `connect`, `check`, `reset` and `close`
+callables (see `grofers.db.backends.postgresql_pool`), and can be exercised with stand-in connections.
+"""
+
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_pools = {}
+
+
+class ConnectionPool:
+    """Class that represents a bounded pool of connections, with health checks and metrics
+    """
+
+    class Exhausted(Exception):
+        """Raised if no connection could be checked out within the pool's timeout
+        """
+        ...
+
+    def __init__(self, connect, check=None, reset=None, close=None, max_size=10, timeout=5.0,
+                 health_check_interval=30.0, max_age=None, clock=time.monotonic):
+        """
+        :param connect: returns a new connection
+        :param check: returns whether a connection still works; connections are not checked if None
+        :param reset: prepares a returned connection for its next use (eg : rolls back an open transaction),
+            raising if it cannot
+        :param close: closes a connection, `connection.close()` if None
+        :param max_size: connections open at most
+        :type max_size: int
+        :param timeout: seconds `checkout` waits for a connection
+        :type timeout: float
+        :param health_check_interval: seconds a connection may stay idle before it is checked again
+        :type health_check_interval: float
+        :param max_age: seconds a connection is used for before being replaced, forever if None
+        :type max_age: Optional[float]
+        """
+
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.close_connection = close or (lambda connection: connection.close())
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_age = max_age
+        self.clock = clock
+
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = []  # (connection, returned at), most recently returned last
+        self._opened_at = {}  # id(connection) -> opened at, for the connections open
+        self._size = 0  # connections open or being opened
+
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.errors = 0  # failed connects, health checks and resets
+        self.opened = 0
+        self.closed = 0
+
+    def checkout(self):
+        """Returns a working connection : an idle one, or a new one if fewer than `max_size` are open
+
+        :raises Exhausted: raised if every connection is still checked out after `timeout` seconds
+        :raises Exception: raised by `connect`
+        """
+
+        deadline = self.clock() + self.timeout
+        waited = False
+
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise self.Exhausted
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+                    wait_start = self.clock()
+                    self._condition.wait(remaining)
+                    self.wait_time += self.clock() - wait_start
+
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                else:
+                    connection = None
+                    self._size += 1
+
+            if connection is None:
+                return self._open()
+            if self._is_healthy(connection, returned_at):
+                with self._condition:
+                    self.checkouts += 1
+                return connection
+
+            self._discard(connection)
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self.errors += 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._opened_at[id(connection)] = self.clock()
+            self.opened += 1
+            self.checkouts += 1
+
+        return connection
+
+    def _is_healthy(self, connection, returned_at):
+        now = self.clock()
+        if self.max_age is not None and now - self._opened_at.get(id(connection), now) >= self.max_age:
+            return False
+        if self.check is None or now - returned_at < self.health_check_interval:
+            return True
+
+        try:
+            healthy = self.check(connection)
+        except Exception:
+            healthy = False
+        if not healthy:
+            with self._condition:
+                self.errors += 1
+
+        return healthy
+
+    def checkin(self, connection, broken=False):
+        """Gives a checked out connection back; it is closed instead if `broken`, or if it cannot be reset
+
+        :param connection: connection returned by `checkout`
+        :param broken: whether the connection must not be reused
+        :type broken: bool
+        """
+
+        if not broken and self.reset is not None:
+            try:
+                self.reset(connection)
+            except Exception:
+                broken = True
+                with self._condition:
+                    self.errors += 1
+
+        if broken:
+            self._discard(connection)
+            return
+
+        with self._condition:
+            self._idle.append((connection, self.clock()))
+            self._condition.notify()
+
+    def _discard(self, connection):
+        try:
+            self.close_connection(connection)
+        except Exception:
+            pass
+
+        with self._condition:
+            self._opened_at.pop(id(connection), None)
+            self._size -= 1
+            self.closed += 1
+            self._condition.notify()
+
+    def close_idle(self):
+        """Closes the idle connections (eg : before the database is dropped)
+        """
+
+        with self._condition:
+            idle, self._idle = self._idle, []
+
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        """Returns the pool's gauges and counters
+
+        :rtype: Dict[str, Union[int, float]]
+        """
+
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'opened': self.opened,
+                'closed': self.closed,
+            }
+
+
+def get_pool(key, factory):
+    """Returns the process' pool for `key`, built by `factory()` on first use
+    A process forked after its pools were built (eg : a preloaded gunicorn worker) builds its own : the
+    parent's connections are not shared
+
+    :param key: hashable pool identifier, eg : the database alias and connection parameters
+    :param factory: returns a new `ConnectionPool`
+    :rtype: `ConnectionPool`
+    """
+
+    pid = os.getpid()
+    with _lock:
+        pool = _pools.get((pid, key))
+        if pool is None:
+            pool = _pools[(pid, key)] = factory()
+
+    return pool
+
+
+def get_pools():
+    """Returns the process' pools, by key
+
+    :rtype: Dict[Hashable, `ConnectionPool`]
+    """
+
+    pid = os.getpid()
+    with _lock:
+        return {key: pool for (pool_pid, key), pool in _pools.items() if pool_pid == pid}
+
+
+def close_idle_connections():
+    """Closes the idle connections of the process' pools
+    """
+
+    for pool in get_pools().values():
+        pool.close_idle()
@@ -37,7 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'orders',
+    'orders.apps.OrdersConfig',
 ]
 
 MIDDLEWARE = [
@@ -74,14 +74,23 @@ WSGI_APPLICATION = 'grofers.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# Connections come from a pool per process, and go back to it at the end of each request : `CONN_MAX_AGE`
+# stays at 0 (see `grofers.db.backends.postgresql_pool`)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'grofers.db.backends.postgresql_pool',
         'NAME': 'grofers',
         'USER': 'postgres',
         'PASSWORD': 'postgres',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': 20,
+            'TIMEOUT': 5.0,
+            'HEALTH_CHECK_INTERVAL': 30.0,
+            'MAX_AGE': 30 * 60,
+        },
     }
 }
 
@@ -123,3 +132,70 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Orders
+# Delivery fleet snapshots are cached per process (see `orders.fleet`)
+
+# Load the fleet snapshots when the WSGI / ASGI application is loaded, rather than on the first request
+ORDERS_WARM_FLEET_CACHE = True
+
+# Django cache shared by the workers (eg : memcached, redis), holding the fleet snapshots' version : a fleet
+# change made by one worker reloads the snapshots of the others (see `orders.fleet`). None to only reload the
+# worker's own : `CACHES` is each process' local memory, so deployments running several workers must
+# configure a shared cache and set its alias here
+ORDERS_FLEET_CACHE = None
+
+# Bin packing strategy used to assign the delivery vehicles (see `orders.packing.STRATEGIES`)
+ORDERS_PACKING_STRATEGY = 'ffd'
+
+# Seconds a searching strategy (eg : 'exact', or the local search of 'ffd-ls') may take per request before
+# returning its best plan
+ORDERS_PACKING_TIME_BUDGET = 0.005
+
+# Cache of packing plans, keyed by the batch's weights and the slot's fleet (see `orders.plan_cache`)
+ORDERS_PLAN_CACHE = {
+    'BACKEND': 'locmem',
+    'MAX_SIZE': 4096,
+    'TTL': 60 * 60,
+}
+
+# Background assignment jobs, run on a pool of threads per process (see `orders.jobs`)
+ORDERS_JOBS = {
+    'WORKERS': 2,
+    'MAX_QUEUED': 32,
+    'EAGER': False,
+}
+
+# Threads the async views run their blocking work on, per process (see `orders.offload`); 'DB_WORKERS' is
+# also the most database connections they check out of the pool at once, and 0 runs their database work in
+# the main thread
+ORDERS_ASYNC = {
+    'DB_WORKERS': 16,
+    'PACKING_WORKERS': 4,
+}
+
+# Orders inserted at once by a streamed assignment (see `SlotDelivery.assign_order_stream`)
+ORDERS_STREAM_CHUNK_SIZE = 1000
+
+# Time each phase of the assignment requests, with its SQL queries and rows, in `Server-Timing` response
+# headers and a log line per request (see `orders.instrumentation`)
+ORDERS_INSTRUMENTATION = False
+
+# Packing metrics, served in the Prometheus text format at /delivery/metrics to the allowed client addresses
+# (see `orders.metrics`)
+ORDERS_METRICS = {
+    'ENABLED': True,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+# Profiling of single assignment requests, asked for with a `Profile: cprofile` or `Profile: sample` header
+# (see `orders.profiling`)
+ORDERS_PROFILING = {
+    'ENABLED': False,
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'SAMPLE_INTERVAL': 0.001,
+}
+
+# Seconds the response of an assignment request is replayed to its repeats (see `IdempotentResponse`)
+ORDERS_IDEMPOTENCY_TTL = 24 * 60 * 60
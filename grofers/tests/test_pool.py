@@ -0,0 +1,175 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from grofers.db import pool
+
+
+class StandInConnection:
+    """Stand-in for a driver connection : counts its uses, and fails its checks once `healthy` is unset"""
+
+    def __init__(self, number):
+        self.number = number
+        self.healthy = True
+        self.in_transaction = False
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTestCases(SimpleTestCase):
+
+    def build_pool(self, **kwargs):
+        self.connections = []
+        self.clock = Clock()
+
+        def connect():
+            connection = StandInConnection(len(self.connections))
+            self.connections.append(connection)
+            return connection
+
+        def reset(connection):
+            if connection.closed:
+                raise ValueError
+            connection.in_transaction = False
+
+        kwargs.setdefault('check', lambda connection: connection.healthy)
+        return pool.ConnectionPool(connect, reset=reset, clock=self.clock, **kwargs)
+
+    def test_reuses_connections(self):
+        """Test a returned connection is checked out again, most recently returned first, without reconnecting
+        """
+
+        connection_pool = self.build_pool(max_size=2)
+
+        first, second = connection_pool.checkout(), connection_pool.checkout()
+        connection_pool.checkin(first)
+        connection_pool.checkin(second)
+
+        self.assertIs(connection_pool.checkout(), second)
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(connection_pool.stats(), {
+            'size': 2, 'idle': 1, 'in_use': 1, 'max_size': 2, 'checkouts': 3, 'waits': 0, 'wait_time': 0.0,
+            'timeouts': 0, 'errors': 0, 'opened': 2, 'closed': 0,
+        })
+
+    def test_reset_on_checkin(self):
+        """Test a connection returned in a transaction is rolled back, and one that cannot be reset is closed
+        """
+
+        connection_pool = self.build_pool()
+
+        connection = connection_pool.checkout()
+        connection.in_transaction = True
+        connection_pool.checkin(connection)
+        self.assertFalse(connection.in_transaction)
+
+        connection = connection_pool.checkout()
+        connection.closed = True
+        connection_pool.checkin(connection)
+        self.assertIsNot(connection_pool.checkout(), connection)
+        self.assertEqual(connection_pool.stats()['errors'], 1)
+
+        connection_pool.checkin(self.connections[-1], broken=True)
+        self.assertTrue(self.connections[-1].closed)
+        self.assertEqual(connection_pool.stats()['size'], 0)
+
+    def test_health_checks(self):
+        """Test a connection idle for longer than the interval is checked, and replaced if it fails
+        """
+
+        connection_pool = self.build_pool(health_check_interval=30)
+        connection = connection_pool.checkout()
+        connection_pool.checkin(connection)
+
+        # Not checked again while recently used
+        connection.healthy = False
+        self.clock.now = 10
+        self.assertIs(connection_pool.checkout(), connection)
+        connection_pool.checkin(connection)
+
+        self.clock.now = 50
+        replacement = connection_pool.checkout()
+
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(connection_pool.stats()['errors'], 1)
+        self.assertEqual(connection_pool.stats()['size'], 1)
+
+    def test_max_age(self):
+        connection_pool = self.build_pool(max_age=60)
+        connection = connection_pool.checkout()
+        connection_pool.checkin(connection)
+
+        self.clock.now = 60
+
+        self.assertIsNot(connection_pool.checkout(), connection)
+        self.assertEqual(connection_pool.stats()['closed'], 1)
+
+    def test_bounded(self):
+        """Test a checkout waits for a connection to be returned once `max_size` are checked out, then times out
+        """
+
+        connection_pool = pool.ConnectionPool(lambda: StandInConnection(0), max_size=1, timeout=5)
+        connection = connection_pool.checkout()
+        checked_out = []
+
+        waiter = threading.Thread(target=lambda: checked_out.append(connection_pool.checkout()))
+        waiter.start()
+        while not connection_pool.stats()['waits']:
+            pass
+        connection_pool.checkin(connection)
+        waiter.join()
+
+        self.assertEqual(checked_out, [connection])
+        self.assertEqual(connection_pool.stats()['opened'], 1)
+
+        connection_pool.timeout = 0
+        self.assertRaises(pool.ConnectionPool.Exhausted, connection_pool.checkout)
+        self.assertEqual(connection_pool.stats()['timeouts'], 1)
+
+    def test_connect_errors(self):
+        """Test a failed connect frees its place in the pool
+        """
+
+        connect = mock.Mock(side_effect=[OSError, StandInConnection(1)])
+        connection_pool = pool.ConnectionPool(connect, max_size=1, timeout=0)
+
+        self.assertRaises(OSError, connection_pool.checkout)
+        self.assertEqual(connection_pool.checkout().number, 1)
+        self.assertEqual(connection_pool.stats()['errors'], 1)
+
+    def test_close_idle(self):
+        connection_pool = self.build_pool()
+        idle, in_use = connection_pool.checkout(), connection_pool.checkout()
+        connection_pool.checkin(idle)
+
+        connection_pool.close_idle()
+
+        self.assertTrue(idle.closed)
+        self.assertFalse(in_use.closed)
+        self.assertEqual(connection_pool.stats()['size'], 1)
+
+    def test_pool_per_process(self):
+        """Test a pool is built once per key, and again in a forked process
+        """
+
+        with mock.patch.dict(pool._pools, clear=True):
+            first = pool.get_pool('default', self.build_pool)
+            self.assertIs(pool.get_pool('default', self.build_pool), first)
+            self.assertIsNot(pool.get_pool('other', self.build_pool), first)
+
+            with mock.patch('os.getpid', return_value=-1):
+                self.assertIsNot(pool.get_pool('default', self.build_pool), first)
+                self.assertEqual(len(pool.get_pools()), 1)
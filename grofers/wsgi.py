@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grofers.settings')
 
 application = get_wsgi_application()
+
+if settings.ORDERS_WARM_FLEET_CACHE:
+    from orders import fleet
+
+    fleet.warm()
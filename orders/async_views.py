@@ -0,0 +1,199 @@
+"""Native async counterparts of `AssignSlotOrders` and `QuoteSlotOrders`, for ASGI deployments
+
+Under an ASGI server, a request awaits its fleet lookup and persistence on the database threads, and its
+packing on the packing threads (see `orders.offload`), instead of holding a thread for its whole duration :
+a process holds as many requests in flight as the event loop can, whatever its number of threads.
+Requests, responses (errors included) and idempotency are those of the synchronous views.
+
+Django 3.1 supports neither async class based views nor async DRF views : these are async function
+views, reusing the synchronous views' validation and serializers. Under WSGI they still work, each in an
+event loop of its own, at a cost : route WSGI traffic to the synchronous views.
+"""
+
+import json
+
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+
+from . import offload
+from .models import IdempotentResponse, Order, SlotDelivery, VehicleReservation
+from .serializers import DeliveryVehicleOrdersSerializer, QuoteSerializer
+from .views import AssignSlotOrders
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    """Returns a JSON response rendered as the DRF views render theirs
+
+    :param data: response data
+    :param status_code: status code
+    :type status_code: int
+    :param headers: response headers
+    :type headers: Optional[Dict[str, str]]
+    :rtype: `HttpResponse`
+    """
+
+    response = HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+
+    return response
+
+
+def render_error(error):
+    """Returns the response DRF's exception handler gives an `APIException`
+    """
+
+    data = error.detail if isinstance(error.detail, (list, dict)) else {'detail': error.detail}
+
+    return render(data, status_code=error.status_code)
+
+
+def get_validated_request(request):
+    """Validates the request's orders and packing options, as `AssignSlotOrders` does
+
+    :param request: Django request object
+    :raises APIException: raised if the body, orders or query parameters are invalid
+    :return: orders, and the packing strategy and time budget (in seconds) to use
+    :rtype: Tuple[List[dict], Optional[str], Optional[float]]
+    """
+
+    try:
+        data = json.loads(request.body)
+    except ValueError as error:
+        raise exceptions.ParseError(f'JSON parse error - {error}')
+
+    orders = AssignSlotOrders.orders_validator.validate(data)
+
+    query_serializer = AssignSlotOrders.QuerySerializer(data=request.GET)
+    query_serializer.is_valid(raise_exception=True)
+    time_budget_ms = query_serializer.validated_data.get('time_budget_ms')
+
+    return orders, query_serializer.validated_data.get('strategy'), time_budget_ms / 1000 if time_budget_ms else None
+
+
+async def plan(slot_number, orders, strategy, time_budget):
+    """Plans the orders : fleet lookup on a database thread, packing on a packing thread
+
+    :raises OrdersWeightLimitError: raised if the sum of the orders' weight exceeds limit
+    :raises InvalidSlotNumber: raised if an invalid slot number is provided
+    :raises CannotAssignOrders: raised if the orders cannot be assigned to the available vehicles
+    :return: the plan and the fleet snapshot it refers to
+    :rtype: Tuple[`Plan`, `FleetSnapshot`]
+    """
+
+    snapshot = await offload.database(SlotDelivery.get_available_fleet, slot_number, orders)
+    plan = await offload.packing(
+        SlotDelivery.plan_delivery, snapshot.capacities, [order['order_weight'] for order in orders],
+        strategy=strategy, time_budget=time_budget)
+
+    return plan, snapshot
+
+
+def persist(key, request_hash, plan, snapshot, orders):
+    """Persists a plan and records its response, in one transaction
+
+    :raises VehicleReservation.AlreadyReserved: raised if a vehicle of the plan is already reserved
+    :raises IdempotentResponse.AlreadyRecorded: raised if a concurrent repeat was assigned first
+    :return: response data and headers
+    :rtype: Tuple[list, Dict[str, str]]
+    """
+
+    with transaction.atomic():
+        assigned_delivery_vehicle_orders = SlotDelivery.persist_plan(plan, snapshot, Order.build_from_dict(orders))
+
+        data = DeliveryVehicleOrdersSerializer(assigned_delivery_vehicle_orders, many=True).data
+        headers = {}
+        if assigned_delivery_vehicle_orders:
+            headers['Slot-Delivery-Id'] = str(assigned_delivery_vehicle_orders[0].slot_delivery_id)
+        IdempotentResponse.record(key, status.HTTP_200_OK, data, headers=headers, request_hash=request_hash)
+
+    return data, headers
+
+
+def replay(recorded):
+    """Returns a recorded response, flagged with an `Idempotent-Replayed` header (see `AssignSlotOrders.replay`)
+    """
+
+    status_code, data, headers = recorded
+
+    return render(data, status_code=status_code, headers={**headers, 'Idempotent-Replayed': 'true'})
+
+
+async def assign_slot_orders(request, slot_number):
+    """View to post a new Orders Delivery request, as `AssignSlotOrders` does
+    Vehicles are claimed optimistically : the orders are planned again if a concurrent request reserved one
+    of the planned vehicles first, up to `SlotDelivery.RESERVATION_ATTEMPTS` times
+
+    :param request: Django request object
+    :param slot_number: slot number
+    :type slot_number: int
+    :return: JSON response
+    """
+
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    try:
+        orders, strategy, time_budget = get_validated_request(request)
+
+        request_hash = IdempotentResponse.hash_request(slot_number, orders, options=(strategy, time_budget))
+        key = IdempotentResponse.request_key(slot_number, orders, options=(strategy, time_budget),
+                                             idempotency_key=request.headers.get('Idempotency-Key'))
+        recorded = await offload.database(AssignSlotOrders.lookup, key, request_hash)
+        if recorded is not None:
+            return replay(recorded)
+
+        for _ in range(SlotDelivery.RESERVATION_ATTEMPTS):
+            planned, snapshot = await plan(slot_number, orders, strategy, time_budget)
+            try:
+                data, headers = await offload.database(persist, key, request_hash, planned, snapshot, orders)
+            except VehicleReservation.AlreadyReserved:
+                # A concurrent request reserved one of the vehicles first; plan again around it
+                continue
+
+            return render(data, headers=headers)
+
+        raise SlotDelivery.CannotAssignOrders
+    except tuple(AssignSlotOrders.ERROR_MESSAGES) as error:
+        return render_error(exceptions.ParseError(AssignSlotOrders.ERROR_MESSAGES[type(error)]))
+    except IdempotentResponse.AlreadyRecorded:
+        # A concurrent repeat was assigned first; this assignment is rolled back
+        try:
+            return replay(await offload.database(AssignSlotOrders.lookup, key, request_hash))
+        except exceptions.APIException as error:
+            return render_error(error)
+    except exceptions.APIException as error:
+        return render_error(error)
+
+
+async def quote_slot_orders(request, slot_number):
+    """View to quote the delivery vehicles an Orders Delivery request would use, as `QuoteSlotOrders` does
+
+    :param request: Django request object
+    :param slot_number: slot number
+    :type slot_number: int
+    :return: JSON response
+    """
+
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    try:
+        orders, strategy, time_budget = get_validated_request(request)
+
+        planned, snapshot = await plan(slot_number, orders, strategy, time_budget)
+        quote = await offload.database(SlotDelivery.bind_plan, planned, snapshot, orders)
+    except tuple(AssignSlotOrders.ERROR_MESSAGES) as error:
+        return render_error(exceptions.ParseError(AssignSlotOrders.ERROR_MESSAGES[type(error)]))
+    except exceptions.APIException as error:
+        return render_error(error)
+
+    return render(QuoteSerializer(quote).data)
+
+
+# Like DRF's views, these are called by API clients, without a CSRF token. `csrf_exempt` would wrap them in
+# a synchronous function in Django 3.1, which would no longer be recognized as async
+assign_slot_orders.csrf_exempt = True
+quote_slot_orders.csrf_exempt = True
@@ -0,0 +1,282 @@
+"""Process-level cache of the delivery fleet available to each `Slot`
+
+The slot to fleet mapping almost never changes, so it is loaded once (for every slot at a time) and
+kept as compact `FleetSnapshot`s : vehicle counts per vehicle type, however large the fleet.
+`orders.signals` invalidates the cache whenever a `Slot`, `VehicleType` or `DeliveryVehicle` changes.
+Other processes learn of it through a version token kept in the Django cache `ORDERS_FLEET_CACHE` (eg :
+memcached / redis, shared by every worker) : a process reloads its snapshots once the token differs from the
+one it loaded them at. The token is read once per lookup; with `ORDERS_FLEET_CACHE` None, only the process
+making the change invalidates its snapshots.
+"""
+
+import bisect
+import itertools
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from django.db.models import Count
+
+VERSION_KEY = 'orders:fleet:version'
+
+_lock = threading.Lock()
+_snapshots = None
+_version = None
+_generation = 0
+
+
+class FleetSnapshot:
+    """Class that represents the delivery vehicles a `Slot` may use, as a histogram : how many vehicles of
+    each vehicle type (capacity class), in ascending order of capacity
+
+    `capacities` lists one capacity per vehicle, in that order, for the packers; a position in it is
+    bound to an actual `DeliveryVehicle` only once a plan using it is persisted (see `bind_vehicles`)
+    """
+
+    __slots__ = ('slot_id', 'slot_number', 'type_ids', 'type_names', 'class_capacities', 'counts', 'capacities',
+                 'offsets')
+
+    def __init__(self, slot_id, slot_number, classes=()):
+        """
+        :param slot_id: `Slot` id
+        :param slot_number: `Slot` number
+        :param classes: (vehicle type id, vehicle type name, capacity, vehicle count) tuples
+        :type classes: Iterable[tuple]
+        """
+
+        self.slot_id = slot_id
+        self.slot_number = slot_number
+
+        classes = sorted((vehicle_class for vehicle_class in classes if vehicle_class[3] > 0),
+                         key=lambda vehicle_class: (vehicle_class[2], vehicle_class[0]))
+        self.type_ids, self.type_names, self.class_capacities, self.counts = (
+            tuple(column) for column in zip(*classes)) if classes else ((),) * 4
+
+        # Position of the first vehicle of each class
+        self.offsets = tuple(itertools.accumulate((0,) + self.counts[:-1])) if classes else ()
+        self.capacities = tuple(itertools.chain.from_iterable(
+            itertools.repeat(capacity, count) for capacity, count in zip(self.class_capacities, self.counts)))
+
+    def vehicle_class(self, idx):
+        """Returns the capacity class of the `idx`th vehicle
+
+        :param idx: position of the vehicle in `capacities`
+        :type idx: int
+        :return: position of the class in `type_ids`
+        :rtype: int
+        """
+
+        return bisect.bisect_right(self.offsets, idx) - 1
+
+    def vehicle_type(self, class_idx):
+        """Returns the `class_idx`th class as a `VehicleType` object, without querying the database
+
+        :param class_idx: position of the class in `type_ids`
+        :type class_idx: int
+        :rtype: `VehicleType`
+        """
+
+        vehicle_type = apps.get_model('orders', 'VehicleType')(
+            id=self.type_ids[class_idx], name=self.type_names[class_idx],
+            vehicle_capacity=self.class_capacities[class_idx])
+        vehicle_type._state.adding = False
+        vehicle_type._state.db = 'default'
+
+        return vehicle_type
+
+    def without(self, type_counts):
+        """Returns the snapshot minus some vehicles, eg : the ones already reserved
+
+        :param type_counts: vehicles to leave out, by vehicle type id
+        :type type_counts: Dict[int, int]
+        :return: a new snapshot, or this one if there is nothing to leave out
+        :rtype: `FleetSnapshot`
+        """
+
+        if not any(type_counts.get(type_id) for type_id in self.type_ids):
+            return self
+
+        return FleetSnapshot(self.slot_id, self.slot_number, [
+            (type_id, type_name, capacity, count - type_counts.get(type_id, 0))
+            for type_id, type_name, capacity, count in zip(
+                self.type_ids, self.type_names, self.class_capacities, self.counts)
+        ])
+
+    def __len__(self):
+        return len(self.capacities)
+
+    def __repr__(self):
+        classes = dict(zip(self.type_names, self.counts))
+        return f"FleetSnapshot <slot_number: {self.slot_number}, vehicles: {classes}>"
+
+
+def load_snapshots():
+    """Loads the `FleetSnapshot` of every `Slot` (2 queries, one of them counting the vehicles per type)
+
+    :return: snapshots by slot number
+    :rtype: Dict[int, `FleetSnapshot`]
+    """
+
+    Slot = apps.get_model('orders', 'Slot')
+    VehicleType = apps.get_model('orders', 'VehicleType')
+
+    slot_numbers = dict(Slot.objects.values_list('id', 'slot_number'))
+    slot_classes = {slot_id: [] for slot_id in slot_numbers}
+
+    # One row per (slot, vehicle type) pair; vehicle types assigned to no slot come back with a null slot
+    for slot_id, *vehicle_class in VehicleType.objects.values_list(
+            'slot', 'id', 'name', 'vehicle_capacity').annotate(Count('deliveryvehicle')).order_by():
+        if slot_id is not None:
+            slot_classes[slot_id].append(vehicle_class)
+
+    return {
+        slot_numbers[slot_id]: FleetSnapshot(slot_id, slot_numbers[slot_id], classes)
+        for slot_id, classes in slot_classes.items()
+    }
+
+
+def bind_vehicles(snapshot, positions, date, exclude=()):
+    """Binds vehicle positions of a snapshot to actual `DeliveryVehicle`s
+    Each position gets a vehicle of its class not reserved for the slot on `date` (nor in `exclude`), lowest
+    ids first; one query per class bound
+
+    :param snapshot: snapshot the positions refer to
+    :type snapshot: `FleetSnapshot`
+    :param positions: positions of vehicles in the snapshot's `capacities`
+    :type positions: Sequence[int]
+    :param date: date the vehicles are needed on
+    :type date: datetime.date
+    :param exclude: `DeliveryVehicle` ids not to bind, eg : already bound ones not reserved yet
+    :type exclude: Collection[int]
+    :raises VehicleReservation.AlreadyReserved: raised if a class has fewer free vehicles than positions,
+        ie : vehicles were reserved since the snapshot was taken
+    :return: `DeliveryVehicle` objects, with their `vehicle_type`, in the order of `positions`
+    :rtype: List[`DeliveryVehicle`]
+    """
+
+    DeliveryVehicle = apps.get_model('orders', 'DeliveryVehicle')
+    VehicleReservation = apps.get_model('orders', 'VehicleReservation')
+
+    class_positions = {}
+    for position in positions:
+        class_positions.setdefault(snapshot.vehicle_class(position), []).append(position)
+
+    reserved = VehicleReservation.objects.filter(slot_id=snapshot.slot_id, date=date).values('delivery_vehicle_id')
+    bound = {}
+    for class_idx, positions_of_class in class_positions.items():
+        free_vehicles = DeliveryVehicle.objects.filter(vehicle_type_id=snapshot.type_ids[class_idx]).exclude(
+            id__in=reserved)
+        if exclude:
+            free_vehicles = free_vehicles.exclude(id__in=exclude)
+        free_vehicles = list(free_vehicles.order_by('id').values_list(
+            'id', 'delivery_vendor_id')[:len(positions_of_class)])
+        if len(free_vehicles) < len(positions_of_class):
+            raise VehicleReservation.AlreadyReserved
+
+        vehicle_type = snapshot.vehicle_type(class_idx)
+        for position, (vehicle_id, delivery_vendor_id) in zip(positions_of_class, free_vehicles):
+            delivery_vehicle = DeliveryVehicle(
+                id=vehicle_id, delivery_vendor_id=delivery_vendor_id, vehicle_type=vehicle_type)
+            delivery_vehicle._state.adding = False
+            delivery_vehicle._state.db = 'default'
+            bound[position] = delivery_vehicle
+
+    return [bound[position] for position in positions]
+
+
+def _shared_cache():
+    alias = settings.ORDERS_FLEET_CACHE
+
+    return None if alias is None else caches[alias]
+
+
+def shared_version():
+    """Returns the fleet's version token in the shared cache, setting one if there is none (eg : evicted)
+
+    :return: the token, or None if there is no shared cache
+    :rtype: Optional[str]
+    """
+
+    cache = _shared_cache()
+    if cache is None:
+        return None
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+
+    return version
+
+
+def get_snapshots():
+    """Returns the cached `FleetSnapshot`s, loading them if needed, or if another process invalidated them
+
+    :return: snapshots by slot number
+    :rtype: Dict[int, `FleetSnapshot`]
+    """
+
+    global _snapshots, _version
+
+    version = shared_version()
+    snapshots = _snapshots
+    if snapshots is None or version != _version:
+        generation = _generation
+        snapshots = load_snapshots()
+        with _lock:
+            # Don't cache a load that raced with an invalidation
+            if generation == _generation:
+                _snapshots, _version = snapshots, version
+
+    return snapshots
+
+
+def get_snapshot(slot_number):
+    """Returns the cached `FleetSnapshot` for `slot_number`
+
+    :param slot_number: slot number
+    :type slot_number: int
+    :return: the snapshot, or None if there is no such slot
+    :rtype: Optional[`FleetSnapshot`]
+    """
+
+    return get_snapshots().get(slot_number)
+
+
+def invalidate(*args, **kwargs):
+    """Drops the cached snapshots, in this process and (through a new version token) in the others; accepts
+    (and ignores) signal arguments
+    """
+
+    global _snapshots, _generation
+
+    with _lock:
+        _snapshots = None
+        _generation += 1
+
+    cache = _shared_cache()
+    if cache is not None:
+        cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def warm():
+    """Loads the cache, if the database is reachable and migrated
+    Meant for the WSGI / ASGI entry points (not `OrdersConfig.ready()`, which management commands such as
+    `migrate` run too), as it closes the connections it opened
+
+    :return: whether the cache was loaded
+    :rtype: bool
+    """
+
+    try:
+        get_snapshots()
+    except DatabaseError:
+        return False
+    finally:
+        # Don't hand an open connection over to forked workers
+        connections.close_all()
+
+    return True
@@ -0,0 +1,155 @@
+"""Per-phase instrumentation of the assignment requests, enabled by the `ORDERS_INSTRUMENTATION` setting
+
+While a request is recorded (see `record`), the code it runs marks its phases with `phase(name)` :
+validation, fleet lookup, packing, persistence, serialization... Each phase gets its exclusive wall time
+(the time spent in a phase nested in it counts for the nested phase only, so the phases add up to at most
+the total), and the SQL queries run in it along with the rows they returned or changed, as reported by the
+driver (SQLite does not report the rows a select returned). Queries run outside any phase are counted as 'other'.
+The request's response gets a `Server-Timing` header, and a JSON line is logged to `orders.instrumentation`.
+
+When disabled, `phase` returns a shared no-op context manager, after a context variable lookup.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_recorder = contextvars.ContextVar('orders_instrumentation_recorder', default=None)
+_no_phase = contextlib.nullcontext()
+
+
+class PhaseStats:
+    """Class that represents the time spent and queries run in a phase, out of its nested phases, over every
+    time it was entered
+    """
+
+    __slots__ = ('duration', 'queries', 'rows')
+
+    def __init__(self):
+        self.duration = 0.0
+        self.queries = 0
+        self.rows = 0
+
+
+class Recorder:
+    """Class that represents the phases of a request being recorded
+    Also the `execute_wrapper` counting the request's queries, in the innermost phase they run in
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = {}  # name -> `PhaseStats`, in the order they were first entered
+        self.stack = []  # [`PhaseStats`, seconds spent in nested phases] of the phases entered
+        self.start = time.perf_counter()
+
+    def stats(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats()
+
+        return stats
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        entry = [self.stats(name), 0.0]
+        self.stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stack.pop()
+            stats, nested = entry
+            stats.duration += elapsed - nested
+            if self.stack:
+                self.stack[-1][1] += elapsed
+
+    def __call__(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats = self.stack[-1][0] if self.stack else self.stats('other')
+            stats.queries += 1
+            rows = context['cursor'].rowcount
+            if rows > 0:
+                stats.rows += rows
+
+    def summary(self):
+        """Returns the total milliseconds of the request so far, and the milliseconds, queries and rows of
+        each phase
+
+        :rtype: Tuple[float, Dict[str, dict]]
+        """
+
+        total = (time.perf_counter() - self.start) * 1000
+
+        return total, {
+            name: {'ms': round(stats.duration * 1000, 3), 'queries': stats.queries, 'rows': stats.rows}
+            for name, stats in self.phases.items()
+        }
+
+    def finish(self, response):
+        """Adds the `Server-Timing` header to the response, and logs the request's phases
+
+        :param response: the request's response
+        """
+
+        total, phases = self.summary()
+
+        response['Server-Timing'] = ', '.join(
+            [f'{name};dur={phase["ms"]};desc="queries={phase["queries"]} rows={phase["rows"]}"'
+             for name, phase in phases.items()] +
+            [f'total;dur={round(total, 3)}'])
+
+        logger.info(json.dumps({
+            'view': self.name,
+            'status': response.status_code,
+            'total_ms': round(total, 3),
+            'queries': sum(phase['queries'] for phase in phases.values()),
+            'phases': phases,
+        }))
+
+
+def phase(name):
+    """Returns a context manager recording a phase of the current request, if it is recorded
+
+    :param name: phase name, a `Server-Timing` metric name
+    :type name: str
+    """
+
+    recorder = _recorder.get()
+    if recorder is None:
+        return _no_phase
+
+    return recorder.phase(name)
+
+
+@contextlib.contextmanager
+def record(name):
+    """Records the phases of a request, and the queries run by this thread's default connection, if
+    `ORDERS_INSTRUMENTATION` is on
+
+    :param name: name logged for the request, eg : the view's
+    :type name: str
+    :return: the `Recorder`, None if disabled
+    :rtype: Optional[`Recorder`]
+    """
+
+    if not settings.ORDERS_INSTRUMENTATION:
+        yield None
+        return
+
+    recorder = Recorder(name)
+    token = _recorder.set(recorder)
+    try:
+        with connection.execute_wrapper(recorder):
+            yield recorder
+    finally:
+        _recorder.reset(token)
@@ -0,0 +1,215 @@
+"""Orders Delivery requests run in the background
+
+A submitted request is saved as an `AssignmentJob` and run on the process' pool of threads, configured
+by the `ORDERS_JOBS` setting :
+    'WORKERS' : jobs run at once
+    'MAX_QUEUED' : jobs waiting for a worker beyond which submissions are refused
+    'EAGER' : run jobs in the submitting thread, right away (eg : for tests)
+Heavy batches are packed and persisted off the web workers, with their own concurrency limit; their
+status, response data and timings are read back from the job.
+Jobs left pending or running by a stopped process are not resumed.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import AssignmentJob, Order, SlotDelivery, VehicleReservation
+from .serializers import ASSIGNMENT_ERROR_MESSAGES, DeliveryVehicleOrdersSerializer
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_in_flight = 0  # jobs submitted and not finished, counted from their submission
+
+
+class QueueFull(Exception):
+    """Raised if `MAX_QUEUED` jobs are already waiting for a worker
+    """
+    ...
+
+
+def _get_executor():
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ORDERS_JOBS['WORKERS'],
+                                           thread_name_prefix='orders-jobs')
+
+    return _executor
+
+
+def submit(slot_number, orders, strategy=None, time_budget=None):
+    """Saves an Orders Delivery request as a job, and hands it to the pool once saved
+
+    :param slot_number: slot number
+    :type slot_number: int
+    :param orders: list of orders
+    :type orders: List[dict]
+    :param strategy: packing strategy, `ORDERS_PACKING_STRATEGY` if None
+    :type strategy: Optional[str]
+    :param time_budget: seconds the strategy may search for, `ORDERS_PACKING_TIME_BUDGET` if None
+    :type time_budget: Optional[float]
+    :raises QueueFull: raised if too many jobs are waiting for a worker
+    :return: the job
+    :rtype: `AssignmentJob`
+    """
+
+    config = settings.ORDERS_JOBS
+    if config.get('EAGER'):
+        job = AssignmentJob.objects.create(
+            slot_number=slot_number, orders=[dict(order) for order in orders], strategy=strategy,
+            time_budget=time_budget)
+        run(job.id)
+        job.refresh_from_db()
+        return job
+
+    _reserve(config['WORKERS'] + config['MAX_QUEUED'])
+    try:
+        job = AssignmentJob.objects.create(
+            slot_number=slot_number, orders=[dict(order) for order in orders], strategy=strategy,
+            time_budget=time_budget)
+    except BaseException:
+        _release()
+        raise
+
+    transaction.on_commit(_Enqueue(job.id))
+
+    return job
+
+
+def _reserve(bound):
+    """Takes a slot of the pool for a job being submitted
+
+    :raises QueueFull: raised if `bound` jobs are already submitted and not finished
+    """
+
+    global _in_flight
+
+    with _lock:
+        if _in_flight >= bound:
+            raise QueueFull
+        _in_flight += 1
+
+
+def _release():
+    global _in_flight
+
+    with _lock:
+        _in_flight -= 1
+
+
+class _Enqueue:
+    """Hands a submitted job to the pool once its transaction commits
+    Django has no rollback hook : a rolled back transaction drops its on commit callbacks, and the job's
+    slot is released when this callback is collected without having run
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.enqueued = False
+
+    def __call__(self):
+        _get_executor().submit(_work, self.job_id)
+        self.enqueued = True
+
+    def __del__(self):
+        if not self.enqueued:
+            _release()
+
+
+def _work(job_id):
+    """Runs a job on a worker thread, then releases its slot and the thread's connections"""
+
+    try:
+        run(job_id)
+    except Exception:
+        logger.exception("Assignment job %s failed", job_id)
+        AssignmentJob.objects.filter(id=job_id).exclude(status__in=AssignmentJob.FINISHED_STATUSES).update(
+            status=AssignmentJob.FAILED, finished=timezone.now())
+    finally:
+        _release()
+        connections.close_all()
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _finish(job, timings, start, packed):
+    """Records the job's outcome and timings"""
+
+    finished = time.perf_counter()
+    timings['packing'] = _milliseconds(packed - start)
+    timings['persisting'] = _milliseconds(finished - packed)
+    timings['total'] = _milliseconds(finished - start)
+
+    job.timings = timings
+    job.finished = timezone.now()
+    job.save(update_fields=['status', 'slot_delivery', 'result', 'timings', 'finished', 'modified_date'])
+
+
+def run(job_id):
+    """Runs a pending job : packs its orders, then persists the assignment unless it was cancelled meanwhile
+    The orders are packed again if a concurrent request reserved one of the planned vehicles first.
+    The job ends `succeeded` with the response data, `failed` with the error detail or `cancelled`, along with
+    the milliseconds it spent queued, packing and persisting
+
+    Packing runs outside of any transaction. The job's row is then locked while the cancellation is checked,
+    the assignment persisted and the outcome saved : a cancel requested meanwhile waits for the outcome
+
+    :param job_id: job id
+    :type job_id: int
+    """
+
+    if not AssignmentJob.claim(job_id):
+        # Cancelled, or run already
+        return
+
+    job = AssignmentJob.objects.get(id=job_id)
+    start = time.perf_counter()
+    packed = start
+    timings = {'queued': _milliseconds((job.started - job.created_date).total_seconds())}
+
+    for _ in range(SlotDelivery.RESERVATION_ATTEMPTS):
+        try:
+            quote = SlotDelivery.quote_new_batch_order_delivery(
+                job.slot_number, job.orders, strategy=job.strategy, time_budget=job.time_budget)
+        except tuple(ASSIGNMENT_ERROR_MESSAGES) as error:
+            job.status = AssignmentJob.FAILED
+            job.result = {'detail': ASSIGNMENT_ERROR_MESSAGES[type(error)]}
+            break
+        packed = time.perf_counter()
+
+        with transaction.atomic():
+            if AssignmentJob.objects.select_for_update().get(id=job_id).cancel_requested:
+                job.status = AssignmentJob.CANCELLED
+                _finish(job, timings, start, packed)
+                return
+
+            try:
+                with transaction.atomic():
+                    assigned_delivery_vehicle_orders = SlotDelivery.persist_plan(
+                        quote.plan, quote.snapshot, Order.build_from_dict(job.orders))
+            except VehicleReservation.AlreadyReserved:
+                # A concurrent request reserved one of the vehicles first; plan again around it
+                continue
+
+            if assigned_delivery_vehicle_orders:
+                job.slot_delivery_id = assigned_delivery_vehicle_orders[0].slot_delivery_id
+            job.status = AssignmentJob.SUCCEEDED
+            job.result = DeliveryVehicleOrdersSerializer(assigned_delivery_vehicle_orders, many=True).data
+            _finish(job, timings, start, packed)
+            return
+    else:
+        job.status = AssignmentJob.FAILED
+        job.result = {'detail': ASSIGNMENT_ERROR_MESSAGES[SlotDelivery.CannotAssignOrders]}
+
+    _finish(job, timings, start, packed)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import math
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = ("Compares the synchronous views, served by threads as gunicorn's threaded workers do, with the async "
+            "views, served by an event loop as an ASGI server does, at several concurrency levels. Requests go "
+            "through Django's handlers in process, against the configured database; quotes write nothing, "
+            "assignments reserve vehicles (failing once the slot's fleet is reserved for the day)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 64],
+                            help="requests in flight; threads for WSGI")
+        parser.add_argument('--requests', type=int, default=200, help="requests per measure")
+        parser.add_argument('--orders', type=int, default=20, help="orders per request")
+        parser.add_argument('--slot', type=int, default=1, help="slot number")
+        parser.add_argument('--assign', action='store_true',
+                            help="benchmark the assignment views rather than the quotes : writes deliveries")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        name = 'assign_slot_orders' if options['assign'] else 'quote_slot_orders'
+        sync_url = reverse(name, kwargs={'slot_number': options['slot']})
+        async_url = reverse(f'async_{name}', kwargs={'slot_number': options['slot']})
+
+        # Distinct payloads across measures, so that assignments are not replayed
+        order_ids = iter(range(1, 2 ** 31))
+
+        def payloads():
+            return [
+                json.dumps([{'order_id': next(order_ids), 'order_weight': rng.randint(1, 5)}
+                            for _ in range(options['orders'])])
+                for _ in range(options['requests'])
+            ]
+
+        for concurrency in options['concurrency']:
+            for server, measure, url in (('wsgi', self.measure_wsgi, sync_url),
+                                         ('asgi', self.measure_asgi, async_url)):
+                elapsed, latencies, failures = measure(url, payloads(), concurrency)
+                latencies.sort()
+                self.stdout.write(
+                    f"{server}  concurrency: {concurrency:>4}  {len(latencies) / elapsed:9.1f} req/s  "
+                    f"p50: {statistics.median(latencies) * 1000:8.2f} ms  "
+                    f"p99: {latencies[math.ceil(len(latencies) * 0.99) - 1] * 1000:8.2f} ms  failures: {failures}")
+
+    @staticmethod
+    def measure_wsgi(url, payloads, concurrency):
+        """Posts the payloads from `concurrency` threads, each with a client of its own"""
+
+        def post(payload):
+            client = Client()
+            start = time.perf_counter()
+            response = client.post(url, data=payload, content_type='application/json')
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(post, payloads))
+        elapsed = time.perf_counter() - start
+
+        return elapsed, [latency for latency, _ in results], sum(code != 200 for _, code in results)
+
+    @staticmethod
+    def measure_asgi(url, payloads, concurrency):
+        """Posts the payloads from one event loop, `concurrency` at a time"""
+
+        async def post_all():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def post(payload):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(url, data=payload, content_type='application/json')
+                    return time.perf_counter() - start, response.status_code
+
+            return await asyncio.gather(*(post(payload) for payload in payloads))
+
+        start = time.perf_counter()
+        results = asyncio.run(post_all())
+        elapsed = time.perf_counter() - start
+
+        return elapsed, [latency for latency, _ in results], sum(code != 200 for _, code in results)
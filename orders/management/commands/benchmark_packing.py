@@ -0,0 +1,200 @@
+import datetime
+import json
+import math
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import packing
+from orders.packing import workloads
+
+
+def percentile(ordered, fraction):
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks the packing strategies on synthetic workloads (see `orders.packing.workloads`), packed "
+            "into fleets with the seeded slots' vehicle mixes : throughput, latency percentiles, peak memory, "
+            "vehicles used and their gap to the fleet lower bound. Writes the results as JSON, and compares "
+            "them with a baseline, failing on regressions")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000, 1000000],
+                            help="numbers of orders per batch")
+        parser.add_argument('--strategies', nargs='+', choices=sorted(packing.STRATEGIES),
+                            default=sorted(packing.STRATEGIES))
+        parser.add_argument('--workloads', nargs='+', choices=list(workloads.WORKLOADS),
+                            default=list(workloads.WORKLOADS))
+        parser.add_argument('--fleets', nargs='+', choices=list(workloads.FLEET_MIXES),
+                            default=list(workloads.FLEET_MIXES))
+        parser.add_argument('--max-size', nargs='+', default=[], metavar='STRATEGY=SIZE',
+                            help="largest batch a strategy is run on (default: every size)")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="runs per measure, at least 1000 orders' worth for the small batches")
+        parser.add_argument('--time-budget', type=float, default=settings.ORDERS_PACKING_TIME_BUDGET,
+                            help="seconds the searching strategies may take per batch")
+        parser.add_argument('--no-memory', action='store_true',
+                            help="skip the run measuring peak memory, traced by `tracemalloc`")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="JSON file the results are written to")
+        parser.add_argument('--baseline', help="JSON file of earlier results to compare with")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="throughput loss or peak memory growth flagged as a regression")
+
+    def handle(self, *args, **options):
+        max_sizes = {}
+        for limit in options['max_size']:
+            strategy, _, size = limit.partition('=')
+            if strategy not in packing.STRATEGIES or not size.isdigit():
+                raise CommandError(f"Invalid --max-size {limit!r}, expected STRATEGY=SIZE")
+            max_sizes[strategy] = int(size)
+
+        results = []
+        for fleet in options['fleets']:
+            mix = workloads.FLEET_MIXES[fleet]
+            max_weight = max(capacity for capacity, _ in mix)
+            for workload in options['workloads']:
+                for size in options['sizes']:
+                    rng = random.Random(f"{options['seed']}-{workload}-{size}")
+                    weights = workloads.generate_weights(workload, size, max_weight, rng)
+                    capacities = workloads.scale_fleet(mix, weights)
+                    lower_bound = packing.fleet_lower_bound(sum(weights), capacities)
+                    for strategy in options['strategies']:
+                        if size > max_sizes.get(strategy, size):
+                            continue
+                        result = {'fleet': fleet, 'workload': workload, 'size': size, 'strategy': strategy,
+                                  'vehicles_available': len(capacities), 'lower_bound': lower_bound}
+                        result.update(self.measure(weights, capacities, strategy, options))
+                        if 'vehicles' in result:
+                            result['gap'] = result['vehicles'] - lower_bound
+                        results.append(result)
+                        self.write_result(result)
+
+        report = {
+            'meta': {
+                'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'numpy': packing.vectorized.available,
+                'seed': options['seed'],
+                'time_budget': options['time_budget'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                baseline = json.load(baseline)
+            if baseline['meta']['seed'] != options['seed']:
+                self.stderr.write("The baseline was generated with another seed : its batches differ")
+            regressions = self.compare(baseline['results'], results, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+            self.stdout.write(f"No regression against {options['baseline']}")
+
+    @staticmethod
+    def measure(weights, capacities, strategy, options):
+        """Packs the batch `runs` times, then once more while tracing memory allocations"""
+
+        size = len(weights)
+        runs = max(options['repeat'], 1000 // max(size, 1))
+        latencies = []
+        try:
+            for _ in range(runs):
+                start = time.perf_counter()
+                plan = packing.pack(weights, capacities, strategy, time_budget=options['time_budget'])
+                latencies.append(time.perf_counter() - start)
+
+            peak_memory = None
+            if not options['no_memory']:
+                tracemalloc.start()
+                try:
+                    packing.pack(weights, capacities, strategy, time_budget=options['time_budget'])
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+        except packing.CannotPack as e:
+            return {'error': f'{type(e).__name__}: {e}'}
+
+        latencies.sort()
+        median = statistics.median(latencies)
+
+        return {
+            'runs': runs,
+            'throughput': size / median if median else None,
+            'latency_ms': {
+                'min': latencies[0] * 1000,
+                'p50': median * 1000,
+                'p95': percentile(latencies, 0.95) * 1000,
+                'p99': percentile(latencies, 0.99) * 1000,
+            },
+            'peak_memory': peak_memory,
+            'vehicles': plan.vehicle_count,
+            'total_capacity': plan.total_capacity,
+        }
+
+    def write_result(self, result):
+        prefix = f"{result['fleet']:<7} {result['workload']:<13} {result['size']:>8} {result['strategy']:<10}"
+        if 'error' in result:
+            self.stdout.write(f"{prefix}  {result['error']}")
+            return
+
+        latency = result['latency_ms']
+        memory = '-' if result['peak_memory'] is None else f"{result['peak_memory'] / 2 ** 20:8.2f} MiB"
+        throughput = '-' if result['throughput'] is None else f"{result['throughput']:12.0f}"
+        self.stdout.write(
+            f"{prefix}  {throughput} orders/s  p50: {latency['p50']:10.3f} ms  p95: {latency['p95']:10.3f} ms  "
+            f"p99: {latency['p99']:10.3f} ms  memory: {memory}  vehicles: {result['vehicles']:>7} "
+            f"(gap {result['gap']})")
+
+    @staticmethod
+    def compare(baseline, results, threshold):
+        """Returns a description of each regression of `results` against the baseline's same measures
+
+        :param baseline: earlier results
+        :type baseline: List[dict]
+        :param results: current results
+        :type results: List[dict]
+        :param threshold: throughput loss or peak memory growth tolerated, as a fraction
+        :type threshold: float
+        :rtype: List[str]
+        """
+
+        def key(result):
+            return result['fleet'], result['workload'], result['size'], result['strategy']
+
+        previous = {key(result): result for result in baseline}
+        regressions = []
+        for result in results:
+            before = previous.get(key(result))
+            if before is None or 'error' in before:
+                continue
+
+            name = ' '.join(str(part) for part in key(result))
+            if 'error' in result:
+                regressions.append(f"{name}: {result['error']}")
+                continue
+            if before['throughput'] and result['throughput'] is not None and \
+                    result['throughput'] < before['throughput'] * (1 - threshold):
+                regressions.append(
+                    f"{name}: throughput {result['throughput']:.0f} orders/s, was {before['throughput']:.0f}")
+            if result['vehicles'] > before['vehicles']:
+                regressions.append(f"{name}: {result['vehicles']} vehicles, was {before['vehicles']}")
+            if before['peak_memory'] and result['peak_memory'] is not None and \
+                    result['peak_memory'] > before['peak_memory'] * (1 + threshold):
+                regressions.append(
+                    f"{name}: peak memory {result['peak_memory']} bytes, was {before['peak_memory']} bytes")
+
+        return regressions
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import IdempotentResponse
+
+
+class Command(BaseCommand):
+    help = "Deletes the recorded assignment responses past their `ORDERS_IDEMPOTENCY_TTL` (eg : from a cron job)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {IdempotentResponse.delete_expired()} expired responses")
@@ -0,0 +1,281 @@
+"""Process-level metrics of the packing step, exposed in the Prometheus text format
+
+Counters and histograms are updated in process, by `SlotDelivery.plan_delivery` (every plan, quotes
+included) and `SlotDelivery.persist_plans` (the vehicles actually assigned); the plan cache's lookup
+counters and the gauges (plan cache hit rate, database connection pools) are read when rendered.
+`MetricsView` serves them, configured by `ORDERS_METRICS` :
+    'ENABLED' : whether the endpoint responds
+    'ALLOWED_IPS' : client addresses it responds to, eg : a local Prometheus agent
+Each worker process has its own metrics : scrape every worker, or aggregate their series.
+
+First Fit Decreasing finds an order's vehicle with an indexed lookup, in O(log vehicles) : the "vehicles
+scanned per order" are reported for the searching strategies instead, as search nodes per order.
+"""
+
+import bisect
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views import View
+
+from grofers.db import pool
+from . import plan_cache
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values))
+
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Class that represents a monotonic counter, per label values
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+
+        for key, value in values:
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram:
+    """Class that represents a distribution of observations in cumulative buckets, per label values
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][idx] += 1
+            counts[1] += value
+
+    def count(self, **labels):
+        counts = self._values.get(tuple(labels[name] for name in self.labels))
+
+        return sum(counts[0]) if counts else 0
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                yield f'{self.name}_bucket', _format_labels(self.labels + ('le',), key + (le,)), cumulative
+            yield f'{self.name}_sum', _format_labels(self.labels, key), total
+            yield f'{self.name}_count', _format_labels(self.labels, key), cumulative
+
+
+class Gauges:
+    """Class that represents gauges read from the process' state when rendered
+    `read` returns (label values, value) pairs
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, read, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.labels = tuple(labels)
+
+    def reset(self):
+        pass
+
+    def samples(self):
+        for key, value in self.read():
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class ReadCounters(Gauges):
+    """Class that represents counters kept by another object of the process (eg : the plan cache), read when
+    rendered
+    """
+
+    type = 'counter'
+
+
+class Registry:
+    """Class that represents the metrics rendered by the endpoint
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+        return metric
+
+    def reset(self):
+        """Sets every counter and histogram back to zero (eg : between tests)
+        """
+
+        for metric in self.metrics:
+            metric.reset()
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format
+
+        :rtype: str
+        """
+
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in metric.samples())
+
+        return '\n'.join(lines) + '\n'
+
+
+def _plan_cache_lookups():
+    cache = plan_cache.get_plan_cache()
+    if cache is not None:
+        yield ('hits',), cache.hits
+        yield ('misses',), cache.misses
+
+
+def _plan_cache_hit_rate():
+    cache = plan_cache.get_plan_cache()
+    if cache is not None:
+        yield (), cache.hit_rate
+
+
+def _connection_pool_gauges():
+    for key, connection_pool in pool.get_pools().items():
+        alias = key[0] if isinstance(key, tuple) else key
+        for name, value in connection_pool.stats().items():
+            yield (alias, name), value
+
+
+registry = Registry()
+
+orders_packed = registry.register(Counter(
+    'orders_packed_total', "Orders packed, quotes included", labels=('strategy',)))
+packing_failures = registry.register(Counter(
+    'orders_packing_failures_total', "Batches that could not be packed", labels=('strategy',)))
+packing_seconds = registry.register(Histogram(
+    'orders_packing_seconds', "Wall time of the packing step, plan cache lookups included",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5), labels=('strategy',)))
+search_nodes = registry.register(Histogram(
+    'orders_packing_search_nodes_per_order', "Search nodes expanded per order, for the searching strategies",
+    buckets=(1, 2, 5, 10, 50, 100, 1000, 10000), labels=('strategy',)))
+local_search_moves = registry.register(Counter(
+    'orders_packing_local_search_moves_total', "Moves accepted by the local search", labels=('strategy',)))
+vehicles_opened = registry.register(Counter(
+    'orders_vehicles_opened_total', "Delivery vehicles assigned", labels=('vehicle_type',)))
+fill_ratio = registry.register(Histogram(
+    'orders_vehicle_fill_ratio', "Load of the assigned delivery vehicles over their capacity",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0), labels=('vehicle_type',)))
+registry.register(ReadCounters(
+    'orders_plan_cache_lookups_total', "Plan cache lookups, by result", _plan_cache_lookups, labels=('result',)))
+registry.register(Gauges(
+    'orders_plan_cache_hit_rate', "Share of the plan cache lookups that hit", _plan_cache_hit_rate))
+registry.register(Gauges(
+    'grofers_db_pool', "Database connection pool gauges and counters (see `grofers.db.pool`)",
+    _connection_pool_gauges, labels=('alias', 'stat')))
+
+
+def observe_plan(strategy, orders, plan, seconds):
+    """Records a packing plan
+
+    :param strategy: strategy name
+    :type strategy: str
+    :param orders: orders packed
+    :type orders: int
+    :param plan: the plan
+    :type plan: `Plan`
+    :param seconds: wall time of the packing step
+    :type seconds: float
+    """
+
+    orders_packed.inc(orders, strategy=strategy)
+    packing_seconds.observe(seconds, strategy=strategy)
+    if plan.nodes and orders:
+        search_nodes.observe(plan.nodes / orders, strategy=strategy)
+    if plan.moves:
+        local_search_moves.inc(plan.moves, strategy=strategy)
+
+
+def observe_assignment(plan, snapshot):
+    """Records the vehicles a persisted plan assigned
+
+    :param plan: the plan
+    :type plan: `Plan`
+    :param snapshot: `FleetSnapshot` the plan's vehicles refer to
+    :type snapshot: `FleetSnapshot`
+    """
+
+    for planned_vehicle in plan:
+        vehicle_type = snapshot.type_names[snapshot.vehicle_class(planned_vehicle.vehicle)]
+        vehicles_opened.inc(vehicle_type=vehicle_type)
+        fill_ratio.observe(planned_vehicle.load / planned_vehicle.capacity, vehicle_type=vehicle_type)
+
+
+class MetricsView(View):
+    """Serves the process' metrics in the Prometheus text format, to the `ORDERS_METRICS['ALLOWED_IPS']`
+    """
+
+    def get(self, request, *args, **kwargs):
+        config = settings.ORDERS_METRICS
+        if not config['ENABLED']:
+            raise Http404
+        if request.META.get('REMOTE_ADDR') not in config['ALLOWED_IPS']:
+            return HttpResponseForbidden()
+
+        return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.5 on 2026-10-17 11:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('modified_date', models.DateTimeField(auto_now=True)),
+                ('slot_number', models.PositiveSmallIntegerField()),
+                ('orders', models.JSONField()),
+                ('strategy', models.CharField(max_length=16, null=True)),
+                ('time_budget', models.FloatField(null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_index=True, default='pending', max_length=10)),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('result', models.JSONField(null=True)),
+                ('started', models.DateTimeField(null=True)),
+                ('finished', models.DateTimeField(null=True)),
+                ('timings', models.JSONField(null=True)),
+                ('slot_delivery', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='orders.slotdelivery')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
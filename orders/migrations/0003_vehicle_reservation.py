@@ -0,0 +1,30 @@
+# Generated by Django 3.1.5 on 2026-10-17 11:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_assignment_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleReservation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('modified_date', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('delivery_vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='orders.deliveryvehicle')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='orders.slot')),
+                ('slot_delivery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vehicle_reservations', to='orders.slotdelivery')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vehiclereservation',
+            constraint=models.UniqueConstraint(fields=('slot', 'date', 'delivery_vehicle'), name='unique_vehicle_reservation'),
+        ),
+    ]
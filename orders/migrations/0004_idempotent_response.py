@@ -0,0 +1,28 @@
+# Generated by Django 3.1.5 on 2026-10-17 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_vehicle_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotentResponse',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('modified_date', models.DateTimeField(auto_now=True)),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('data', models.BinaryField()),
+                ('expires', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.1.5 on 2026-10-17 12:03
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_remaining_capacities(apps, schema_editor):
+    """Records the capacity left in the vehicles of the existing deliveries
+    """
+    DeliveryVehicleOrders = apps.get_model('orders', 'DeliveryVehicleOrders')
+
+    delivery_vehicle_orders = DeliveryVehicleOrders.objects.annotate(
+        load=Coalesce(Sum('orders__weight'), 0.0)).values_list(
+        'id', 'delivery_vehicle__vehicle_type__vehicle_capacity', 'load')
+
+    DeliveryVehicleOrders.objects.bulk_update([
+        DeliveryVehicleOrders(id=pk, remaining_capacity=capacity - load)
+        for pk, capacity, load in delivery_vehicle_orders.iterator()
+    ], ['remaining_capacity'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_idempotent_response'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryvehicleorders',
+            name='remaining_capacity',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryvehicleorders',
+            index=models.Index(fields=['slot_delivery', 'remaining_capacity'], name='dvo_remaining_capacity_idx'),
+        ),
+        migrations.RunPython(populate_remaining_capacities, migrations.RunPython.noop),
+    ]
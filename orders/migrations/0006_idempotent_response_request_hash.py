@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_delivery_vehicle_orders_remaining_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotentresponse',
+            name='request_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+    ]
@@ -1,4 +1,14 @@
-from django.db import models
+import datetime
+import hashlib
+import json
+import time
+import zlib
+from collections import namedtuple
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count
+from django.utils import timezone
+from . import fleet, instrumentation, metrics, packing, plan_cache
 from .managers import AscendingOrderManager
 from .utils import BaseModel
 
@@ -11,24 +21,6 @@ class VehicleType(BaseModel):
     name = models.CharField(null=False, max_length=10)
     vehicle_capacity = models.IntegerField(null=False)
 
-    @staticmethod
-    def get_delivery_vehicles_available(vehicles):
-        """Returns all delivery vehicles available for the `VehicleType` queryset
-
-        :param vehicles: QuerySet(`VehicleType`)
-        :type vehicles: QuerySet
-        :return: list of available delivery vehicles
-        :rtype: List[`DeliveryVehicle`]
-        """
-
-        available_delivery_vehicles = []
-        for vehicle_type in vehicles:
-            available_delivery_vehicles.extend(
-                DeliveryVehicle.objects.filter(vehicle_type=vehicle_type).all()
-            )
-
-        return available_delivery_vehicles
-
 
 class Slot(BaseModel):
     """Class that represents a time range Slot
@@ -97,15 +89,66 @@ class SlotDelivery(BaseModel):
         """
         ...
 
+    class DeliveryNotOpen(Exception):
+        """Raised if orders are added to a delivery that does not exist, or was not created today
+        """
+        ...
+
+    class AmbiguousOrder(Exception):
+        """Raised if several orders of a delivery have the id of the order to cancel
+        """
+        ...
+
+    class OrdersAlreadyAdded(Exception):
+        """Raised if orders added to a delivery have the ids of orders it already has
+        """
+
+        def __init__(self, order_ids):
+            super().__init__(order_ids)
+            self.order_ids = order_ids
+
+    # A plan computed without writing anything, along with the fleet snapshot and orders it refers to, and the
+    # `DeliveryVehicle`s its vehicles would currently be bound to
+    Quote = namedtuple('Quote', ('plan', 'snapshot', 'orders', 'delivery_vehicles'))
+
+    # Times the slots are planned again when a concurrent request reserved one of their vehicles first
+    RESERVATION_ATTEMPTS = 3
+
+    # The vehicles used by a streamed assignment, with their order count and load, and the total weight
+    StreamAssignment = namedtuple(
+        'StreamAssignment', ('delivery_vehicle_orders', 'order_counts', 'loads', 'total_weight'))
+
+    # A vehicle orders were added to, along with those orders and whether it was opened for them
+    AddedOrders = namedtuple('AddedOrders', ('delivery_vehicle_order', 'orders', 'opened'))
+
+    # The changes made to a delivery by cancelling an order : (order, from, to vehicle) moves, the vehicles
+    # released and the vehicles left whose remaining capacity changed
+    Repair = namedtuple('Repair', ('cancelled_order', 'moves', 'released', 'updated'))
+
+    # Most orders moved out of a vehicle to release it, after a cancellation
+    REPAIR_MAX_ORDERS = 16
+
     slot_id = models.ForeignKey(Slot, on_delete=models.CASCADE)
 
     vehicles_assigned = models.BooleanField(null=True)
     created = models.DateTimeField(auto_now_add=True)  # used to identify on which date?
 
+    def get_delivery_vehicle_orders(self):
+        """Returns the delivery's `DeliveryVehicleOrders`, in the order they were assigned
+        Loads their vehicle, vehicle type and orders up front (2 queries), ready to be serialized
+
+        :return: `DeliveryVehicleOrders` objects
+        :rtype: QuerySet(`DeliveryVehicleOrders`)
+        """
+
+        return self.delivery_vehicle_orders.select_related(
+            'delivery_vehicle__vehicle_type').prefetch_related('orders').order_by('id')
+
     @classmethod
-    def assign_new_batch_order_delivery(cls, slot_number, orders):
+    def assign_new_batch_order_delivery(cls, slot_number, orders, strategy=None, time_budget=None):
         """Assigns a `DeliveryVehicleOrders` fleet for the provided orders and slot number
-        Currently uses the `First Fit Decreasing Bin Packing algorithm` to assign the delivery vehicles
+        Uses the `ORDERS_PACKING_STRATEGY` bin packing strategy (`First Fit Decreasing` by default)
+        to assign the delivery vehicles not reserved yet for the slot today (see `assign_batch_order_deliveries`)
 
         links : 
         # https://www.youtube.com/watch?v=GbPmmZQHQo8,
@@ -115,76 +158,572 @@ class SlotDelivery(BaseModel):
         :type slot_num: int
         :param orders: list of orders
         :type orders: dict
+        :param strategy: packing strategy (see `packing.STRATEGIES`), `ORDERS_PACKING_STRATEGY` if None
+        :type strategy: Optional[str]
+        :param time_budget: seconds the strategy may search for, `ORDERS_PACKING_TIME_BUDGET` if None
+        :type time_budget: Optional[float]
+        :raises OrdersWeightLimitError: raised if the sum of the orders' weight exceeds limit
+        :raises InvalidSlotNumber: raised if an invalid slot number is provided
+        :raises CannotAssignOrders: raised if the orders cannot be assigned to the available vehicles
         :return: list of `DeliveryVehicleOrders` objects
         :rtype: List[`DeliveryVehicleOrders`]
         """
 
-        # Get the order objects
+        """ Now, the CRUX... Assign the delivery vehicles! """
+        assigned_delivery_vehicle_orders = cls.assign_batch_order_deliveries(
+            {slot_number: orders}, strategy=strategy, time_budget=time_budget)[slot_number]
+        if isinstance(assigned_delivery_vehicle_orders, Exception):
+            raise assigned_delivery_vehicle_orders
+
+        return assigned_delivery_vehicle_orders
+
+    @classmethod
+    def quote_new_batch_order_delivery(cls, slot_number, orders, strategy=None, time_budget=None):
+        """Plans the delivery vehicles for the provided orders and slot number, without writing anything
+        Works off the cached fleet, minus the vehicles reserved for the slot today : once the fleet cache is
+        warm, a query for the reservations and one per vehicle type used, to bind the plan's vehicles
+
+        :param slot_number: slot number
+        :type slot_number: int
+        :param orders: list of orders
+        :type orders: List[dict]
+        :param strategy: packing strategy, `ORDERS_PACKING_STRATEGY` if None
+        :type strategy: Optional[str]
+        :param time_budget: seconds the strategy may search for, `ORDERS_PACKING_TIME_BUDGET` if None
+        :type time_budget: Optional[float]
+        :return: the plan, along with the fleet snapshot and orders it refers to
+        :rtype: `SlotDelivery.Quote`
+        """
+
+        snapshot = cls.get_available_fleet(slot_number, orders)
+        plan = cls.plan_delivery(snapshot.capacities, [order['order_weight'] for order in orders],
+                                 strategy=strategy, time_budget=time_budget)
+
+        return cls.bind_plan(plan, snapshot, orders)
+
+    @classmethod
+    def get_available_fleet(cls, slot_number, orders):
+        """Returns the slot's cached fleet, minus the vehicles reserved for the slot today (a query)
+        First step of `quote_new_batch_order_delivery`
+
+        :param slot_number: slot number
+        :type slot_number: int
+        :param orders: list of orders
+        :type orders: List[dict]
+        :raises OrdersWeightLimitError: raised if the sum of the orders' weight exceeds limit
+        :raises InvalidSlotNumber: raised if an invalid slot number is provided
+        :rtype: `FleetSnapshot`
+        """
+
         try:
-            orders = Order.bulk_create_from_dict(orders)
+            Order.check_weight_limit([order['order_weight'] for order in orders])
         except Order.WeightLimitExceeded:
             raise cls.OrdersWeightLimitError
 
-        # Initialize a new `SlotDelivery`
-        try:
-            slot = Slot.objects.get(slot_number=slot_number)
-        except Slot.DoesNotExist:
-            raise cls.InvalidSlotNumber
-        slot_delivery = cls.objects.create(slot_id=slot)
+        with instrumentation.phase('fleet'):
+            snapshot = fleet.get_snapshot(slot_number)
+            if snapshot is None:
+                raise cls.InvalidSlotNumber
 
-        """ Now, the CRUX... Assign the delivery vehicles! """
-        available_vehicle_types = Slot.get_vehicle_types_assigned(
-            slot_number=slot_number)  # vehicle types available for the slot
-        available_delivery_vehicles = VehicleType.get_delivery_vehicles_available(
-            available_vehicle_types)  # all delivery vehicles available for the slot
+            reserved = VehicleReservation.reserved_vehicles([snapshot.slot_id], timezone.localdate())
 
-        return cls.assign_first_fit_delivery(
-            available_delivery_vehicles, orders, slot_delivery)
+        return snapshot.without(reserved[snapshot.slot_id])
 
     @classmethod
-    def assign_first_fit_delivery(cls, available_delivery_vehicles, orders, slot_delivery):
-        """Assigns the delivery vehicles with the First Fit Decreasing algorithm
+    def bind_plan(cls, plan, snapshot, orders):
+        """Binds the plan's vehicles to the `DeliveryVehicle`s not reserved yet (a query per vehicle type used)
+        Last step of `quote_new_batch_order_delivery`
+
+        :param plan: `Plan` computed over the snapshot's capacities and `orders`
+        :type plan: `Plan`
+        :param snapshot: `FleetSnapshot` returned by `get_available_fleet`
+        :type snapshot: `FleetSnapshot`
+        :param orders: list of orders
+        :type orders: List[dict]
+        :raises CannotAssignOrders: raised if vehicles were reserved since the reservations were read
+        :rtype: `SlotDelivery.Quote`
+        """
 
-        :param available_delivery_vehicles: available `DeliveryVehicle` objects
-        :type available_delivery_vehicles: List[`DeliveryVehicle`]
-        :param orders: `Order` objects
-        :type orders: List[`Order`]
-        :param slot_delivery: `SlotDelivery` object
+        try:
+            with instrumentation.phase('bind'):
+                delivery_vehicles = fleet.bind_vehicles(
+                    snapshot, [planned_vehicle.vehicle for planned_vehicle in plan], timezone.localdate())
+        except VehicleReservation.AlreadyReserved:
+            # Vehicles were reserved since the reservations were read
+            raise cls.CannotAssignOrders
+
+        return cls.Quote(plan, snapshot, orders, delivery_vehicles)
+
+    @classmethod
+    def plan_delivery(cls, capacities, weights, strategy=None, time_budget=None):
+        """Plans the delivery vehicles with a bin packing strategy
+        The plan is computed in memory by `packing.pack`, or taken from the plan cache; nothing is written
+
+        :param capacities: capacities of the available delivery vehicles, in ascending order
+        :type capacities: Sequence[int]
+        :param weights: order weights
+        :type weights: Sequence[float]
+        :param strategy: packing strategy, `ORDERS_PACKING_STRATEGY` if None
+        :type strategy: Optional[str]
+        :param time_budget: seconds the strategy may search for, `ORDERS_PACKING_TIME_BUDGET` if None
+        :type time_budget: Optional[float]
         :raises cls.CannotAssignOrders: raised if there exists an order which cannot be assigned to any vehicle
-        :return: `DeliveryVehicleOrder` objects
-        :rtype: List[`DeliveryVehicleOrder`]
+        :return: assignment plan
+        :rtype: `Plan`
         """
 
-        delivery_vehicles_assigned = []
-        # Go through orders in descending order of their weight
-        for order in sorted(orders, key=lambda x: x.weight, reverse=True):
-            order_added = False
+        strategy = strategy or settings.ORDERS_PACKING_STRATEGY
+        start = time.perf_counter()
+        try:
+            with instrumentation.phase('packing'):
+                plan = packing.pack(
+                    weights, capacities, strategy=strategy,
+                    time_budget=time_budget if time_budget is not None else settings.ORDERS_PACKING_TIME_BUDGET,
+                    cache=plan_cache.get_plan_cache())
+        except packing.CannotPack:
+            # if the orders just cannot be assigned
+            metrics.packing_failures.inc(strategy=strategy)
+            raise cls.CannotAssignOrders
 
-            for delivery_vehicle in delivery_vehicles_assigned:
-                if order.weight <= delivery_vehicle.capacity:
-                    delivery_vehicle.add_order(order)
-                    order_added = True
-                    break
+        metrics.observe_plan(strategy, len(weights), plan, time.perf_counter() - start)
 
-            if order_added == False:
-                # Assign a new delivery vehicle
-                for idx, vehicle in enumerate(available_delivery_vehicles):
+        return plan
 
-                    if vehicle.max_capacity >= order.weight:
-                        delivery_vehicle = available_delivery_vehicles.pop(idx)
-                        new_delivery_vehicle_assigned = delivery_vehicle.assign_vehicle(
-                            slot_delivery=slot_delivery)
-                        new_delivery_vehicle_assigned.add_order(order)
+    @classmethod
+    def assign_batch_order_deliveries(cls, slot_orders, strategy=None, time_budget=None):
+        """Assigns a `DeliveryVehicleOrders` fleet for the orders of each slot number
+        Every slot is planned off a single fleet lookup, minus the vehicles already reserved for the slot
+        today, and the deliveries of all the slots that could be planned are persisted together (see
+        `persist_plans`); a slot that cannot be planned does not prevent the others from being assigned.
+
+        Vehicles are claimed optimistically : if a concurrent request reserved one of the planned vehicles
+        first, the slots are planned again around it, up to `RESERVATION_ATTEMPTS` times
+
+        :param slot_orders: list of orders by slot number
+        :type slot_orders: Dict[int, List[dict]]
+        :param strategy: packing strategy (see `packing.STRATEGIES`), `ORDERS_PACKING_STRATEGY` if None
+        :type strategy: Optional[str]
+        :param time_budget: seconds the strategy may search for, per slot, `ORDERS_PACKING_TIME_BUDGET` if None
+        :type time_budget: Optional[float]
+        :return: by slot number, its `DeliveryVehicleOrders` objects, or the error raised while planning it
+            (`OrdersWeightLimitError`, `InvalidSlotNumber` or `CannotAssignOrders`)
+        :rtype: Dict[int, Union[List[`DeliveryVehicleOrders`], Exception]]
+        """
 
-                        delivery_vehicles_assigned.append(new_delivery_vehicle_assigned)
-                        order_added = True
-                        break
+        with instrumentation.phase('fleet'):
+            snapshots = fleet.get_snapshots()
+        date = timezone.localdate()
+        results = {}
+        candidates = {}  # slot number -> (snapshot, orders)
+
+        for slot_number, orders in slot_orders.items():
+            try:
+                Order.check_weight_limit([order['order_weight'] for order in orders])
+            except Order.WeightLimitExceeded:
+                results[slot_number] = cls.OrdersWeightLimitError()
+                continue
+
+            snapshot = snapshots.get(slot_number)
+            if snapshot is None:
+                results[slot_number] = cls.InvalidSlotNumber()
+                continue
+
+            candidates[slot_number] = (snapshot, orders)
+
+        for _ in range(cls.RESERVATION_ATTEMPTS):
+            with instrumentation.phase('fleet'):
+                reserved = VehicleReservation.reserved_vehicles(
+                    [snapshot.slot_id for snapshot, _ in candidates.values()], date)
+            planned_slots, plans = [], []
+
+            for slot_number, (snapshot, orders) in candidates.items():
+                available = snapshot.without(reserved[snapshot.slot_id])
+                try:
+                    plan = cls.plan_delivery(available.capacities, [order['order_weight'] for order in orders],
+                                             strategy=strategy, time_budget=time_budget)
+                except cls.CannotAssignOrders as error:
+                    results[slot_number] = error
+                else:
+                    planned_slots.append(slot_number)
+                    plans.append((plan, available, Order.build_from_dict(orders)))
+
+            try:
+                results.update(zip(planned_slots, cls.persist_plans(plans, date=date)))
+            except VehicleReservation.AlreadyReserved:
+                continue
+
+            return results
+
+        results.update((slot_number, cls.CannotAssignOrders()) for slot_number in planned_slots)
+
+        return results
 
-            # if the orders just cannot be assigned
-            if order_added is False:
+    @classmethod
+    def assign_order_stream(cls, slot_number, orders, chunk_size=None):
+        """Assigns a `DeliveryVehicleOrders` fleet for orders read one at a time, eg : from a streamed request
+        The orders are packed as they arrive (see `packing.OnlineFirstFit`) and inserted in chunks of
+        `chunk_size`, along with the vehicles opened since the last chunk, so memory stays flat whatever the
+        number of orders. Their total weight is bounded by the slot's fleet capacity. Once every order is
+        placed, the vehicles are swapped for the smallest ones carrying the same loads.
+        The vehicles reserved for the slot today are left out, and the ones used are reserved at the end.
+        Runs in a single transaction : nothing is written if any order is invalid or cannot be assigned, or if
+        a concurrent request reserved one of the vehicles first
+
+        :param slot_number: slot number
+        :type slot_number: int
+        :param orders: orders, validated
+        :type orders: Iterable[dict]
+        :param chunk_size: orders inserted at once, `ORDERS_STREAM_CHUNK_SIZE` if None
+        :type chunk_size: Optional[int]
+        :raises InvalidSlotNumber: raised if an invalid slot number is provided
+        :raises OrdersWeightLimitError: raised if the orders' weight exceeds the slot's fleet capacity
+        :raises CannotAssignOrders: raised if an order does not fit in any available vehicle
+        :return: the vehicles used, along with their order count and load
+        :rtype: `SlotDelivery.StreamAssignment`
+        """
+
+        snapshot = fleet.get_snapshot(slot_number)
+        if snapshot is None:
+            raise cls.InvalidSlotNumber
+
+        date = timezone.localdate()
+        snapshot = snapshot.without(VehicleReservation.reserved_vehicles([snapshot.slot_id], date)[snapshot.slot_id])
+        chunk_size = chunk_size or settings.ORDERS_STREAM_CHUNK_SIZE
+        weight_limit = sum(snapshot.capacities)
+        packer = packing.OnlineFirstFit(snapshot.capacities)
+
+        with transaction.atomic():
+            slot_delivery = cls.objects.create(slot_id_id=snapshot.slot_id)
+            delivery_vehicles_assigned = []
+            chunk = []  # (position of the opened vehicle, order) pairs
+            total_weight = 0
+
+            def bind(vehicles, kept):
+                # The vehicles kept are not reserved until the end, so they are left out explicitly
+                try:
+                    return fleet.bind_vehicles(snapshot, vehicles, date, exclude=[
+                        delivery_vehicle.delivery_vehicle_id for delivery_vehicle in kept])
+                except VehicleReservation.AlreadyReserved:
+                    raise cls.CannotAssignOrders
+
+            def flush():
+                delivery_vehicles_assigned.extend(DeliveryVehicleOrders.bulk_create_for(slot_delivery, bind(
+                    packer.vehicles[len(delivery_vehicles_assigned):], delivery_vehicles_assigned)))
+                Order.objects.bulk_create([
+                    Order(order_id=order['order_id'], weight=order['order_weight'],
+                          delivery_vehicle_order=delivery_vehicles_assigned[position])
+                    for position, order in chunk
+                ])
+                chunk.clear()
+
+            for order in orders:
+                total_weight += order['order_weight']
+                if total_weight > weight_limit:
+                    raise cls.OrdersWeightLimitError
+
+                try:
+                    chunk.append((packer.add(order['order_weight']), order))
+                except packing.CannotPack:
+                    raise cls.CannotAssignOrders
+
+                if len(chunk) >= chunk_size:
+                    flush()
+            flush()
+
+            # Only the vehicles swapped for another vehicle type are bound again
+            opened = list(packer.vehicles)
+            downsized, kept = [], []
+            for delivery_vehicle, opened_vehicle, vehicle in zip(delivery_vehicles_assigned, opened, packer.downsize()):
+                if snapshot.vehicle_class(vehicle) != snapshot.vehicle_class(opened_vehicle):
+                    downsized.append((delivery_vehicle, vehicle))
+                else:
+                    kept.append(delivery_vehicle)
+            if downsized:
+                bound_vehicles = bind([vehicle for _, vehicle in downsized], kept)
+                for (delivery_vehicle, _), bound_vehicle in zip(downsized, bound_vehicles):
+                    delivery_vehicle.delivery_vehicle = bound_vehicle
+
+            for delivery_vehicle, remaining in zip(delivery_vehicles_assigned, packer.remaining):
+                delivery_vehicle.capacity = remaining
+            DeliveryVehicleOrders.objects.bulk_update(
+                delivery_vehicles_assigned, ['delivery_vehicle', 'remaining_capacity'], batch_size=chunk_size)
+
+            try:
+                VehicleReservation.claim([
+                    VehicleReservation(delivery_vehicle_id=delivery_vehicle.delivery_vehicle_id,
+                                       slot_id=snapshot.slot_id, date=date, slot_delivery=slot_delivery)
+                    for delivery_vehicle in delivery_vehicles_assigned
+                ])
+            except VehicleReservation.AlreadyReserved:
+                # A concurrent request took one of the vehicles; the stream cannot be read again
                 raise cls.CannotAssignOrders
 
-        return delivery_vehicles_assigned
+        return cls.StreamAssignment(delivery_vehicles_assigned, packer.counts, packer.loads(), total_weight)
+
+    @classmethod
+    def get_open_for_update(cls, slot_delivery_id, date):
+        """Returns an open `SlotDelivery`, along with its `Slot`, locked until the end of the transaction
+
+        :param slot_delivery_id: `SlotDelivery` id
+        :type slot_delivery_id: int
+        :param date: today's date
+        :type date: datetime.date
+        :raises DeliveryNotOpen: raised if there is no such delivery, or it was not created on `date`
+        :rtype: `SlotDelivery`
+        """
+
+        slot_delivery = cls.objects.select_for_update().select_related('slot_id').filter(
+            id=slot_delivery_id, created__date=date).first()
+        if slot_delivery is None:
+            raise cls.DeliveryNotOpen
+
+        return slot_delivery
+
+    @classmethod
+    def add_orders(cls, slot_delivery_id, orders):
+        """Adds orders to an open `SlotDelivery` : one created today, whose vehicles are reserved for today
+        Each order (heaviest first) goes into the delivery's vehicle it leaves the least room in, found through
+        the `remaining_capacity` index in O(log n) without loading the delivery's orders; if none, the
+        smallest vehicle of the slot's fleet left that is large enough is opened and reserved for it.
+        Runs in a single transaction, with the delivery locked : nothing is written if an order cannot be added
+
+        :param slot_delivery_id: `SlotDelivery` id
+        :type slot_delivery_id: int
+        :param orders: list of orders
+        :type orders: List[dict]
+        :raises DeliveryNotOpen: raised if there is no such delivery, or it was not created today
+        :raises OrdersAlreadyAdded: raised if the delivery already has orders with some of the order ids
+        :raises OrdersWeightLimitError: raised if the sum of the orders' weight exceeds the limit
+        :raises CannotAssignOrders: raised if an order does not fit in the delivery, nor in a vehicle left
+        :return: the vehicles orders were added to, in the order they got their first order
+        :rtype: List[`SlotDelivery.AddedOrders`]
+        """
+
+        try:
+            Order.check_weight_limit([order['order_weight'] for order in orders])
+        except Order.WeightLimitExceeded:
+            raise cls.OrdersWeightLimitError
+
+        date = timezone.localdate()
+
+        with transaction.atomic():
+            slot_delivery = cls.get_open_for_update(slot_delivery_id, date)
+
+            already_added = set(Order.objects.filter(
+                delivery_vehicle_order__slot_delivery=slot_delivery,
+                order_id__in=[order['order_id'] for order in orders]).order_by().values_list('order_id', flat=True))
+            if already_added:
+                raise cls.OrdersAlreadyAdded(already_added)
+
+            free_vehicles = None  # the slot's fleet left, loaded if a vehicle is opened
+            added = {}  # `DeliveryVehicleOrders` id -> `AddedOrders`
+
+            for order in sorted(orders, key=lambda order: order['order_weight'], reverse=True):
+                weight = order['order_weight']
+
+                delivery_vehicle = slot_delivery.delivery_vehicle_orders.filter(
+                    remaining_capacity__gte=weight).select_related('delivery_vehicle__vehicle_type').order_by(
+                    'remaining_capacity', 'id').first()
+
+                if delivery_vehicle is None:
+                    if free_vehicles is None:
+                        snapshot = fleet.get_snapshot(slot_delivery.slot_id.slot_number)
+                        snapshot = snapshot.without(
+                            VehicleReservation.reserved_vehicles([snapshot.slot_id], date)[snapshot.slot_id])
+                        free_vehicles = packing.FreeVehicles(snapshot.capacities)
+
+                    vehicle = free_vehicles.take(weight)
+                    if vehicle is None:
+                        raise cls.CannotAssignOrders
+                    try:
+                        [bound_vehicle] = fleet.bind_vehicles(snapshot, [vehicle], date)
+                        VehicleReservation.claim([VehicleReservation(
+                            delivery_vehicle=bound_vehicle, slot_id=snapshot.slot_id, date=date,
+                            slot_delivery=slot_delivery)])
+                    except VehicleReservation.AlreadyReserved:
+                        raise cls.CannotAssignOrders
+
+                    delivery_vehicle = DeliveryVehicleOrders.objects.create(
+                        delivery_vehicle=bound_vehicle, slot_delivery=slot_delivery,
+                        remaining_capacity=snapshot.capacities[vehicle])
+                    added[delivery_vehicle.id] = cls.AddedOrders(delivery_vehicle, [], True)
+                elif delivery_vehicle.id in added:
+                    delivery_vehicle = added[delivery_vehicle.id].delivery_vehicle_order
+                else:
+                    added[delivery_vehicle.id] = cls.AddedOrders(delivery_vehicle, [], False)
+
+                delivery_vehicle.capacity -= weight
+                delivery_vehicle.save(update_fields=['remaining_capacity', 'modified_date'])
+                added[delivery_vehicle.id].orders.append(Order(
+                    order_id=order['order_id'], weight=weight, delivery_vehicle_order=delivery_vehicle))
+
+            Order.objects.bulk_create([order for added_orders in added.values() for order in added_orders.orders])
+
+        return list(added.values())
+
+    @classmethod
+    def cancel_order(cls, slot_delivery_id, order_id):
+        """Cancels an order of an open `SlotDelivery`, then repairs the delivery locally rather than planning it
+        again : the vehicle with the least load for its capacity is released if its orders (`REPAIR_MAX_ORDERS`
+        at most) fit in the room left in the other vehicles, each going where it leaves the least room.
+        Only the delivery's vehicles and the orders moved are read; only the rows changed are written.
+        Runs in a single transaction, with the delivery locked
+
+        :param slot_delivery_id: `SlotDelivery` id
+        :type slot_delivery_id: int
+        :param order_id: order id
+        :type order_id: int
+        :raises DeliveryNotOpen: raised if there is no such delivery, or it was not created today
+        :raises Order.DoesNotExist: raised if the delivery has no such order
+        :raises AmbiguousOrder: raised if the delivery has several orders with the order id
+        :return: the changes made to the delivery
+        :rtype: `SlotDelivery.Repair`
+        """
+
+        with transaction.atomic():
+            slot_delivery = cls.get_open_for_update(slot_delivery_id, timezone.localdate())
+
+            cancelled_orders = list(Order.objects.filter(
+                order_id=order_id, delivery_vehicle_order__slot_delivery=slot_delivery)[:2])
+            if not cancelled_orders:
+                raise Order.DoesNotExist
+            if len(cancelled_orders) > 1:
+                raise cls.AmbiguousOrder
+            [cancelled_order] = cancelled_orders
+            cancelled_order.delete()
+
+            vehicles = list(slot_delivery.delivery_vehicle_orders.select_related(
+                'delivery_vehicle__vehicle_type').order_by('id'))
+            source = next(vehicle for vehicle in vehicles if vehicle.id == cancelled_order.delivery_vehicle_order_id)
+            source.capacity += cancelled_order.weight
+            updated = {source.id: source}
+
+            # The most room left for its capacity, ie : the least utilized
+            least_loaded = max(vehicles, key=lambda vehicle: vehicle.capacity / vehicle.delivery_vehicle.max_capacity)
+            orders = list(least_loaded.orders.order_by('-weight', 'order_id')[:cls.REPAIR_MAX_ORDERS + 1])
+            receivers = [vehicle for vehicle in vehicles if vehicle is not least_loaded]
+
+            moves = []
+            if len(orders) <= cls.REPAIR_MAX_ORDERS:
+                room = {vehicle.id: vehicle.capacity for vehicle in receivers}
+                for order in orders:
+                    fitting = [vehicle for vehicle in receivers if room[vehicle.id] >= order.weight]
+                    if not fitting:
+                        moves = None
+                        break
+                    receiver = min(fitting, key=lambda vehicle: room[vehicle.id])
+                    room[receiver.id] -= order.weight
+                    moves.append((order, least_loaded, receiver))
+
+            released = []
+            if moves is not None:
+                for order, _, receiver in moves:
+                    order.delivery_vehicle_order = receiver
+                    receiver.capacity -= order.weight
+                    updated[receiver.id] = receiver
+                Order.objects.bulk_update([order for order, _, _ in moves], ['delivery_vehicle_order'])
+
+                VehicleReservation.objects.filter(
+                    slot_delivery=slot_delivery, delivery_vehicle_id=least_loaded.delivery_vehicle_id).delete()
+                DeliveryVehicleOrders.objects.filter(id=least_loaded.id).delete()
+                updated.pop(least_loaded.id, None)
+                released.append(least_loaded)
+
+            DeliveryVehicleOrders.objects.bulk_update(updated.values(), ['remaining_capacity'])
+
+        return cls.Repair(cancelled_order, moves or [], released, list(updated.values()))
+
+    @classmethod
+    def persist_plan(cls, plan, snapshot, orders):
+        """Persists a packing `Plan` as a new `SlotDelivery` of the snapshot's `Slot`
+
+        Runs in a single transaction with a fixed number of statements, however large the plan : a query per
+        vehicle type used to bind its vehicles, one insert for the `SlotDelivery`, one for all its
+        `DeliveryVehicleOrders` and one for all the `Order`s, which are inserted with their
+        `delivery_vehicle_order` already set
+
+        :param plan: `Plan` computed over the snapshot's capacities and `orders`
+        :type plan: `Plan`
+        :param snapshot: `FleetSnapshot` the plan's vehicles refer to
+        :type snapshot: `FleetSnapshot`
+        :param orders: unsaved `Order` objects the plan's items refer to
+        :type orders: List[`Order`]
+        :raises VehicleReservation.AlreadyReserved: raised if a vehicle of the plan is already reserved
+        :return: `DeliveryVehicleOrder` objects, in the order the vehicles were opened
+        :rtype: List[`DeliveryVehicleOrder`]
+        """
+
+        return cls.persist_plans([(plan, snapshot, orders)])[0]
+
+    @classmethod
+    def persist_plans(cls, plans, date=None):
+        """Persists packing `Plan`s, each as a new `SlotDelivery` of its snapshot's `Slot`
+
+        Runs in a single transaction : the plans' vehicles are bound to `DeliveryVehicle`s (a query per plan
+        and vehicle type used, see `fleet.bind_vehicles`), the `SlotDelivery`s are inserted at once (one at a
+        time if the backend cannot return the inserted ids), then one insert for all the `VehicleReservation`s
+        of the vehicles used, one for all their `DeliveryVehicleOrders` and one for all the `Order`s
+
+        :param plans: (plan, snapshot, unsaved orders) triples, as taken by `persist_plan`
+        :type plans: List[Tuple[`Plan`, `FleetSnapshot`, List[`Order`]]]
+        :param date: day the vehicles are reserved for, today if None
+        :type date: Optional[datetime.date]
+        :raises VehicleReservation.AlreadyReserved: raised if a vehicle used is already reserved, or too few
+            vehicles of a type are left to bind the plan; nothing is written
+        :return: for each plan, its `DeliveryVehicleOrder` objects, in the order the vehicles were opened
+        :rtype: List[List[`DeliveryVehicleOrder`]]
+        """
+
+        if not plans:
+            return []
+
+        date = date or timezone.localdate()
+
+        with transaction.atomic(), instrumentation.phase('persist'):
+            with instrumentation.phase('bind'):
+                delivery_vehicles = [
+                    fleet.bind_vehicles(snapshot, [planned_vehicle.vehicle for planned_vehicle in plan], date)
+                    for plan, snapshot, _ in plans
+                ]
+
+            slot_deliveries = [cls(slot_id_id=snapshot.slot_id) for _, snapshot, _ in plans]
+            if len(slot_deliveries) > 1 and connection.features.can_return_rows_from_bulk_insert:
+                cls.objects.bulk_create(slot_deliveries)
+            else:
+                for slot_delivery in slot_deliveries:
+                    slot_delivery.save(force_insert=True)
+
+            VehicleReservation.claim([
+                VehicleReservation(delivery_vehicle_id=delivery_vehicle.id, slot_id=snapshot.slot_id, date=date,
+                                   slot_delivery=slot_delivery)
+                for slot_delivery, (_, snapshot, _), plan_vehicles in zip(slot_deliveries, plans, delivery_vehicles)
+                for delivery_vehicle in plan_vehicles
+            ])
+
+            delivery_vehicles_assigned = DeliveryVehicleOrders.bulk_create_for_deliveries([
+                (slot_delivery, delivery_vehicle)
+                for slot_delivery, plan_vehicles in zip(slot_deliveries, delivery_vehicles)
+                for delivery_vehicle in plan_vehicles
+            ], remaining_capacities=[planned_vehicle.remaining for plan, _, _ in plans for planned_vehicle in plan])
+
+            assigned = []
+            delivery_vehicles = iter(delivery_vehicles_assigned)
+            for plan, _, orders in plans:
+                assigned.append([])
+                for planned_vehicle in plan:
+                    delivery_vehicle = next(delivery_vehicles)
+                    for item in planned_vehicle.items:
+                        orders[item].delivery_vehicle_order = delivery_vehicle
+                    assigned[-1].append(delivery_vehicle)
+
+            Order.objects.bulk_create([order for _, _, orders in plans for order in orders])
+
+        for slot_assigned, (plan, snapshot, orders) in zip(assigned, plans):
+            for delivery_vehicle, planned_vehicle in zip(slot_assigned, plan):
+                delivery_vehicle.cache_orders([orders[item] for item in planned_vehicle.items])
+            metrics.observe_assignment(plan, snapshot)
+
+        return assigned
 
 
 class DeliveryVehicle(BaseModel):
@@ -205,15 +744,6 @@ class DeliveryVehicle(BaseModel):
 
         return self.vehicle_type.vehicle_capacity
 
-    def assign_vehicle(self, slot_delivery):
-        """Returns a new instance of `DeliveryVehicleOrders` to cater to this `SlotDelivery`
-
-        :param slot_delivery: `SlotDelivery` object
-        :return: new `DeliveryVehicleOrders` object
-        """
-
-        return DeliveryVehicleOrders.objects.create(delivery_vehicle=self, slot_delivery=slot_delivery)
-
     def __str__(self):
         return f"DeliveryVehicle <VehicleType: {self.vehicle_type.name}, DeliveryVendorID: {self.delivery_vendor_id}>"
 
@@ -229,12 +759,32 @@ class DeliveryVehicleOrders(BaseModel):
     slot_delivery = models.ForeignKey(SlotDelivery, on_delete=models.CASCADE,
                                       related_name='delivery_vehicle_orders', null=False)
 
-    def __init__(self, *args, **kwargs):
-        """Adds an attr `capacity` to help keep track of its current capacity
+    # Capacity left once the vehicle's orders are loaded
+    remaining_capacity = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            # Finds the vehicle of a delivery an order fits best in, without loading its orders
+            models.Index(fields=('slot_delivery', 'remaining_capacity'), name='dvo_remaining_capacity_idx'),
+        ]
+
+    @property
+    def capacity(self):
+        """Returns the vehicle's current capacity
+        Falls back to the vehicle's max capacity if it was not recorded, as it needs the vehicle's `VehicleType`
+
+        :return: capacity
+        :rtype: float
         """
 
-        super().__init__(*args, **kwargs)
-        self.capacity = self.delivery_vehicle.max_capacity
+        if self.remaining_capacity is None:
+            self.remaining_capacity = self.delivery_vehicle.max_capacity
+
+        return self.remaining_capacity
+
+    @capacity.setter
+    def capacity(self, capacity):
+        self.remaining_capacity = capacity
 
     @property
     def vehicle_type(self):
@@ -245,16 +795,66 @@ class DeliveryVehicleOrders(BaseModel):
 
         return self.delivery_vehicle.vehicle_type
 
-    def add_order(self, order):
-        """Adds an `Order` to the vehicle
+    @classmethod
+    def bulk_create_for(cls, slot_delivery, delivery_vehicles):
+        """Bulk creates a `DeliveryVehicleOrders` per delivery vehicle for the `SlotDelivery`
+
+        :param slot_delivery: saved `SlotDelivery` object
+        :param delivery_vehicles: `DeliveryVehicle` objects
+        :type delivery_vehicles: List[`DeliveryVehicle`]
+        :return: saved `DeliveryVehicleOrders` objects, in the order of `delivery_vehicles`
+        :rtype: List[`DeliveryVehicleOrders`]
+        """
+
+        return cls.bulk_create_for_deliveries(
+            [(slot_delivery, delivery_vehicle) for delivery_vehicle in delivery_vehicles])
+
+    @classmethod
+    def bulk_create_for_deliveries(cls, assignments, remaining_capacities=None):
+        """Bulk creates a `DeliveryVehicleOrders` per (`SlotDelivery`, delivery vehicle) pair, in one insert
+
+        :param assignments: (saved `SlotDelivery` object, `DeliveryVehicle` object) pairs
+        :type assignments: List[Tuple[`SlotDelivery`, `DeliveryVehicle`]]
+        :param remaining_capacities: capacity left in each vehicle, once loaded, if known
+        :type remaining_capacities: Optional[List[float]]
+        :return: saved `DeliveryVehicleOrders` objects, in the order of `assignments`
+        :rtype: List[`DeliveryVehicleOrders`]
+        """
+
+        if remaining_capacities is None:
+            remaining_capacities = [None] * len(assignments)
+
+        delivery_vehicle_orders = cls.objects.bulk_create([
+            cls(delivery_vehicle=delivery_vehicle, slot_delivery=slot_delivery, remaining_capacity=remaining_capacity)
+            for (slot_delivery, delivery_vehicle), remaining_capacity in zip(assignments, remaining_capacities)
+        ])
+
+        if delivery_vehicle_orders and delivery_vehicle_orders[0].pk is None:
+            # The backend cannot return the inserted ids (eg : SQLite); rows are inserted in order, last
+            inserted_ids = cls.objects.filter(
+                slot_delivery__in={slot_delivery.pk for slot_delivery, _ in assignments}
+            ).order_by('-id').values_list('id', flat=True)[:len(delivery_vehicle_orders)]
+            for delivery_vehicle_order, pk in zip(delivery_vehicle_orders, reversed(inserted_ids)):
+                delivery_vehicle_order.pk = pk
+                delivery_vehicle_order._state.adding = False
 
-        :param order: `Order` object
+        return delivery_vehicle_orders
+
+    def cache_orders(self, orders):
+        """Caches the `Order`s carried by the vehicle, as `prefetch_related('orders')` would
+        `self.orders.all()` then returns them without querying
+
+        :param orders: `Order` objects
+        :type orders: List[`Order`]
         """
 
-        self.orders.add(order, bulk=False)
-        self.capacity -= order.weight
+        queryset = self.orders.get_queryset()
+        queryset._result_cache = sorted(orders, key=lambda order: order.order_id)
+        queryset._prefetch_done = True
 
-        self.save()
+        if not hasattr(self, '_prefetched_objects_cache'):
+            self._prefetched_objects_cache = {}
+        self._prefetched_objects_cache['orders'] = queryset
 
     def __str__(self):
         return f"DeliveryVehicleOrder <ID : {self.delivery_vehicle}, orders : {[order for order in self.orders.all()]}>"
@@ -273,6 +873,9 @@ class Order(BaseModel):
         """
         ...
 
+    # Heaviest batch of orders accepted at once, in kgs
+    MAX_BATCH_WEIGHT = 100
+
     order_id = models.PositiveIntegerField(null=False)
     weight = models.FloatField(null=False)
 
@@ -282,12 +885,13 @@ class Order(BaseModel):
     objects = AscendingOrderManager()
 
     @classmethod
-    def bulk_create_from_dict(cls, orders_list):
-        """Bulk creates orders from a dict
+    def build_from_dict(cls, orders_list):
+        """Builds (unsaved) orders from a dict
 
         :param orders_list: dict
         :type orders_list: List[dict]
-        :return: list of `Order`s
+        :raises WeightLimitExceeded: raised if the sum of the orders' weight exceeds `MAX_BATCH_WEIGHT`
+        :return: list of unsaved `Order`s
         :rtype: List[`Order`]
         """
 
@@ -298,13 +902,322 @@ class Order(BaseModel):
             for order in orders_list
         ]
 
-        if sum(order.weight for order in orders_data) > 100:
+        cls.check_weight_limit([order.weight for order in orders_data])
+
+        return orders_data
+
+    @classmethod
+    def check_weight_limit(cls, weights):
+        """Checks the orders' weights add up to at most `MAX_BATCH_WEIGHT`
+
+        :param weights: order weights
+        :type weights: Sequence[float]
+        :raises WeightLimitExceeded: raised if the sum of the weights exceeds `MAX_BATCH_WEIGHT`
+        """
+
+        if sum(weights) > cls.MAX_BATCH_WEIGHT:
             raise cls.WeightLimitExceeded
 
-        return cls.objects.bulk_create(orders_data)
+    @classmethod
+    def bulk_create_from_dict(cls, orders_list):
+        """Bulk creates orders from a dict
+
+        :param orders_list: dict
+        :type orders_list: List[dict]
+        :return: list of `Order`s
+        :rtype: List[`Order`]
+        """
+
+        return cls.objects.bulk_create(cls.build_from_dict(orders_list))
 
     def __str__(self):
         return f"Order <order_id {self.order_id}, weight: {self.weight}>"
 
     def __repr__(self):
         return self.__str__()
+
+
+class VehicleReservation(BaseModel):
+    """Class that represents a `DeliveryVehicle` committed to a `SlotDelivery`, for a `Slot` on a date
+    A vehicle is reserved at most once per slot and date : concurrent assignments claim their vehicles
+    optimistically, and the unique constraint settles who got a vehicle first, without any table lock.
+    Deleting the `SlotDelivery` frees its vehicles
+    """
+
+    class AlreadyReserved(Exception):
+        """Raised if a vehicle being claimed is already reserved for the slot and date
+        """
+        ...
+
+    delivery_vehicle = models.ForeignKey(DeliveryVehicle, on_delete=models.CASCADE)
+    slot = models.ForeignKey(Slot, on_delete=models.CASCADE)
+    date = models.DateField(null=False)
+    slot_delivery = models.ForeignKey(SlotDelivery, on_delete=models.CASCADE, related_name='vehicle_reservations')
+
+    class Meta:
+        constraints = [
+            # Also serves the lookups of the vehicles reserved for a slot and date
+            models.UniqueConstraint(fields=('slot', 'date', 'delivery_vehicle'), name='unique_vehicle_reservation'),
+        ]
+
+    @classmethod
+    def reserved_vehicles(cls, slot_ids, date):
+        """Returns how many vehicles of each vehicle type are reserved for each slot on `date` (1 query)
+
+        :param slot_ids: `Slot` ids
+        :type slot_ids: Iterable[int]
+        :param date: date
+        :type date: datetime.date
+        :return: reserved `DeliveryVehicle` counts by vehicle type id, by slot id
+        :rtype: Dict[int, Dict[int, int]]
+        """
+
+        reserved = {slot_id: {} for slot_id in slot_ids}
+        if reserved:
+            for slot_id, vehicle_type_id, count in cls.objects.filter(slot_id__in=reserved, date=date).values_list(
+                    'slot_id', 'delivery_vehicle__vehicle_type_id').annotate(Count('id')).order_by():
+                reserved[slot_id][vehicle_type_id] = count
+
+        return reserved
+
+    @classmethod
+    def claim(cls, reservations):
+        """Inserts reservations, in one statement
+        Must run in a transaction the `AlreadyReserved` error propagates out of, so that it is rolled back
+
+        :param reservations: unsaved `VehicleReservation` objects
+        :type reservations: List[`VehicleReservation`]
+        :raises AlreadyReserved: raised if any of the vehicles is already reserved for its slot and date
+        """
+
+        try:
+            cls.objects.bulk_create(reservations)
+        except IntegrityError:
+            raise cls.AlreadyReserved
+
+    def __str__(self):
+        return (f"VehicleReservation <delivery_vehicle: {self.delivery_vehicle_id}, slot: {self.slot_id}, "
+                f"date: {self.date}>")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class AssignmentJob(BaseModel):
+    """Class that represents an Orders Delivery request run in the background (see `orders.jobs`)
+    Holds the request, its status and, once run, its response data and timings
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    )
+
+    # Statuses a job does not leave
+    FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+    slot_number = models.PositiveSmallIntegerField(null=False)
+    orders = models.JSONField(null=False)
+    strategy = models.CharField(null=True, max_length=16)
+    time_budget = models.FloatField(null=True)
+
+    status = models.CharField(choices=STATUS_CHOICES, default=PENDING, max_length=10, db_index=True)
+    cancel_requested = models.BooleanField(default=False)
+
+    slot_delivery = models.ForeignKey(SlotDelivery, on_delete=models.SET_NULL, null=True)
+    result = models.JSONField(null=True)  # response data, as the synchronous request would respond
+    started = models.DateTimeField(null=True)
+    finished = models.DateTimeField(null=True)
+    timings = models.JSONField(null=True)  # milliseconds spent per phase
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    @classmethod
+    def claim(cls, job_id):
+        """Marks a pending job as running; a job is claimed at most once
+
+        :param job_id: job id
+        :type job_id: int
+        :return: whether the job was claimed
+        :rtype: bool
+        """
+
+        return bool(cls.objects.filter(id=job_id, status=cls.PENDING).update(
+            status=cls.RUNNING, started=timezone.now()))
+
+    @classmethod
+    def cancel(cls, job_id):
+        """Cancels a job : a pending job will not run, a running job will not persist its assignment
+
+        :param job_id: job id
+        :type job_id: int
+        :return: the job's status once cancelled, or None if there is no such job
+        :rtype: Optional[str]
+        """
+
+        if cls.objects.filter(id=job_id, status=cls.PENDING).update(
+                status=cls.CANCELLED, cancel_requested=True, finished=timezone.now()):
+            return cls.CANCELLED
+
+        cls.objects.filter(id=job_id, status=cls.RUNNING).update(cancel_requested=True)
+
+        return cls.objects.filter(id=job_id).values_list('status', flat=True).first()
+
+    def __str__(self):
+        return f"AssignmentJob <id {self.id}, slot_number: {self.slot_number}, status: {self.status}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class IdempotentResponse(BaseModel):
+    """Class that represents the recorded response of an Orders Delivery request, replayed to its repeats
+    A request is identified by its `Idempotency-Key` header, or else by its slot number and canonical
+    payload (see `request_key`). The response data and headers are stored as zlib compressed JSON, until
+    `expires`, along with the hash of the request's payload : a key sent again with another payload is
+    refused rather than replayed
+    """
+
+    class AlreadyRecorded(Exception):
+        """Raised if a response is already recorded for the key
+        """
+        ...
+
+    class KeyReused(Exception):
+        """Raised if the response recorded for the key is that of a request with another payload
+        """
+        ...
+
+    key = models.CharField(max_length=64, unique=True)
+    request_hash = models.CharField(max_length=64, null=True)  # see `hash_request`
+    status_code = models.PositiveSmallIntegerField(null=False)
+    data = models.BinaryField(null=False)
+    expires = models.DateTimeField(null=False, db_index=True)
+
+    @staticmethod
+    def hash_request(slot_number, orders, options=()):
+        """Returns the hash of an Orders Delivery request's canonical payload : the same orders in any order,
+        with the same options, are the same request
+
+        :param slot_number: slot number
+        :type slot_number: int
+        :param orders: validated orders
+        :type orders: List[dict]
+        :param options: packing options, part of the payload
+        :type options: tuple
+        :return: sha256 hex digest
+        :rtype: str
+        """
+
+        canonical = json.dumps(
+            ['payload', slot_number, sorted((order['order_id'], order['order_weight']) for order in orders),
+             list(options)], separators=(',', ':'))
+
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @classmethod
+    def request_key(cls, slot_number, orders, options=(), idempotency_key=None):
+        """Returns the key of an Orders Delivery request
+
+        :param slot_number: slot number
+        :type slot_number: int
+        :param orders: validated orders
+        :type orders: List[dict]
+        :param options: packing options, part of the payload
+        :type options: tuple
+        :param idempotency_key: the request's `Idempotency-Key` header, if any; the payload is not hashed then
+        :type idempotency_key: Optional[str]
+        :return: sha256 hex digest
+        :rtype: str
+        """
+
+        if idempotency_key is None:
+            return cls.hash_request(slot_number, orders, options)
+
+        return hashlib.sha256(json.dumps(['key', slot_number, idempotency_key]).encode()).hexdigest()
+
+    @classmethod
+    def lookup(cls, key, request_hash=None):
+        """Returns the response recorded for the key, unless it expired (1 query; expired responses are
+        deleted on the way, so that the key can be recorded again)
+
+        :param key: request key
+        :type key: str
+        :param request_hash: hash of the request's payload (see `hash_request`), checked against the recorded one
+        :type request_hash: Optional[str]
+        :raises KeyReused: raised if the response recorded for the key is that of another payload
+        :return: (status code, response data, response headers), or None
+        :rtype: Optional[Tuple[int, Any, Dict[str, str]]]
+        """
+
+        recorded = cls.objects.filter(key=key).values_list(
+            'status_code', 'data', 'expires', 'request_hash').first()
+        if recorded is None:
+            return None
+
+        status_code, data, expires, recorded_hash = recorded
+        if expires <= timezone.now():
+            cls.objects.filter(key=key, expires=expires).delete()
+            return None
+        if request_hash is not None and recorded_hash is not None and request_hash != recorded_hash:
+            raise cls.KeyReused
+
+        data, headers = json.loads(zlib.decompress(data))
+
+        return status_code, data, headers
+
+    @classmethod
+    def record(cls, key, status_code, data, headers=None, ttl=None, request_hash=None):
+        """Records the response of a request
+        Must run in the transaction writing the request's assignment, which the `AlreadyRecorded` error
+        propagates out of : concurrent repeats of a request then persist a single assignment
+
+        :param key: request key
+        :type key: str
+        :param status_code: response status code
+        :type status_code: int
+        :param data: response data, JSON serializable
+        :param headers: response headers to replay
+        :type headers: Optional[Dict[str, str]]
+        :param ttl: seconds the response is replayed for, `ORDERS_IDEMPOTENCY_TTL` if None
+        :type ttl: Optional[int]
+        :param request_hash: hash of the request's payload (see `hash_request`)
+        :type request_hash: Optional[str]
+        :raises AlreadyRecorded: raised if a response is already recorded for the key
+        """
+
+        ttl = settings.ORDERS_IDEMPOTENCY_TTL if ttl is None else ttl
+
+        try:
+            cls.objects.create(key=key, status_code=status_code, request_hash=request_hash,
+                               expires=timezone.now() + datetime.timedelta(seconds=ttl),
+                               data=zlib.compress(json.dumps([data, headers or {}], separators=(',', ':')).encode()))
+        except IntegrityError:
+            raise cls.AlreadyRecorded
+
+    @classmethod
+    def delete_expired(cls):
+        """Deletes the expired responses
+
+        :return: number of responses deleted
+        :rtype: int
+        """
+
+        return cls.objects.filter(expires__lte=timezone.now()).delete()[0]
+
+    def __str__(self):
+        return f"IdempotentResponse <key: {self.key}, expires: {self.expires}>"
+
+    def __repr__(self):
+        return self.__str__()
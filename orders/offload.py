@@ -0,0 +1,72 @@
+"""Runs the blocking work of the async views (see `orders.async_views`) off the event loop
+
+Django 3.1 has no async ORM : database work goes to a pool of threads, configured by the `ORDERS_ASYNC`
+setting. Each call checks a connection out of the process' connection pool and gives it back when it
+returns (see `grofers.db.pool`); without the pool, each thread keeps its own for `CONN_MAX_AGE` :
+    'DB_WORKERS' : threads running database work; 0 runs it in the main thread, as Django's
+        `sync_to_async` does by default (eg : for tests, where it stays in the test's transaction)
+    'PACKING_WORKERS' : threads packing orders
+Each call is a unit of work : the transactions it opens are closed when it returns. The calling context
+(`contextvars`) is carried over to the thread.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_lock = threading.Lock()
+_executors = {}
+
+
+def _get_executor(name):
+    workers = settings.ORDERS_ASYNC[name]
+
+    with _lock:
+        executor = _executors.get((name, workers))
+        if executor is None:
+            executor = _executors[(name, workers)] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=f'orders-{name.lower().replace("_", "-")}')
+
+    return executor
+
+
+async def _run_in_executor(executor, func, *args, **kwargs):
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+def _database_call(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Honours `CONN_MAX_AGE`, as the end of a request would
+        close_old_connections()
+
+
+async def database(func, *args, **kwargs):
+    """Runs `func(*args, **kwargs)`, which queries the database, on a database thread
+
+    :return: what `func` returns
+    """
+
+    if not settings.ORDERS_ASYNC['DB_WORKERS']:
+        return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+
+    return await _run_in_executor(_get_executor('DB_WORKERS'), _database_call, func, *args, **kwargs)
+
+
+async def packing(func, *args, **kwargs):
+    """Runs `func(*args, **kwargs)`, which packs orders without querying the database, on a packing thread
+    Packing holds the GIL : it keeps the event loop responsive between requests, not parallel
+
+    :return: what `func` returns
+    """
+
+    return await _run_in_executor(_get_executor('PACKING_WORKERS'), func, *args, **kwargs)
@@ -0,0 +1,71 @@
+"""Bin packing of orders into delivery vehicles
+
+Works on plain weight / capacity values and returns a `Plan`; persisting the plan is left to the
+model layer. Nothing in this package may import Django.
+
+Every strategy is a callable `(weights, capacities, time_budget=None) -> Plan`
+"""
+
+from .cache import FileBackend, LocalMemoryBackend, PlanCache
+from .exact import branch_and_bound, fleet_lower_bound
+from .greedy import FreeVehicles, best_fit_decreasing, first_fit_decreasing
+from .integer import bucketed_best_fit_decreasing, bucketed_first_fit_decreasing
+from .local_search import improve, with_local_search
+from .online import OnlineFirstFit
+from .plan import CannotPack, Plan, PlannedVehicle
+from . import vectorized
+
+# The greedy strategies go through the fixed point integer path, which falls back to floats by itself.
+# Their '-ls' variants then improve the plan by local search, for the strategy's time budget
+STRATEGIES = {
+    'ffd': bucketed_first_fit_decreasing,
+    'bfd': bucketed_best_fit_decreasing,
+    'ffd-ls': with_local_search(bucketed_first_fit_decreasing),
+    'bfd-ls': with_local_search(bucketed_best_fit_decreasing),
+    'exact': branch_and_bound,
+}
+
+if vectorized.available:
+    STRATEGIES['ffd-numpy'] = vectorized.vectorized_first_fit_decreasing
+
+# Batches from this size on are packed by the NumPy backend when 'ffd' is asked for (and it applies)
+VECTORIZED_THRESHOLD = 20000
+
+
+class UnknownStrategy(Exception):
+    """Raised if an unregistered packing strategy is requested
+    """
+    ...
+
+
+def pack(weights, capacities, strategy='ffd', time_budget=None, cache=None):
+    """Packs the item weights into the vehicles with the given strategy
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles, in order of preference
+    :type capacities: Sequence[float]
+    :param strategy: name of a strategy in `STRATEGIES`
+    :type strategy: str
+    :param time_budget: seconds the strategy may take, for the strategies that search
+    :type time_budget: Optional[float]
+    :param cache: plan cache to look the batch up in first
+    :type cache: Optional[`PlanCache`]
+    :raises UnknownStrategy: raised if the strategy is not registered
+    :raises CannotPack: raised if an item does not fit in any available vehicle
+    :return: assignment plan
+    :rtype: `Plan`
+    """
+
+    try:
+        solver = STRATEGIES[strategy]
+    except KeyError:
+        raise UnknownStrategy(strategy)
+
+    if strategy == 'ffd' and len(weights) >= VECTORIZED_THRESHOLD and vectorized.accepts(weights):
+        solver = vectorized.vectorized_first_fit_decreasing
+
+    if cache is not None:
+        return cache.pack(solver, weights, capacities, strategy, time_budget=time_budget)
+
+    return solver(weights, capacities, time_budget=time_budget)
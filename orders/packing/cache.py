@@ -0,0 +1,230 @@
+"""Memoization of packing plans
+
+Every strategy places items by their rank in the decreasing weight order, never by their identity,
+so a plan only depends on the sorted weights and on the vehicles' capacities. `PlanCache` stores plans
+in that canonical form, keyed by the weight multiset and a fingerprint of the fleet, and re-maps the
+ranks onto the items of the batch at hand on a hit. Plans a search returned when its time budget ran out
+are not stored : they depend on the budget, and a later request may afford a better one.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from .greedy import decreasing
+from .plan import Plan, PlannedVehicle
+
+# Version of the compact plan format, part of the keys : entries stored in an older format are never read
+FORMAT_VERSION = 2
+
+
+def fleet_fingerprint(capacities):
+    """Returns the capacities as (capacity, run length) pairs
+
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :rtype: Tuple[Tuple[float, int]]
+    """
+
+    fingerprint = []
+    for capacity in capacities:
+        if fingerprint and fingerprint[-1][0] == capacity:
+            fingerprint[-1][1] += 1
+        else:
+            fingerprint.append([capacity, 1])
+
+    return tuple(tuple(run) for run in fingerprint)
+
+
+class LocalMemoryBackend:
+    """Class that represents an in process LRU store, bounded in size and entry age
+    """
+
+    def __init__(self, max_size=1024, ttl=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires is not None and expires <= self.clock():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileBackend:
+    """Class that represents a store of one file per entry in a local directory
+    Can be shared by the processes of a host; files are replaced atomically. Reading an entry
+    refreshes its modification time, which is used for both the age and the LRU bound
+    """
+
+    # Sets between two checks of the size bound
+    PRUNE_INTERVAL = 64
+
+    def __init__(self, directory, max_size=4096, ttl=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sets = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl is not None and os.path.getmtime(path) + self.ttl <= time.time():
+                os.remove(path)
+                return None
+            with open(path, 'rb') as entry:
+                value = pickle.load(entry)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        return value
+
+    def set(self, key, value):
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix='.')
+        with os.fdopen(descriptor, 'wb') as entry:
+            pickle.dump(value, entry, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self._path(key))
+
+        self._sets += 1
+        if self._sets % self.PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def prune(self):
+        """Removes the least recently used entries beyond `max_size`
+        """
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.startswith('.'):
+                try:
+                    entries.append((os.path.getmtime(self._path(name)), name))
+                except OSError:
+                    continue
+
+        for _, name in sorted(entries)[:max(len(entries) - self.max_size, 0)]:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                continue
+
+
+class PlanCache:
+    """Class that represents a cache of packing plans in front of a solver
+    Keeps hit / miss counters; the storage is delegated to a backend with `get(key)` / `set(key, value)`
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(sorted_weights, capacities, strategy):
+        """Returns the cache key of a batch : its strategy, sorted weights and fleet fingerprint
+        """
+
+        canonical = repr((FORMAT_VERSION, strategy, sorted_weights, fleet_fingerprint(capacities)))
+
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+
+        return self.hits / lookups if lookups else 0.0
+
+    def pack(self, solver, weights, capacities, strategy, time_budget=None):
+        """Returns the plan of `solver` for the batch, from the cache if an equal batch was packed before
+
+        :param solver: packing strategy callable
+        :param weights: item weights
+        :type weights: Sequence[float]
+        :param capacities: capacities of the available vehicles
+        :type capacities: Sequence[float]
+        :param strategy: strategy name, part of the key
+        :type strategy: str
+        :param time_budget: passed on to the solver
+        :type time_budget: Optional[float]
+        :raises CannotPack: raised by the solver; failures are not cached
+        :return: the plan; cached unless it was cut short by the time budget
+        :rtype: `Plan`
+        """
+
+        items = decreasing(weights)
+        key = self.key([weights[item] for item in items], capacities, strategy)
+
+        cached = self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return self._expand(cached, items)
+
+        self.misses += 1
+        plan = solver(weights, capacities, time_budget=time_budget)
+        if not plan.timed_out:
+            self.backend.set(key, self._compact(plan, items))
+
+        return plan
+
+    @staticmethod
+    def _compact(plan, items):
+        """Returns the plan as plain tuples, with items replaced by their rank"""
+
+        rank = {item: position for position, item in enumerate(items)}
+        vehicles = tuple(
+            (planned_vehicle.vehicle, planned_vehicle.capacity, planned_vehicle.remaining,
+             tuple(rank[item] for item in planned_vehicle.items))
+            for planned_vehicle in plan
+        )
+
+        return plan.strategy, plan.lower_bound, plan.moves, vehicles
+
+    @staticmethod
+    def _expand(cached, items):
+        """Rebuilds a `Plan` from its compact form, mapping ranks onto this batch's items"""
+
+        strategy, lower_bound, moves, vehicles = cached
+        plan = Plan(strategy=strategy)
+        plan.lower_bound = lower_bound
+        plan.moves = moves
+        for vehicle, capacity, remaining, ranks in vehicles:
+            planned_vehicle = PlannedVehicle(vehicle, capacity)
+            planned_vehicle.remaining = remaining
+            planned_vehicle.items = [items[position] for position in ranks]
+            plan.vehicles.append(planned_vehicle)
+
+        return plan
@@ -0,0 +1,254 @@
+import heapq
+import time
+
+from .greedy import decreasing, first_fit_decreasing
+from .plan import CannotPack, Plan
+
+# How many search nodes to expand between two checks of the time budget
+CLOCK_CHECK_INTERVAL = 256
+
+
+class _TimeUp(Exception):
+    ...
+
+
+def fleet_lower_bound(total_weight, capacities):
+    """Returns the least number of vehicles whose capacities add up to `total_weight`
+
+    :param total_weight: weight to carry
+    :type total_weight: float
+    :param capacities: capacities of the available vehicles
+    :type capacities: Iterable[float]
+    :return: lower bound on the number of vehicles, or None if the whole fleet cannot carry the weight
+    :rtype: Optional[int]
+    """
+
+    count = 0
+    for capacity in sorted(capacities, reverse=True):
+        if total_weight <= 0:
+            break
+        total_weight -= capacity
+        count += 1
+
+    return count if total_weight <= 0 else None
+
+
+def branch_and_bound(weights, capacities, time_budget=None):
+    """Packs the items with the fewest vehicles, and then the least total capacity
+
+    The vehicle mixes the fleet allows (how many vehicles of each capacity class) are generated lazily
+    and tried in ascending (vehicles, capacity) order, starting from the fleet lower bound and stopping
+    at the First Fit Decreasing plan's cost; the first mix the items fit in is optimal.
+    Whether the items fit in a mix is decided by a depth first search, heaviest item first, which
+    skips symmetric nodes (vehicles with the same remaining capacity, equal items in a different
+    order) and prunes nodes wasting more capacity than the mix can spare.
+
+    If `time_budget` runs out, the best plan found so far (at worst, the First Fit Decreasing one) is
+    returned with `optimal` False; its `lower_bound` and `gap` tell how far from optimal it may be
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :param time_budget: seconds the search may take, unbounded if None
+    :type time_budget: Optional[float]
+    :raises CannotPack: raised if the items cannot be packed in the available vehicles
+    :return: assignment plan
+    :rtype: `Plan`
+    """
+
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    items = decreasing(weights)
+    item_weights = [weights[item] for item in items]
+
+    if not items:
+        plan = Plan(strategy='exact')
+        plan.lower_bound = 0
+        return plan
+
+    total_weight = sum(item_weights)
+    lower_bound = fleet_lower_bound(total_weight, capacities)
+    if lower_bound is None or item_weights[0] > max(capacities):
+        raise CannotPack(items[0])
+
+    # Vehicles of a capacity class are interchangeable; they are used in the order given
+    classes = sorted(set(capacities))
+    class_vehicles = [[vehicle for vehicle, capacity in enumerate(capacities) if capacity == class_capacity]
+                      for class_capacity in classes]
+
+    try:
+        best = first_fit_decreasing(weights, capacities)
+        best_cost = (best.vehicle_count, best.total_capacity)
+    except CannotPack:
+        best, best_cost = None, (len(capacities), sum(capacities))
+
+    search = _FitSearch(item_weights, deadline)
+    try:
+        for cost, mix in _vehicle_mixes(classes, class_vehicles, total_weight, item_weights[0], lower_bound,
+                                        best_cost, deadline):
+            lower_bound = cost[0]
+            if cost >= best_cost and best is not None:
+                break
+
+            bin_capacities = [capacity for capacity, count in zip(classes, mix) for _ in range(count)]
+            item_bins = search.fit(bin_capacities)
+            if item_bins is not None:
+                best = _build_plan(items, item_bins, bin_capacities, classes, class_vehicles, weights)
+                best_cost = cost
+                break
+        else:
+            if best is None:
+                raise CannotPack(None)
+            lower_bound = best.vehicle_count
+    except _TimeUp:
+        if best is None:
+            raise CannotPack(None)
+        best.timed_out = True
+
+    best.strategy = 'exact'
+    best.lower_bound = min(lower_bound, best.vehicle_count)
+    best.nodes = search.nodes
+
+    return best
+
+
+def _vehicle_mixes(classes, class_vehicles, total_weight, heaviest, min_count, max_cost, deadline):
+    """Yields ((vehicles, capacity), vehicles per class) for every mix of the fleet that could carry the
+    items, in ascending cost, up to `max_cost`
+
+    The mixes of a vehicle count are generated cheapest first : from the one filling the smallest classes
+    first, each mix leads to the ones moving a vehicle up to the next class, kept in a heap by capacity
+
+    :raises _TimeUp: raised if the deadline passes
+    """
+
+    limits = [len(vehicles) for vehicles in class_vehicles]
+    generated = 0
+
+    for count in range(min_count, max_cost[0] + 1):
+        cheapest, left = [], count
+        for limit in limits:
+            cheapest.append(min(left, limit))
+            left -= cheapest[-1]
+        if left:
+            # Fewer vehicles in the fleet
+            return
+
+        cheapest = tuple(cheapest)
+        heap = [(sum(capacity * class_count for capacity, class_count in zip(classes, cheapest)), cheapest)]
+        seen = {cheapest}
+        while heap:
+            generated += 1
+            if (deadline is not None and generated % CLOCK_CHECK_INTERVAL == 0
+                    and time.perf_counter() > deadline):
+                raise _TimeUp
+
+            capacity, mix = heapq.heappop(heap)
+            largest = max(class_capacity for class_capacity, class_count in zip(classes, mix) if class_count)
+            if capacity >= total_weight and largest >= heaviest:
+                yield (count, capacity), mix
+
+            for idx in range(len(mix) - 1):
+                if mix[idx] and mix[idx + 1] < limits[idx + 1]:
+                    upgraded = mix[:idx] + (mix[idx] - 1, mix[idx + 1] + 1) + mix[idx + 2:]
+                    if upgraded not in seen:
+                        seen.add(upgraded)
+                        heapq.heappush(heap, (capacity + classes[idx + 1] - classes[idx], upgraded))
+
+
+class _FitSearch:
+    """Depth first search deciding whether the items fit in a given set of vehicles
+    Iterative, with the state of each item's position kept in lists : batches may be deeper than the
+    interpreter's recursion limit
+    """
+
+    def __init__(self, item_weights, deadline):
+        self.item_weights = item_weights
+        self.smallest = item_weights[-1]
+        self.deadline = deadline
+        self.nodes = 0
+
+    def fit(self, bin_capacities):
+        """Returns the vehicle of each item, or None if the items do not fit
+
+        :raises _TimeUp: raised if the deadline passes
+        """
+
+        item_weights = self.item_weights
+        items = len(item_weights)
+        remaining = list(bin_capacities)
+        bins = len(remaining)
+        slack = sum(bin_capacities) - sum(item_weights)
+
+        item_bins = [0] * items
+        next_bins = [0] * items  # first vehicle left to try, per position
+        tried = [None] * items  # remaining capacities already tried, per position
+        wastes = [0] * (items + 1)  # capacity lost for good before each position
+
+        position, entering = 0, True
+        while position >= 0:
+            weight = item_weights[position] if position < items else None
+            if entering:
+                self.nodes += 1
+                if (self.deadline is not None and self.nodes % CLOCK_CHECK_INTERVAL == 0
+                        and time.perf_counter() > self.deadline):
+                    raise _TimeUp
+
+                if position == items:
+                    return item_bins
+
+                # Equal items go in non decreasing vehicle order
+                next_bins[position] = (item_bins[position - 1]
+                                       if position and item_weights[position - 1] == weight else 0)
+                tried[position] = set()
+            else:
+                # Backtrack : take the item out of its vehicle
+                bin_idx = item_bins[position]
+                left = remaining[bin_idx]
+                remaining[bin_idx] = left + weight
+                if left == 0:
+                    # The item filled the vehicle exactly; no other placement can do better
+                    position -= 1
+                    continue
+
+            waste = wastes[position]
+            for bin_idx in range(next_bins[position], bins):
+                bin_remaining = remaining[bin_idx]
+                if bin_remaining < weight or bin_remaining in tried[position]:
+                    continue
+                tried[position].add(bin_remaining)
+
+                left = bin_remaining - weight
+                # Capacity no remaining item can use is lost for good
+                bin_waste = waste + left if left < self.smallest else waste
+                if bin_waste > slack:
+                    continue
+
+                remaining[bin_idx] = left
+                item_bins[position] = bin_idx
+                next_bins[position] = bin_idx + 1
+                wastes[position + 1] = bin_waste
+                position, entering = position + 1, True
+                break
+            else:
+                position, entering = position - 1, False
+
+        return None
+
+
+def _build_plan(items, item_bins, bin_capacities, classes, class_vehicles, weights):
+    """Builds the `Plan` of a fit, opening the vehicles in the order of their heaviest item"""
+
+    plan = Plan(strategy='exact')
+    used = [0] * len(classes)
+    opened = {}
+
+    for position, item in enumerate(items):
+        bin_idx = item_bins[position]
+        if bin_idx not in opened:
+            class_idx = classes.index(bin_capacities[bin_idx])
+            opened[bin_idx] = plan.open(class_vehicles[class_idx][used[class_idx]], bin_capacities[bin_idx])
+            used[class_idx] += 1
+        opened[bin_idx].add(item, weights[item])
+
+    return plan
@@ -0,0 +1,243 @@
+import heapq
+from collections import deque
+
+from .plan import CannotPack, Plan
+
+
+def decreasing(weights):
+    """Returns the item positions in descending order of weight
+    Items of equal weight keep their original order
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :rtype: List[int]
+    """
+
+    return sorted(range(len(weights)), key=weights.__getitem__, reverse=True)
+
+
+class FreeVehicles:
+    """Class that represents the vehicles not opened yet, as a stack per capacity
+    Finds the smallest free vehicle large enough for a weight, takes and releases vehicles in
+    O(log(capacities)), with a `FirstFitTree` over the capacities in ascending order
+    """
+
+    def __init__(self, capacities, taken=()):
+        """
+        :param capacities: capacities of the vehicles
+        :type capacities: Sequence[float]
+        :param taken: positions of the vehicles not free
+        :type taken: Collection[int]
+        """
+
+        self.capacities = capacities
+        self.stacks = {capacity: deque() for capacity in capacities}
+        for vehicle, capacity in enumerate(capacities):
+            if vehicle not in taken:
+                self.stacks[capacity].append(vehicle)
+
+        # Every capacity, ascending; the capacities with a free vehicle are set in the tree
+        self.classes = sorted(self.stacks)
+        self.positions = {capacity: position for position, capacity in enumerate(self.classes)}
+        self.tree = FirstFitTree(len(self.classes))
+        for position, capacity in enumerate(self.classes):
+            if self.stacks[capacity]:
+                self.tree.update(position, capacity)
+
+    def take(self, weight):
+        """Takes the smallest free vehicle large enough for `weight`; the first given, amongst equals
+
+        :param weight: weight to carry
+        :type weight: float
+        :return: the vehicle's position in `capacities`, or None if there is no such vehicle
+        :rtype: Optional[int]
+        """
+
+        position = self.tree.find(weight)
+        if position is None:
+            return None
+
+        stack = self.stacks[self.classes[position]]
+        vehicle = stack.popleft()
+        if not stack:
+            self.tree.update(position, float('-inf'))
+
+        return vehicle
+
+    def smallest(self, weight):
+        """Returns the capacity of the smallest free vehicle large enough for `weight`, without taking it
+
+        :param weight: weight to carry
+        :type weight: float
+        :rtype: Optional[float]
+        """
+
+        position = self.tree.find(weight)
+
+        return None if position is None else self.classes[position]
+
+    def release(self, vehicle):
+        """Gives a taken vehicle back; it is taken again before the vehicles of its capacity given earlier
+
+        :param vehicle: the vehicle's position in `capacities`
+        :type vehicle: int
+        """
+
+        capacity = self.capacities[vehicle]
+        stack = self.stacks[capacity]
+        if not stack:
+            self.tree.update(self.positions[capacity], capacity)
+        stack.appendleft(vehicle)
+
+    def take_largest(self):
+        """Takes a free vehicle of the largest capacity; the first given, amongst equals
+
+        :return: the vehicle's position in `capacities`, or None if every vehicle is taken
+        :rtype: Optional[int]
+        """
+
+        largest = self.tree.tree[1]
+        if largest == float('-inf'):
+            return None
+
+        return self.take(largest)
+
+
+class FirstFitTree:
+    """Class that represents a max segment tree over the remaining capacities of the opened vehicles
+    Finds the first opened vehicle an item fits in, and updates a remaining capacity, in O(log n)
+    """
+
+    def __init__(self, size):
+        self.leaves = 1
+        while self.leaves < max(size, 1):
+            self.leaves *= 2
+
+        self.tree = [float('-inf')] * (2 * self.leaves)
+
+    def update(self, position, remaining):
+        """Sets the remaining capacity of the `position`th opened vehicle
+        """
+
+        tree = self.tree
+        node = position + self.leaves
+        tree[node] = remaining
+        node //= 2
+        while node:
+            left, right = tree[2 * node], tree[2 * node + 1]
+            largest = left if left >= right else right
+            if tree[node] == largest:
+                # The ancestors are unchanged too
+                break
+            tree[node] = largest
+            node //= 2
+
+    def find(self, weight):
+        """Returns the position of the first opened vehicle with a remaining capacity of at least `weight`
+
+        :rtype: Optional[int]
+        """
+
+        tree = self.tree
+        if tree[1] < weight:
+            return None
+
+        node = 1
+        while node < self.leaves:
+            node *= 2
+            if tree[node] < weight:
+                node += 1
+
+        return node - self.leaves
+
+
+def first_fit_decreasing(weights, capacities, time_budget=None):
+    """Packs the items with the First Fit Decreasing algorithm
+
+    Each item (heaviest first) goes into the first opened vehicle it fits in; if none, the smallest
+    free vehicle large enough (the first given, amongst equal capacities) is opened for it.
+    With `capacities` in ascending order, that is the first free vehicle large enough.
+    Both lookups are indexed (`FirstFitTree`, `FreeVehicles`) : O(n log n) overall
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :param time_budget: unused, First Fit Decreasing does not search
+    :raises CannotPack: raised if an item does not fit in any available vehicle
+    :return: assignment plan
+    :rtype: `Plan`
+    """
+
+    plan = Plan(strategy='ffd')
+    free_vehicles = FreeVehicles(capacities)
+    opened = FirstFitTree(min(len(weights), len(capacities)))
+
+    for item in decreasing(weights):
+        weight = weights[item]
+
+        position = opened.find(weight)
+        if position is None:
+            # Open a new vehicle
+            vehicle = free_vehicles.take(weight)
+            if vehicle is None:
+                raise CannotPack(item)
+            position = len(plan.vehicles)
+            plan.open(vehicle, capacities[vehicle])
+
+        planned_vehicle = plan.vehicles[position]
+        planned_vehicle.add(item, weight)
+        opened.update(position, planned_vehicle.remaining)
+
+    return plan
+
+
+def best_fit_decreasing(weights, capacities, time_budget=None):
+    """Packs the items with the Best Fit Decreasing algorithm
+
+    Each item (heaviest first) goes into the opened vehicle it leaves the least room in (the first
+    opened, amongst equals); if none, the smallest free vehicle large enough is opened for it.
+    Items come heaviest first, so an opened vehicle an item fits in fits every later item : those sit in a
+    heap by (remaining capacity, position), whose top is the best fit, and the others in a heap by
+    largest remaining capacity, moved over as the items get lighter. O(n log n) overall
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :param time_budget: unused, Best Fit Decreasing does not search
+    :raises CannotPack: raised if an item does not fit in any available vehicle
+    :return: assignment plan
+    :rtype: `Plan`
+    """
+
+    plan = Plan(strategy='bfd')
+    free_vehicles = FreeVehicles(capacities)
+    fitting = []  # (remaining capacity, position) of the opened vehicles the current item fits in
+    too_full = []  # (-remaining capacity, position) of the other opened vehicles
+
+    for item in decreasing(weights):
+        weight = weights[item]
+
+        while too_full and -too_full[0][0] >= weight:
+            remaining, position = heapq.heappop(too_full)
+            heapq.heappush(fitting, (-remaining, position))
+
+        if fitting:
+            _, position = heapq.heappop(fitting)
+        else:
+            # Open a new vehicle
+            vehicle = free_vehicles.take(weight)
+            if vehicle is None:
+                raise CannotPack(item)
+            position = len(plan.vehicles)
+            plan.open(vehicle, capacities[vehicle])
+
+        planned_vehicle = plan.vehicles[position]
+        planned_vehicle.add(item, weight)
+        if planned_vehicle.remaining >= weight:
+            heapq.heappush(fitting, (planned_vehicle.remaining, position))
+        else:
+            heapq.heappush(too_full, (-planned_vehicle.remaining, position))
+
+    return plan
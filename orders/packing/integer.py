@@ -0,0 +1,176 @@
+"""Exact packing of weights representable as fixed point integers
+
+Weights (and capacities) are scaled to integers, eg : grams for weights given to the gram, so loads
+and remaining capacities are exact, with no float drift. Sorting is a counting sort over the weight
+values, O(n + W).
+"""
+
+import heapq
+
+from .greedy import FirstFitTree, FreeVehicles, best_fit_decreasing, first_fit_decreasing
+from .plan import CannotPack, Plan
+
+# Finest fixed point scale tried : weights given to the gram
+SCALES = (1, 10, 100, 1000)
+
+# Largest scaled weight / capacity the buckets are allocated for
+MAX_BUCKETS = 1 << 20
+
+
+def fixed_point(weights, capacities):
+    """Scales the weights and capacities to non negative integers, with the coarsest scale that is exact
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :return: (scaled weights, scaled capacities, scale), or None if no scale in `SCALES` is exact
+    :rtype: Optional[Tuple[List[int], List[int], int]]
+    """
+
+    values = list(weights) + list(capacities)
+    if any(value < 0 for value in values):
+        return None
+
+    for scale in SCALES:
+        scaled = [value * scale for value in values]
+        if all(float(value).is_integer() for value in scaled):
+            scaled = [int(value) for value in scaled]
+            if max(scaled, default=0) > MAX_BUCKETS:
+                return None
+            return scaled[:len(weights)], scaled[len(weights):], scale
+
+    return None
+
+
+def counting_sort_decreasing(weights):
+    """Yields (weight, items) for each weight value, heaviest first; items keep their original order
+
+    :param weights: non negative integer weights
+    :type weights: Sequence[int]
+    """
+
+    buckets = [None] * (max(weights, default=0) + 1)
+    for item, weight in enumerate(weights):
+        if buckets[weight] is None:
+            buckets[weight] = []
+        buckets[weight].append(item)
+
+    for weight in range(len(buckets) - 1, -1, -1):
+        if buckets[weight] is not None:
+            yield weight, buckets[weight]
+
+
+def _unscale(plan, capacities, scale):
+    """Converts the plan's capacities and remaining capacities back to the caller's unit"""
+
+    for planned_vehicle in plan:
+        planned_vehicle.capacity = capacities[planned_vehicle.vehicle]
+        if scale != 1:
+            planned_vehicle.remaining /= scale
+
+    return plan
+
+
+def bucketed_first_fit_decreasing(weights, capacities, time_budget=None):
+    """Packs the items with the First Fit Decreasing algorithm, in fixed point integers
+
+    Items come out of a counting sort one run of equal weights at a time; the first opened vehicle
+    with room (`FirstFitTree`) takes as many items of the run as it can in one step.
+    Same plan as `first_fit_decreasing`, without float drift; falls back to it if the weights have
+    no exact fixed point representation
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :param time_budget: unused, First Fit Decreasing does not search
+    :raises CannotPack: raised if an item does not fit in any available vehicle
+    :return: assignment plan
+    :rtype: `Plan`
+    """
+
+    fixed = fixed_point(weights, capacities)
+    if fixed is None:
+        return first_fit_decreasing(weights, capacities)
+    int_weights, int_capacities, scale = fixed
+
+    plan = Plan(strategy='ffd')
+    free_vehicles = FreeVehicles(int_capacities)
+    opened = FirstFitTree(min(len(weights), len(capacities)))
+
+    for weight, run in counting_sort_decreasing(int_weights):
+        placed = 0
+        while placed < len(run):
+            position = opened.find(weight)
+            if position is None:
+                # Open a new vehicle
+                vehicle = free_vehicles.take(weight)
+                if vehicle is None:
+                    raise CannotPack(run[placed])
+                position = len(plan.vehicles)
+                plan.open(vehicle, int_capacities[vehicle])
+
+            planned_vehicle = plan.vehicles[position]
+            count = len(run) - placed
+            if weight:
+                count = min(count, planned_vehicle.remaining // weight)
+
+            planned_vehicle.items.extend(run[placed:placed + count])
+            planned_vehicle.remaining -= count * weight
+            opened.update(position, planned_vehicle.remaining)
+            placed += count
+
+    return _unscale(plan, capacities, scale)
+
+
+def bucketed_best_fit_decreasing(weights, capacities, time_budget=None):
+    """Packs the items with the Best Fit Decreasing algorithm, in fixed point integers
+
+    Opened vehicles sit in a bucket per remaining capacity (a heap of their positions); the smallest
+    non empty bucket that fits an item is found from a bitmask of the non empty buckets.
+    Same plan as `best_fit_decreasing`, without float drift; falls back to it if the weights have
+    no exact fixed point representation
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :param time_budget: unused, Best Fit Decreasing does not search
+    :raises CannotPack: raised if an item does not fit in any available vehicle
+    :return: assignment plan
+    :rtype: `Plan`
+    """
+
+    fixed = fixed_point(weights, capacities)
+    if fixed is None:
+        return best_fit_decreasing(weights, capacities)
+    int_weights, int_capacities, scale = fixed
+
+    plan = Plan(strategy='bfd')
+    free_vehicles = FreeVehicles(int_capacities)
+    buckets = {}  # remaining capacity -> heap of opened vehicle positions
+    non_empty = 0  # bit r is set if buckets[r] is not empty
+
+    for weight, run in counting_sort_decreasing(int_weights):
+        for item in run:
+            fitting = non_empty >> weight
+            if fitting:
+                remaining = weight + (fitting & -fitting).bit_length() - 1
+                position = heapq.heappop(buckets[remaining])
+                if not buckets[remaining]:
+                    non_empty ^= 1 << remaining
+            else:
+                # Open a new vehicle
+                vehicle = free_vehicles.take(weight)
+                if vehicle is None:
+                    raise CannotPack(item)
+                position = len(plan.vehicles)
+                plan.open(vehicle, int_capacities[vehicle])
+
+            planned_vehicle = plan.vehicles[position]
+            planned_vehicle.add(item, weight)
+            heapq.heappush(buckets.setdefault(planned_vehicle.remaining, []), position)
+            non_empty |= 1 << planned_vehicle.remaining
+
+    return _unscale(plan, capacities, scale)
@@ -0,0 +1,197 @@
+"""Local search improving a packing plan once built
+
+Construction heuristics never reconsider a vehicle once opened : First Fit Decreasing opens the smallest
+vehicle the heaviest item left fits in, eg : two scooters where one truck would do. `improve` then applies
+moves to the plan for as long as they lower its cost, the (vehicles, total capacity) pair `branch_and_bound`
+minimizes :
+    merge : the items of two vehicles go into one, the smallest of theirs or of the free vehicles they fit in
+    downsize : a vehicle is swapped for the smallest free vehicle carrying its load
+    swap : items of two vehicles are exchanged, if it lets the vehicle they lighten be downsized
+Vehicle loads are kept up to date, so a move is evaluated in O(1), plus a lookup of the smallest free
+vehicle large enough, in O(log(capacities)).
+"""
+
+import functools
+import time
+
+from .greedy import FreeVehicles
+
+# How many moves to evaluate between two checks of the time budget
+CLOCK_CHECK_INTERVAL = 256
+
+
+class _TimeUp(Exception):
+    ...
+
+
+class _LocalSearch:
+    """The plan being improved, along with the free vehicles"""
+
+    def __init__(self, plan, weights, capacities, deadline):
+        self.plan = plan
+        self.weights = weights
+        self.capacities = capacities
+        self.free_vehicles = FreeVehicles(capacities, taken={planned_vehicle.vehicle for planned_vehicle in plan})
+        self.deadline = deadline
+        self.evaluations = 0
+
+    def evaluate(self):
+        self.evaluations += 1
+        if (self.deadline is not None and self.evaluations % CLOCK_CHECK_INTERVAL == 0
+                and time.perf_counter() > self.deadline):
+            raise _TimeUp
+
+    def swap_vehicle(self, planned_vehicle, load):
+        """Swaps the vehicle for the smallest free vehicle carrying `load`"""
+
+        vehicle = self.free_vehicles.take(load)
+        self.free_vehicles.release(planned_vehicle.vehicle)
+        planned_vehicle.vehicle = vehicle
+        planned_vehicle.capacity = self.capacities[vehicle]
+
+    def merge(self, first, second):
+        """Moves the items of `second` into `first`, in the smallest vehicle carrying both loads
+
+        :return: whether the vehicles could be merged
+        :rtype: bool
+        """
+
+        self.evaluate()
+        load = first.load + second.load
+        kept = min((planned_vehicle for planned_vehicle in (first, second) if planned_vehicle.capacity >= load),
+                   key=lambda planned_vehicle: planned_vehicle.capacity, default=None)
+        free_capacity = self.free_vehicles.smallest(load)
+        if kept is None and free_capacity is None:
+            return False
+
+        if kept is None or (free_capacity is not None and free_capacity < kept.capacity):
+            self.swap_vehicle(first, load)
+        elif kept is second:
+            self.free_vehicles.release(first.vehicle)
+            first.vehicle, first.capacity = second.vehicle, second.capacity
+            second.vehicle = None
+        if second.vehicle is not None:
+            self.free_vehicles.release(second.vehicle)
+
+        first.items.extend(second.items)
+        first.remaining = first.capacity - load
+        self.plan.vehicles.remove(second)
+
+        return True
+
+    def downsize(self, planned_vehicle):
+        """Swaps the vehicle for a smaller free vehicle carrying its load, if there is one
+
+        :return: whether the vehicle was downsized
+        :rtype: bool
+        """
+
+        self.evaluate()
+        load = planned_vehicle.load
+        free_capacity = self.free_vehicles.smallest(load)
+        if free_capacity is None or free_capacity >= planned_vehicle.capacity:
+            return False
+
+        self.swap_vehicle(planned_vehicle, load)
+        planned_vehicle.remaining = planned_vehicle.capacity - load
+
+        return True
+
+    def swap(self, lighter, heavier):
+        """Exchanges an item of `lighter` for a lighter item of `heavier`, if `lighter` can then be downsized
+
+        :return: whether items were exchanged
+        :rtype: bool
+        """
+
+        weights = self.weights
+        for position, item in enumerate(lighter.items):
+            for other_position, other_item in enumerate(heavier.items):
+                self.evaluate()
+                delta = weights[item] - weights[other_item]
+                if delta <= 0 or delta > heavier.remaining:
+                    continue
+
+                load = lighter.load - delta
+                free_capacity = self.free_vehicles.smallest(load)
+                if free_capacity is None or free_capacity >= lighter.capacity:
+                    continue
+
+                lighter.items[position], heavier.items[other_position] = other_item, item
+                heavier.remaining -= delta
+                self.swap_vehicle(lighter, load)
+                lighter.remaining = lighter.capacity - load
+                return True
+
+        return False
+
+    def find_move(self):
+        """Applies the first improving move found : merges first, as they save a vehicle, lightest vehicles first
+
+        :return: the move, or None if there is none
+        :rtype: Optional[str]
+        """
+
+        planned_vehicles = sorted(self.plan.vehicles, key=lambda planned_vehicle: planned_vehicle.load)
+
+        for idx, first in enumerate(planned_vehicles):
+            for second in planned_vehicles[idx + 1:]:
+                if self.merge(second, first):
+                    return 'merge'
+
+        for planned_vehicle in planned_vehicles:
+            if self.downsize(planned_vehicle):
+                return 'downsize'
+
+        for lighter in planned_vehicles:
+            for heavier in planned_vehicles:
+                if heavier is not lighter and self.swap(lighter, heavier):
+                    return 'swap'
+
+        return None
+
+
+def improve(plan, weights, capacities, time_budget=None):
+    """Improves a plan in place with merge, downsize and swap moves (see the module's docstring)
+    Stops when no move lowers the plan's (vehicles, total capacity) cost, or once `time_budget` runs out;
+    the plan is valid after every move
+
+    :param plan: plan built over `weights` and `capacities`
+    :type plan: `Plan`
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :param time_budget: seconds the search may take, unbounded if None
+    :type time_budget: Optional[float]
+    :return: the plan, with the number of moves accepted in `moves`
+    :rtype: `Plan`
+    """
+
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    search = _LocalSearch(plan, weights, capacities, deadline)
+
+    plan.moves = 0
+    try:
+        while search.find_move() is not None:
+            plan.moves += 1
+    except _TimeUp:
+        plan.timed_out = True
+
+    return plan
+
+
+def with_local_search(solver):
+    """Returns a strategy running `solver`, then improving its plan (see `improve`)
+    Meant for construction heuristics, which do not use their time budget : it goes to the local search
+
+    :param solver: packing strategy callable
+    """
+
+    @functools.wraps(solver)
+    def improved_solver(weights, capacities, time_budget=None):
+        plan = solver(weights, capacities, time_budget=time_budget)
+
+        return improve(plan, weights, capacities, time_budget=time_budget)
+
+    return improved_solver
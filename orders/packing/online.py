@@ -0,0 +1,78 @@
+"""Packing of items one at a time, as they arrive
+
+Items are not known in advance, so they cannot be sorted : each goes into the first opened vehicle it
+fits in, and vehicles are opened largest first to keep their number down. Only the opened vehicles'
+remaining capacities are kept, so memory does not grow with the number of items.
+"""
+
+from .greedy import FirstFitTree, FreeVehicles
+from .plan import CannotPack
+
+
+class OnlineFirstFit:
+    """Class that represents a First Fit packing fed one item at a time
+    `vehicles`, `remaining` and `counts` hold, per opened vehicle (in opening order), its position in
+    `capacities`, its remaining capacity and how many items it carries
+    """
+
+    def __init__(self, capacities):
+        self.capacities = capacities
+        self.free_vehicles = FreeVehicles(capacities)
+        self.opened = FirstFitTree(len(capacities))
+        self.vehicles = []
+        self.remaining = []
+        self.counts = []
+        self.items = 0
+
+    def add(self, weight):
+        """Places the next item
+
+        :param weight: weight of the item
+        :type weight: float
+        :raises CannotPack: raised if the item does not fit in any opened or free vehicle
+        :return: position of the opened vehicle the item goes into; `len(vehicles) - 1` if it was just opened
+        :rtype: int
+        """
+
+        position = self.opened.find(weight)
+        if position is None:
+            vehicle = self.free_vehicles.take_largest()
+            if vehicle is None or self.capacities[vehicle] < weight:
+                raise CannotPack(self.items)
+            position = len(self.vehicles)
+            self.vehicles.append(vehicle)
+            self.remaining.append(self.capacities[vehicle])
+            self.counts.append(0)
+
+        self.remaining[position] -= weight
+        self.counts[position] += 1
+        self.opened.update(position, self.remaining[position])
+        self.items += 1
+
+        return position
+
+    def loads(self):
+        """Returns the weight carried by each opened vehicle
+
+        :rtype: List[float]
+        """
+
+        return [self.capacities[vehicle] - remaining for vehicle, remaining in zip(self.vehicles, self.remaining)]
+
+    def downsize(self):
+        """Swaps the opened vehicles for the smallest vehicles that can carry their loads
+        Loads are matched heaviest first, each to the smallest vehicle large enough; the same vehicles
+        then carry the same loads, so the items stay where they are. Meant for once every item is placed
+
+        :return: position in `capacities` of the vehicle now carrying each opened vehicle's load
+        :rtype: List[int]
+        """
+
+        free_vehicles = FreeVehicles(self.capacities)
+        loads = self.loads()
+        for position in sorted(range(len(loads)), key=loads.__getitem__, reverse=True):
+            vehicle = free_vehicles.take(loads[position])
+            self.remaining[position] = self.capacities[vehicle] - loads[position]
+            self.vehicles[position] = vehicle
+
+        return list(self.vehicles)
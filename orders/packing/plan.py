@@ -0,0 +1,116 @@
+class CannotPack(Exception):
+    """Raised if an item cannot be placed in any of the available vehicles
+    """
+
+    def __init__(self, item=None):
+        super().__init__(item)
+        self.item = item
+
+
+class PlannedVehicle:
+    """Class that represents a vehicle opened by a packing strategy, along with the items it carries
+
+    `vehicle` and `items` are positions in the capacities / weights sequences given to the solver
+    """
+
+    __slots__ = ('vehicle', 'capacity', 'remaining', 'items')
+
+    def __init__(self, vehicle, capacity):
+        self.vehicle = vehicle
+        self.capacity = capacity
+        self.remaining = capacity
+        self.items = []
+
+    @property
+    def load(self):
+        """Returns the weight carried by the vehicle
+
+        :return: load
+        :rtype: float
+        """
+
+        return self.capacity - self.remaining
+
+    def add(self, item, weight):
+        """Places an item in the vehicle
+
+        :param item: position of the item in the weights sequence
+        :type item: int
+        :param weight: weight of the item
+        :type weight: float
+        """
+
+        self.items.append(item)
+        self.remaining -= weight
+
+    def __repr__(self):
+        return f"PlannedVehicle <vehicle: {self.vehicle}, capacity: {self.capacity}, items: {self.items}>"
+
+
+class Plan:
+    """Class that represents an assignment plan : the vehicles used, in the order they were opened
+    """
+
+    def __init__(self, strategy=None):
+        self.strategy = strategy
+        self.vehicles = []
+        # Least number of vehicles any plan needs, when the strategy computes it
+        self.lower_bound = None
+        # Search nodes expanded, for the strategies that search
+        self.nodes = 0
+        # Moves accepted by the local search, when the plan was improved (see `local_search.improve`)
+        self.moves = 0
+        # Whether the search was cut short by its time budget : a larger budget may find a better plan
+        self.timed_out = False
+
+    def open(self, vehicle, capacity):
+        """Opens a new vehicle in the plan
+
+        :param vehicle: position of the vehicle in the capacities sequence
+        :type vehicle: int
+        :param capacity: capacity of the vehicle
+        :type capacity: float
+        :return: the opened vehicle
+        :rtype: `PlannedVehicle`
+        """
+
+        planned_vehicle = PlannedVehicle(vehicle, capacity)
+        self.vehicles.append(planned_vehicle)
+
+        return planned_vehicle
+
+    @property
+    def vehicle_count(self):
+        return len(self.vehicles)
+
+    @property
+    def total_capacity(self):
+        return sum(vehicle.capacity for vehicle in self.vehicles)
+
+    @property
+    def gap(self):
+        """Returns the optimality gap on the number of vehicles, relative to the plan
+        0 when the plan is proven optimal; None if the strategy does not compute a lower bound
+
+        :rtype: Optional[float]
+        """
+
+        if self.lower_bound is None:
+            return None
+        if not self.vehicles:
+            return 0.0
+
+        return (self.vehicle_count - self.lower_bound) / self.vehicle_count
+
+    @property
+    def optimal(self):
+        return self.gap == 0
+
+    def __iter__(self):
+        return iter(self.vehicles)
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def __repr__(self):
+        return f"Plan <strategy: {self.strategy}, vehicles: {self.vehicles}>"
@@ -0,0 +1,131 @@
+"""First Fit Decreasing over NumPy arrays, for very large batches
+
+NumPy is optional : without it, `available` is False and `pack` never switches to this backend.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .plan import CannotPack, Plan, PlannedVehicle
+
+available = np is not None
+
+
+def accepts(weights):
+    """Returns whether the backend reproduces `first_fit_decreasing` exactly for these weights
+    It does for whole weights; fractional ones may round differently at a vehicle's boundary
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :rtype: bool
+    """
+
+    if not available:
+        return False
+
+    weights = np.asarray(weights, dtype=float)
+
+    return bool(np.all(np.floor(weights) == weights))
+
+
+def vectorized_first_fit_decreasing(weights, capacities, time_budget=None):
+    """Packs the items with the First Fit Decreasing algorithm, a run of equal weights at a time
+
+    Items of a run go, in order, to the first vehicles they fit in : each opened vehicle with room
+    takes as many as it can, then new vehicles (smallest large enough first, as in
+    `first_fit_decreasing`) take as many as they can. Each run is a handful of array operations over
+    the opened vehicles, so the Python level work grows with the number of distinct weights, not of items
+
+    :param weights: item weights
+    :type weights: Sequence[float]
+    :param capacities: capacities of the available vehicles
+    :type capacities: Sequence[float]
+    :param time_budget: unused, First Fit Decreasing does not search
+    :raises CannotPack: raised if an item does not fit in any available vehicle
+    :return: assignment plan
+    :rtype: `Plan`
+    """
+
+    plan = Plan(strategy='ffd')
+    item_weights = np.asarray(weights, dtype=float)
+    if not len(item_weights):
+        return plan
+
+    items = np.argsort(-item_weights, kind='stable')
+    sorted_weights = item_weights[items]
+
+    # Free vehicles per capacity class, ascending; each class is used in the order given
+    vehicle_capacities = np.asarray(capacities, dtype=float)
+    vehicles = np.argsort(vehicle_capacities, kind='stable')
+    classes, class_starts = np.unique(vehicle_capacities[vehicles], return_index=True)
+    class_ends = np.append(class_starts[1:], len(vehicles))
+    class_next = class_starts.copy()
+
+    max_bins = min(len(items), len(vehicles))
+    bin_vehicles = np.empty(max_bins, dtype=np.int64)
+    bin_remaining = np.empty(max_bins, dtype=float)
+    opened = 0
+    item_bins = np.empty(len(items), dtype=np.int64)  # in decreasing weight order
+
+    run_starts = np.flatnonzero(np.r_[True, sorted_weights[1:] != sorted_weights[:-1]])
+    run_ends = np.append(run_starts[1:], len(items))
+
+    for start, end in zip(run_starts, run_ends):
+        weight = sorted_weights[start]
+        left = end - start
+
+        # Fill the opened vehicles, in order
+        if opened:
+            room = np.floor_divide(bin_remaining[:opened], weight).astype(np.int64)
+            taken = np.cumsum(room)
+            if taken[-1] >= left:
+                last = int(np.searchsorted(taken, left))
+                room[last] = left - (taken[last - 1] if last else 0)
+                room[last + 1:] = 0
+            bin_remaining[:opened] -= room * weight
+            filled = int(room.sum())
+            item_bins[start:start + filled] = np.repeat(np.arange(opened), room)
+            start += filled
+            left -= filled
+
+        # Open new vehicles, smallest large enough first
+        class_idx = int(np.searchsorted(classes, weight))
+        while left and class_idx < len(classes):
+            per_vehicle = int(classes[class_idx] // weight)
+            free = class_ends[class_idx] - class_next[class_idx]
+            count = min(free, -(-left // per_vehicle))
+            if count:
+                room = np.full(count, per_vehicle, dtype=np.int64)
+                room[-1] = min(per_vehicle, left - per_vehicle * (count - 1))
+                new_bins = np.arange(opened, opened + count)
+
+                bin_vehicles[new_bins] = vehicles[class_next[class_idx]:class_next[class_idx] + count]
+                bin_remaining[new_bins] = classes[class_idx] - room * weight
+                item_bins[start:start + int(room.sum())] = np.repeat(new_bins, room)
+
+                class_next[class_idx] += count
+                opened += count
+                start += int(room.sum())
+                left -= int(room.sum())
+            class_idx += 1
+
+        if left:
+            raise CannotPack(int(items[start]))
+
+    # Group the items per vehicle, keeping their decreasing weight order
+    grouped_items = items[np.argsort(item_bins, kind='stable')].tolist()
+    counts = np.bincount(item_bins, minlength=opened).tolist()
+
+    position = 0
+    for bin_idx, vehicle in enumerate(bin_vehicles[:opened].tolist()):
+        planned_vehicle = PlannedVehicle(vehicle, capacities[vehicle])
+        planned_vehicle.items = grouped_items[position:position + counts[bin_idx]]
+        remaining = bin_remaining[bin_idx].item()
+        planned_vehicle.remaining = int(remaining) if isinstance(capacities[vehicle], int) and \
+            remaining.is_integer() else remaining
+        plan.vehicles.append(planned_vehicle)
+        position += counts[bin_idx]
+
+    return plan
@@ -0,0 +1,104 @@
+"""Synthetic packing workloads, for benchmarks
+
+Order weights are drawn from a few distributions met in practice, as whole kgs between 1 and the largest
+capacity of the fleet they are packed into :
+    uniform : any weight, equally likely
+    bimodal : mostly light baskets, and a share of heavy ones
+    heavy-tailed : Pareto distributed, many light orders and a few very heavy ones
+    tiny : 1 to 3 kgs, many orders per vehicle
+Fleets keep the vehicle mixes of the slots seeded by the initial migration (3 bikes and 2 scooters for
+slot 1, plus a truck for slots 2 and 3, a truck for slot 4), repeated until they carry the batch.
+"""
+
+import math
+
+from .integer import bucketed_best_fit_decreasing, bucketed_first_fit_decreasing
+from .plan import CannotPack
+
+# (capacity, vehicle count) of the seeded slots' fleets
+FLEET_MIXES = {
+    'slot-1': ((30, 3), (50, 2)),
+    'slot-2': ((30, 3), (50, 2), (100, 1)),
+    'slot-4': ((100, 1),),
+}
+
+
+def _uniform(rng, max_weight):
+    return rng.randint(1, max_weight)
+
+
+def _bimodal(rng, max_weight):
+    mean = 0.15 if rng.random() < 0.7 else 0.6
+
+    return round(rng.gauss(mean * max_weight, 0.05 * max_weight))
+
+
+def _heavy_tailed(rng, max_weight):
+    return round(0.05 * max_weight * rng.paretovariate(1.2))
+
+
+def _tiny(rng, max_weight):
+    return rng.randint(1, 3)
+
+
+WORKLOADS = {
+    'uniform': _uniform,
+    'bimodal': _bimodal,
+    'heavy-tailed': _heavy_tailed,
+    'tiny': _tiny,
+}
+
+
+def generate_weights(workload, size, max_weight, rng):
+    """Returns `size` order weights drawn from a workload's distribution
+
+    :param workload: name of a workload in `WORKLOADS`
+    :type workload: str
+    :param size: number of orders
+    :type size: int
+    :param max_weight: heaviest weight drawn, eg : the fleet's largest capacity
+    :type max_weight: int
+    :param rng: random number generator
+    :type rng: `random.Random`
+    :rtype: List[int]
+    """
+
+    draw = WORKLOADS[workload]
+
+    return [min(max(draw(rng, max_weight), 1), max_weight) for _ in range(size)]
+
+
+def scale_fleet(mix, weights, headroom=1.5):
+    """Returns the capacities of a fleet repeating `mix` until the greedy strategies pack `weights` into it
+
+    Starts from `headroom` times the weight each capacity class must carry (the items too heavy for the
+    smaller classes), then adds a quarter of the repeats until First and Best Fit Decreasing succeed
+
+    :param mix: (capacity, vehicle count) pairs, eg : one of `FLEET_MIXES`
+    :type mix: Iterable[Tuple[int, int]]
+    :param weights: item weights, none heavier than the mix's largest capacity
+    :type weights: Sequence[int]
+    :param headroom: spare capacity factor
+    :type headroom: float
+    :return: capacities, in ascending order
+    :rtype: List[int]
+    """
+
+    mix = sorted(mix)
+    repeats = 1
+    lighter = 0
+    for idx, (capacity, _) in enumerate(mix):
+        carried = sum(capacity * count for capacity, count in mix[idx:])
+        heavier = sum(weight for weight in weights if weight > lighter)
+        repeats = max(repeats, math.ceil(headroom * heavier / carried))
+        lighter = capacity
+
+    while True:
+        capacities = [capacity for capacity, count in mix for _ in range(count * repeats)]
+        try:
+            for solver in (bucketed_first_fit_decreasing, bucketed_best_fit_decreasing):
+                solver(weights, capacities)
+        except CannotPack:
+            repeats += math.ceil(repeats / 4)
+        else:
+            return capacities
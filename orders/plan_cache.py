@@ -0,0 +1,76 @@
+"""The process' packing plan cache, configured by the `ORDERS_PLAN_CACHE` setting
+
+`BACKEND` picks where plans are stored :
+    'locmem' : in process LRU (`MAX_SIZE` entries)
+    'file' : one file per plan in `LOCATION`, shared by the workers of a host (`MAX_SIZE` entries)
+    'django' : the Django cache `LOCATION` (eg : memcached / redis), shared by every worker
+    None : no caching
+Entries expire after `TTL` seconds.
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import packing
+
+_lock = threading.Lock()
+_plan_cache = None
+
+
+class DjangoCacheBackend:
+    """Class that represents a plan store in a Django cache
+    """
+
+    KEY_PREFIX = 'orders:plan:'
+
+    def __init__(self, alias='default', ttl=None):
+        self.alias = alias
+        self.ttl = ttl
+
+    def get(self, key):
+        return caches[self.alias].get(self.KEY_PREFIX + key)
+
+    def set(self, key, value):
+        caches[self.alias].set(self.KEY_PREFIX + key, value, timeout=self.ttl)
+
+
+def build_plan_cache(config):
+    """Builds a `PlanCache` from an `ORDERS_PLAN_CACHE` like dict
+
+    :param config: cache configuration
+    :type config: dict
+    :return: the plan cache, or None if caching is disabled
+    :rtype: Optional[`PlanCache`]
+    """
+
+    backend = config.get('BACKEND')
+    ttl = config.get('TTL')
+
+    if backend is None:
+        return None
+    if backend == 'locmem':
+        return packing.PlanCache(packing.LocalMemoryBackend(max_size=config.get('MAX_SIZE', 1024), ttl=ttl))
+    if backend == 'file':
+        return packing.PlanCache(packing.FileBackend(
+            config['LOCATION'], max_size=config.get('MAX_SIZE', 4096), ttl=ttl))
+    if backend == 'django':
+        return packing.PlanCache(DjangoCacheBackend(config.get('LOCATION', 'default'), ttl=ttl))
+
+    raise ValueError(f"Unknown ORDERS_PLAN_CACHE backend: {backend}")
+
+
+def get_plan_cache():
+    """Returns the process' `PlanCache`, built on first use
+
+    :rtype: Optional[`PlanCache`]
+    """
+
+    global _plan_cache
+
+    with _lock:
+        if _plan_cache is None:
+            _plan_cache = build_plan_cache(settings.ORDERS_PLAN_CACHE) or False
+
+    return _plan_cache or None
@@ -0,0 +1,111 @@
+"""Opt-in profiling of single assignment requests, configured by the `ORDERS_PROFILING` setting
+    'ENABLED' : whether requests may ask to be profiled
+    'DIRECTORY' : where profiles are written
+    'SAMPLE_INTERVAL' : seconds between two samples of the sampling profiler
+
+A request sent with a `Profile` header is profiled, and its response names the file written in a
+`Profile-File` header :
+    'cprofile' : deterministic profile of every call, a `pstats` file (eg : for `snakeviz`)
+    'sample' : the request's thread stack, sampled from another thread : collapsed stacks with their
+        sample counts, one per line (eg : for `flamegraph.pl`); its overhead does not grow with the calls made
+Other values are ignored.
+"""
+
+import collections
+import contextlib
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+MODES = ('cprofile', 'sample')
+
+
+class Sampler(threading.Thread):
+    """Class that represents a thread sampling the stack of another thread, until stopped
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='orders-profiling-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def dump(self, path):
+        with open(path, 'w') as profile:
+            for stack, count in self.stacks.most_common():
+                profile.write(f'{stack} {count}\n')
+
+
+def requested_mode(request):
+    """Returns the profiling mode the request asks for, if profiling is enabled
+
+    :param request: Django request object
+    :rtype: Optional[str]
+    """
+
+    if not settings.ORDERS_PROFILING['ENABLED']:
+        return None
+
+    mode = request.headers.get('Profile')
+
+    return mode if mode in MODES else None
+
+
+@contextlib.contextmanager
+def profile(mode, name):
+    """Profiles the code run in the block, then writes the profile to `ORDERS_PROFILING['DIRECTORY']`
+
+    :param mode: 'cprofile' or 'sample'
+    :type mode: str
+    :param name: prefix of the file name, eg : the view's
+    :type name: str
+    :return: a list the path of the profile is appended to, once written
+    :rtype: List[str]
+    """
+
+    config = settings.ORDERS_PROFILING
+    os.makedirs(config['DIRECTORY'], exist_ok=True)
+    extension = 'prof' if mode == 'cprofile' else 'folded'
+    file_name = f'{name}-{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}.{extension}'
+    path = os.path.join(config['DIRECTORY'], file_name)
+    written = []
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield written
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            written.append(path)
+    else:
+        sampler = Sampler(threading.get_ident(), config['SAMPLE_INTERVAL'])
+        sampler.start()
+        try:
+            yield written
+        finally:
+            sampler.stop()
+            sampler.dump(path)
+            written.append(path)
@@ -1,5 +1,13 @@
+from collections import Counter
 from rest_framework import serializers
-from .models import DeliveryVehicleOrders
+from .models import AssignmentJob, DeliveryVehicleOrders, SlotDelivery
+
+# Messages of the errors raised while assigning orders
+ASSIGNMENT_ERROR_MESSAGES = {
+    SlotDelivery.OrdersWeightLimitError: "Order weights exceeds limit (100 kgs)",
+    SlotDelivery.InvalidSlotNumber: "Invalid Slot number provided",
+    SlotDelivery.CannotAssignOrders: "Unable to assign to the available delivery vehicles",
+}
 
 
 class DeliveryVehicleOrdersSerializer(serializers.ModelSerializer):
@@ -10,6 +18,8 @@ class DeliveryVehicleOrdersSerializer(serializers.ModelSerializer):
 
     def get_list_order_ids_assigned(self, obj):
         """Returns a list of the `order id`s of the assigned `Order`s
+        Served from the prefetched / just assigned orders when available
+        (see `DeliveryVehicleOrders.cache_orders` and `SlotDelivery.get_delivery_vehicle_orders`)
         """
         return [order.order_id for order in obj.orders.all()]
 
@@ -17,3 +27,100 @@ class DeliveryVehicleOrdersSerializer(serializers.ModelSerializer):
         model = DeliveryVehicleOrders
         fields = ('vehicle_type', 'delivery_vendor_id', 'list_order_ids_assigned',)
         read_only_fields = ('vehicle_type', 'delivery_vendor_id', 'list_order_ids_assigned',)
+
+
+class QuoteSerializer(serializers.BaseSerializer):
+    """Serializes a `SlotDelivery.Quote` : its vehicles, as `DeliveryVehicleOrdersSerializer` renders
+    saved ones, how many vehicles of each type it uses, and how many local search moves improved its plan
+    """
+
+    def to_representation(self, quote):
+        vehicles = [
+            {
+                'vehicle_type': delivery_vehicle.vehicle_type.name,
+                'delivery_vendor_id': delivery_vehicle.delivery_vendor_id,
+                'list_order_ids_assigned': sorted(quote.orders[item]['order_id'] for item in planned_vehicle.items),
+            }
+            for planned_vehicle, delivery_vehicle in zip(quote.plan, quote.delivery_vehicles)
+        ]
+
+        return {
+            'vehicles': vehicles,
+            'vehicle_counts': dict(Counter(vehicle['vehicle_type'] for vehicle in vehicles)),
+            'moves_accepted': quote.plan.moves,
+        }
+
+
+class AssignmentJobSerializer(serializers.ModelSerializer):
+
+    job_id = serializers.IntegerField(source='id')
+    submitted = serializers.DateTimeField(source='created_date')
+
+    class Meta:
+        model = AssignmentJob
+        fields = ('job_id', 'slot_number', 'status', 'cancel_requested', 'submitted', 'started', 'finished',
+                  'timings', 'result',)
+        read_only_fields = fields
+
+
+class StreamAssignmentSerializer(serializers.BaseSerializer):
+    """Serializes a `SlotDelivery.StreamAssignment` : a summary of its vehicles, without the order ids
+    """
+
+    def to_representation(self, assignment):
+        return {
+            'orders_assigned': sum(assignment.order_counts),
+            'total_weight': assignment.total_weight,
+            'vehicles': [
+                {
+                    'vehicle_type': delivery_vehicle_order.delivery_vehicle.vehicle_type.name,
+                    'delivery_vendor_id': delivery_vehicle_order.delivery_vehicle.delivery_vendor_id,
+                    'orders_assigned': order_count,
+                    'load': load,
+                }
+                for delivery_vehicle_order, order_count, load in zip(
+                    assignment.delivery_vehicle_orders, assignment.order_counts, assignment.loads)
+            ],
+        }
+
+
+class AddedOrdersSerializer(serializers.BaseSerializer):
+    """Serializes a `SlotDelivery.AddedOrders` : a vehicle, the orders just added to it and the capacity it has left
+    """
+
+    def to_representation(self, added_orders):
+        delivery_vehicle_order = added_orders.delivery_vehicle_order
+
+        return {
+            'vehicle_type': delivery_vehicle_order.delivery_vehicle.vehicle_type.name,
+            'delivery_vendor_id': delivery_vehicle_order.delivery_vehicle.delivery_vendor_id,
+            'list_order_ids_added': sorted(order.order_id for order in added_orders.orders),
+            'remaining_capacity': delivery_vehicle_order.remaining_capacity,
+            'opened': added_orders.opened,
+        }
+
+
+class RepairSerializer(serializers.BaseSerializer):
+    """Serializes a `SlotDelivery.Repair` : the diff of the delivery, rather than its whole plan
+    """
+
+    @staticmethod
+    def vehicle(delivery_vehicle_order):
+        return {
+            'vehicle_type': delivery_vehicle_order.delivery_vehicle.vehicle_type.name,
+            'delivery_vendor_id': delivery_vehicle_order.delivery_vehicle.delivery_vendor_id,
+        }
+
+    def to_representation(self, repair):
+        return {
+            'cancelled_order_id': repair.cancelled_order.order_id,
+            'moved_orders': [
+                {'order_id': order.order_id, 'from_vehicle': self.vehicle(source), 'to_vehicle': self.vehicle(receiver)}
+                for order, source, receiver in repair.moves
+            ],
+            'released_vehicles': [self.vehicle(delivery_vehicle_order) for delivery_vehicle_order in repair.released],
+            'updated_vehicles': [
+                dict(self.vehicle(delivery_vehicle_order), remaining_capacity=delivery_vehicle_order.remaining_capacity)
+                for delivery_vehicle_order in repair.updated
+            ],
+        }
@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from . import fleet
+from .models import DeliveryVehicle, Slot, VehicleType
+
+
+@receiver(post_save, sender=Slot)
+@receiver(post_save, sender=VehicleType)
+@receiver(post_save, sender=DeliveryVehicle)
+@receiver(post_delete, sender=Slot)
+@receiver(post_delete, sender=VehicleType)
+@receiver(post_delete, sender=DeliveryVehicle)
+@receiver(m2m_changed, sender=Slot.vehicle_types_assigned.through)
+def invalidate_fleet_snapshots(**kwargs):
+    """Invalidates the fleet snapshots when the fleet changes
+    Invalidates again on commit, in case a snapshot was reloaded before the change was visible
+    """
+
+    fleet.invalidate()
+    transaction.on_commit(fleet.invalidate)
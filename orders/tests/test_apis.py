@@ -1,7 +1,18 @@
-from django.test import TestCase
-from orders.models import Order, SlotDelivery
+from asgiref.sync import async_to_sync
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from orders import fleet, instrumentation, jobs, metrics
+from orders.models import (AssignmentJob, DeliveryVehicleOrders, IdempotentResponse, Order, SlotDelivery,
+                           VehicleReservation)
+from unittest import mock
 from django.urls import reverse
+import datetime
 import json
+import os
+import pstats
+import tempfile
 
 
 def generate_orders_data(weights_list):
@@ -69,6 +80,36 @@ class DeliveryTestCases(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), expected_delivery_response_data)
 
+    def test_case_3_exact(self):
+        """Test the order combination [50, 50] for slot 3 with the exact strategy
+        (OPTIMAL) uses 1 `truck`
+        """
+
+        url = reverse("assign_slot_orders", kwargs={"slot_number": 3})
+        orders_api_data = generate_orders_data([50, 50])
+        expected_delivery_response_data = [
+            {'vehicle_type': 'truck', 'delivery_vendor_id': 1, 'list_order_ids_assigned': [1, 2]},
+        ]
+
+        response = self.client.post(url + "?strategy=exact&time_budget_ms=10", data=json.dumps(
+            orders_api_data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected_delivery_response_data)
+
+    def test_invalid_strategy(self):
+        """Test exception arises if an unknown packing strategy is requested
+        """
+
+        url = reverse("assign_slot_orders", kwargs={"slot_number": 3})
+        orders_api_data = generate_orders_data([50, 50])
+
+        response = self.client.post(url + "?strategy=magic", data=json.dumps(
+            orders_api_data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('strategy', response.json())
+
     def test_case_4(self):
         """Test a easy order combination [30, 50] for slot 3
         (OPTIMAL) uses 1 `scooter` and a `bike`
@@ -275,3 +316,831 @@ class DeliveryTestCases(TestCase):
 
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json(), expected_error_response_data)
+
+    def test_duplicate_order_ids(self):
+        """Test orders repeating an order id are rejected
+        """
+
+        url = reverse("assign_slot_orders", kwargs={"slot_number": 1})
+        orders_api_data = generate_orders_data([10, 20]) + [{"order_id": 1, "order_weight": 5}]
+
+        response = self.client.post(url, data=json.dumps(
+            orders_api_data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [{}, {}, {'order_id': ['This value is already used by another item.']}])
+
+    def test_assignment_query_count(self):
+        """Test that an assignment, response included, takes a fixed number of queries once the fleet is cached
+        recorded response lookup, savepoint, reserved vehicles, savepoint, binding the vehicles (one query per
+        vehicle type used), `SlotDelivery`, `VehicleReservation`s, `DeliveryVehicleOrders` (+ reading their ids
+        back if the backend cannot return them), `Order`s, savepoint release, recorded response, savepoint
+        release
+        """
+
+        url = reverse("assign_slot_orders", kwargs={"slot_number": 3})
+        orders_api_data = generate_orders_data([10, 10, 10, 5, 5, 2, 1, 2, 25])
+        fleet.get_snapshots()
+
+        # Only bikes are used
+        with self.assertNumQueries(12 if connection.features.can_return_rows_from_bulk_insert else 13):
+            response = self.client.post(url, data=json.dumps(
+                orders_api_data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+
+class QuoteTestCases(TestCase):
+
+    def test_quote_matches_assignment(self):
+        """Test a quote lists the vehicles the assignment of the same orders uses
+        """
+
+        orders_api_data = generate_orders_data([10, 10, 10, 5, 5, 2, 1, 2, 25])
+
+        quote_response = self.client.post(reverse("quote_slot_orders", kwargs={"slot_number": 3}), data=json.dumps(
+            orders_api_data), content_type="application/json")
+        assign_response = self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": 3}), data=json.dumps(
+            orders_api_data), content_type="application/json")
+
+        self.assertEqual(quote_response.status_code, 200)
+        self.assertEqual(quote_response.json()['vehicles'], assign_response.json())
+        self.assertEqual(quote_response.json()['vehicle_counts'], {'bike': 3})
+
+    def test_quote_local_search(self):
+        """Test the '-ls' strategies improve the plan, and the assignment follows it
+        """
+
+        orders_api_data = generate_orders_data([50, 50])
+        url = reverse("quote_slot_orders", kwargs={"slot_number": 3})
+
+        response = self.client.post(url, data=json.dumps(orders_api_data), content_type="application/json")
+        self.assertEqual(response.json()['vehicle_counts'], {'scooter': 2})
+
+        response = self.client.post(url + '?strategy=ffd-ls', data=json.dumps(
+            orders_api_data), content_type="application/json")
+        self.assertEqual(response.json()['vehicle_counts'], {'truck': 1})
+        self.assertEqual(response.json()['moves_accepted'], 1)
+
+        assign_url = reverse("assign_slot_orders", kwargs={"slot_number": 3})
+        assign_response = self.client.post(assign_url + '?strategy=ffd-ls', data=json.dumps(orders_api_data),
+                                           content_type="application/json")
+        self.assertEqual(assign_response.json(), response.json()['vehicles'])
+
+    def test_quote_writes_nothing(self):
+        """Test a quote only queries the reserved vehicles, and the vehicles it binds (one query per vehicle
+        type used), once the fleet is cached, and saves nothing
+        """
+
+        url = reverse("quote_slot_orders", kwargs={"slot_number": 1})
+        orders_api_data = generate_orders_data([30, 10, 20])
+        fleet.get_snapshots()
+
+        with self.assertNumQueries(2):
+            response = self.client.post(url, data=json.dumps(
+                orders_api_data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'vehicles': [
+                {'vehicle_type': 'bike', 'delivery_vendor_id': 1, 'list_order_ids_assigned': [1]},
+                {'vehicle_type': 'bike', 'delivery_vendor_id': 2, 'list_order_ids_assigned': [2, 3]}
+            ],
+            'vehicle_counts': {'bike': 2},
+            'moves_accepted': 0,
+        })
+        self.assertFalse(SlotDelivery.objects.exists())
+        self.assertFalse(Order.objects.exists())
+
+    def test_quote_errors(self):
+        """Test a quote fails as the assignment would
+        """
+
+        cases = (
+            (1, [10, 20, 30, 40, 50], 'Order weights exceeds limit (100 kgs)'),
+            (7, [10, 20], 'Invalid Slot number provided'),
+            (1, [10, 20, 60], 'Unable to assign to the available delivery vehicles'),
+        )
+        for slot_number, weights, detail in cases:
+            with self.subTest(slot_number=slot_number, weights=weights):
+                response = self.client.post(reverse("quote_slot_orders", kwargs={"slot_number": slot_number}),
+                                            data=json.dumps(generate_orders_data(weights)),
+                                            content_type="application/json")
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'detail': detail})
+
+
+class BulkAssignmentTestCases(TestCase):
+
+    def test_assign_slots(self):
+        """Test every slot gets the vehicles its own assignment would
+        """
+
+        slots_weights = {1: [30, 10, 20], 2: [50, 50], 3: [10, 10, 10, 5, 5, 2, 1, 2, 25], 4: [100]}
+        quotes = {
+            slot_number: self.client.post(reverse("quote_slot_orders", kwargs={"slot_number": slot_number}),
+                                          data=json.dumps(generate_orders_data(weights)),
+                                          content_type="application/json").json()['vehicles']
+            for slot_number, weights in slots_weights.items()
+        }
+
+        response = self.client.post(reverse("assign_slots_orders"), data=json.dumps(
+            {slot_number: generate_orders_data(weights) for slot_number, weights in slots_weights.items()}),
+            content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SlotDelivery.objects.count(), 4)
+        for slot_number, vehicles in quotes.items():
+            self.assertEqual(response.json()[str(slot_number)], vehicles)
+
+    def test_assign_slots_errors(self):
+        """Test a slot that cannot be assigned reports its error without preventing the others
+        """
+
+        response = self.client.post(reverse("assign_slots_orders"), data=json.dumps({
+            1: generate_orders_data([10, 20, 60]),
+            2: generate_orders_data([10, 20, 30, 40, 50]),
+            4: generate_orders_data([30, 10, 20]),
+            7: generate_orders_data([10]),
+        }), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            '1': {'detail': 'Unable to assign to the available delivery vehicles'},
+            '2': {'detail': 'Order weights exceeds limit (100 kgs)'},
+            '4': [{'vehicle_type': 'truck', 'delivery_vendor_id': 1, 'list_order_ids_assigned': [1, 2, 3]}],
+            '7': {'detail': 'Invalid Slot number provided'},
+        })
+        self.assertEqual(SlotDelivery.objects.count(), 1)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_assign_slots_invalid_data(self):
+        """Test nothing is assigned if the orders of any slot are invalid
+        """
+
+        for data in ({}, [], {'first': generate_orders_data([10])},
+                     {1: generate_orders_data([10]), 2: [{'order_id': 1}]}):
+            with self.subTest(data=data):
+                response = self.client.post(reverse("assign_slots_orders"), data=json.dumps(data),
+                                            content_type="application/json")
+
+                self.assertEqual(response.status_code, 400)
+
+        self.assertFalse(SlotDelivery.objects.exists())
+
+    def test_assign_slots_query_count(self):
+        """Test the slots are persisted together : reserved vehicles, savepoint, binding the vehicles (one query
+        per slot and vehicle type used), `SlotDelivery`s (one insert per slot if the backend cannot return the
+        inserted ids), `VehicleReservation`s, `DeliveryVehicleOrders` (+ reading their ids back), `Order`s, release
+        """
+
+        slot_orders = {slot_number: generate_orders_data([30, 10, 20]) for slot_number in (1, 2, 3)}
+        fleet.get_snapshots()
+
+        # Each slot only uses bikes
+        with self.assertNumQueries(7 + 3 if connection.features.can_return_rows_from_bulk_insert else 7 + 3 + 3):
+            response = self.client.post(reverse("assign_slots_orders"), data=json.dumps(slot_orders),
+                                        content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 9)
+
+
+@override_settings(ORDERS_JOBS={'WORKERS': 1, 'MAX_QUEUED': 0, 'EAGER': True})
+class AssignmentJobTestCases(TestCase):
+
+    def test_submit_job(self):
+        """Test a submitted job responds as the synchronous assignment would
+        """
+
+        orders_api_data = generate_orders_data([30, 10, 20])
+
+        response = self.client.post(reverse("submit_slot_orders_job", kwargs={"slot_number": 1}), data=json.dumps(
+            orders_api_data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 202)
+        job_response = self.client.get(reverse("assignment_job", kwargs={"job_id": response.json()['job_id']}))
+        self.assertEqual(job_response.json()['status'], 'succeeded')
+        self.assertEqual(job_response.json()['result'], [
+            {'vehicle_type': 'bike', 'delivery_vendor_id': 1, 'list_order_ids_assigned': [1]},
+            {'vehicle_type': 'bike', 'delivery_vendor_id': 2, 'list_order_ids_assigned': [2, 3]}
+        ])
+
+    def test_submit_invalid_job(self):
+        """Test invalid orders are rejected when submitted, and failed assignments are reported by the job
+        """
+
+        response = self.client.post(reverse("submit_slot_orders_job", kwargs={"slot_number": 1}), data=json.dumps(
+            [{'order_id': 1}]), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse("submit_slot_orders_job", kwargs={"slot_number": 7}), data=json.dumps(
+            generate_orders_data([10])), content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertEqual(response.json()['result'], {'detail': 'Invalid Slot number provided'})
+
+    @override_settings(ORDERS_JOBS={'WORKERS': 1, 'MAX_QUEUED': 0, 'EAGER': False})
+    def test_queue_full(self):
+        """Test submissions are refused once the pool has as many jobs as it can take
+        """
+
+        with mock.patch.object(jobs, '_in_flight', 1):
+            response = self.client.post(reverse("submit_slot_orders_job", kwargs={"slot_number": 1}),
+                                        data=json.dumps(generate_orders_data([10])), content_type="application/json")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(AssignmentJob.objects.exists())
+
+    @override_settings(ORDERS_JOBS={'WORKERS': 1, 'MAX_QUEUED': 1, 'EAGER': False})
+    def test_queue_bound_counts_uncommitted_jobs(self):
+        """Test jobs take their slot when submitted, before their transaction commits, and give it back if it
+        is rolled back
+        """
+
+        orders_api_data = generate_orders_data([10])
+
+        with mock.patch.object(jobs, '_in_flight', 0):
+            with transaction.atomic():
+                jobs.submit(1, orders_api_data)
+                jobs.submit(1, orders_api_data)
+                with self.assertRaises(jobs.QueueFull):
+                    jobs.submit(1, orders_api_data)
+                self.assertEqual(jobs._in_flight, 2)
+                transaction.set_rollback(True)
+
+            self.assertEqual(jobs._in_flight, 0)
+            self.assertFalse(AssignmentJob.objects.exists())
+
+    def test_cancel_job(self):
+        """Test cancelling a job, and an unknown job
+        """
+
+        job = AssignmentJob.objects.create(slot_number=1, orders=generate_orders_data([10]))
+
+        response = self.client.post(reverse("cancel_assignment_job", kwargs={"job_id": job.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'cancelled')
+
+        response = self.client.post(reverse("cancel_assignment_job", kwargs={"job_id": job.id + 1}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("assignment_job", kwargs={"job_id": job.id + 1}))
+        self.assertEqual(response.status_code, 404)
+
+
+class StreamAssignmentTestCases(TestCase):
+
+    def post_stream(self, slot_number, lines):
+        return self.client.post(reverse("stream_slot_orders", kwargs={"slot_number": slot_number}),
+                                data="\n".join(lines), content_type="application/x-ndjson")
+
+    @override_settings(ORDERS_STREAM_CHUNK_SIZE=7)
+    def test_stream_beyond_batch_limit(self):
+        """Test a streamed batch is only bounded by the slot's fleet capacity (30 * 3 + 50 * 2 + 100 kgs)
+        """
+
+        weights = [5, 3, 8, 2, 7, 1, 4, 6] * 8  # 256 kgs
+        orders_api_data = generate_orders_data(weights)
+
+        response = self.post_stream(2, [json.dumps(order) for order in orders_api_data])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['orders_assigned'], len(weights))
+        self.assertEqual(response.json()['total_weight'], sum(weights))
+        self.assertEqual(sorted(Order.objects.values_list('order_id', flat=True)), list(range(1, len(weights) + 1)))
+        for delivery_vehicle_order in SlotDelivery.objects.get().get_delivery_vehicle_orders():
+            self.assertLessEqual(sum(order.weight for order in delivery_vehicle_order.orders.all()),
+                                 delivery_vehicle_order.delivery_vehicle.max_capacity)
+
+    def test_stream_downsizes_vehicles(self):
+        """Test the vehicles are swapped for the smallest that carry the same loads
+        """
+
+        response = self.post_stream(1, [json.dumps(order) for order in generate_orders_data([10, 20])])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['vehicles'], [
+            {'vehicle_type': 'bike', 'delivery_vendor_id': 1, 'orders_assigned': 2, 'load': 30},
+        ])
+        self.assertEqual(SlotDelivery.objects.get().get_delivery_vehicle_orders().get().delivery_vehicle.max_capacity,
+                         30)
+
+    def test_stream_errors(self):
+        """Test a stream that cannot be assigned writes nothing
+        """
+
+        cases = (
+            (4, generate_orders_data([60, 50]), {'detail': "Order weights exceeds the slot's fleet capacity"}),
+            (1, generate_orders_data([10, 60]), {'detail': 'Unable to assign to the available delivery vehicles'}),
+            (7, generate_orders_data([10]), {'detail': 'Invalid Slot number provided'}),
+        )
+        for slot_number, orders_api_data, expected_error_response_data in cases:
+            with self.subTest(slot_number=slot_number):
+                response = self.post_stream(slot_number, [json.dumps(order) for order in orders_api_data])
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), expected_error_response_data)
+
+        response = self.post_stream(1, [json.dumps({'order_id': 1, 'order_weight': 10}), '{"order_id": 2'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'line': '2', 'errors': ['Invalid JSON.']})
+
+        response = self.post_stream(1, [json.dumps({'order_id': 1})])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['line'], '1')
+
+        self.assertFalse(SlotDelivery.objects.exists())
+        self.assertFalse(Order.objects.exists())
+
+
+class IdempotencyTestCases(TestCase):
+
+    def post(self, orders_api_data, slot_number=1, **headers):
+        return self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": slot_number}),
+                                data=json.dumps(orders_api_data), content_type="application/json", **headers)
+
+    def test_repeated_request_is_replayed(self):
+        """Test a repeat of an assigned request gets the same response, without assigning anything
+        """
+
+        response = self.post(generate_orders_data([10, 20]))
+
+        with self.assertNumQueries(1):
+            repeat = self.post(list(reversed(generate_orders_data([10, 20]))))
+
+        self.assertEqual(repeat.status_code, 200)
+        self.assertEqual(repeat.json(), response.json())
+        self.assertEqual(repeat['Idempotent-Replayed'], 'true')
+        self.assertEqual(repeat['Slot-Delivery-Id'], response['Slot-Delivery-Id'])
+        self.assertEqual(SlotDelivery.objects.count(), 1)
+        self.assertEqual(Order.objects.count(), 2)
+
+        # Other orders, or other options, are another request
+        self.post(generate_orders_data([10, 25]))
+        self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": 1}) + "?strategy=bfd",
+                         data=json.dumps(generate_orders_data([10, 20])), content_type="application/json")
+        self.assertEqual(SlotDelivery.objects.count(), 3)
+
+    def test_idempotency_key_header(self):
+        """Test the `Idempotency-Key` header identifies a request, and is refused with another payload
+        """
+
+        response = self.post(generate_orders_data([30]), HTTP_IDEMPOTENCY_KEY='abc')
+        repeat = self.post(list(reversed(generate_orders_data([30]))), HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(repeat.json(), response.json())
+        self.assertEqual(repeat['Idempotent-Replayed'], 'true')
+
+        reused = self.post(generate_orders_data([50]), HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(reused.status_code, 422)
+        self.assertEqual(reused.json(), {'detail': 'Idempotency-Key already used for another request'})
+
+        self.post(generate_orders_data([30]), HTTP_IDEMPOTENCY_KEY='def')
+        self.assertEqual(SlotDelivery.objects.count(), 2)
+
+    def test_errors_are_not_recorded(self):
+        self.post(generate_orders_data([60]))
+
+        self.assertFalse(IdempotentResponse.objects.exists())
+
+    @override_settings(ORDERS_IDEMPOTENCY_TTL=0)
+    def test_expired_response(self):
+        """Test a repeat is assigned again once the recorded response expired
+        """
+
+        self.post(generate_orders_data([30]))
+        repeat = self.post(generate_orders_data([30]))
+
+        self.assertFalse(repeat.has_header('Idempotent-Replayed'))
+        self.assertEqual(SlotDelivery.objects.count(), 2)
+        self.assertEqual(IdempotentResponse.objects.count(), 1)
+        self.assertEqual(IdempotentResponse.delete_expired(), 1)
+
+    def test_concurrent_repeat(self):
+        """Test a repeat recorded while the request was assigning gets the recorded response, and its
+        assignment is rolled back
+        """
+
+        key = IdempotentResponse.request_key(1, generate_orders_data([30]), options=(None, None))
+        lookup = IdempotentResponse.lookup
+
+        def late_lookup(lookup_key, request_hash=None):
+            # The first lookup runs before the concurrent repeat recorded its response
+            if not IdempotentResponse.objects.exists():
+                IdempotentResponse.record(key, 200, [{'vehicle_type': 'bike'}])
+                return None
+            return lookup(lookup_key, request_hash)
+
+        with mock.patch.object(IdempotentResponse, 'lookup', side_effect=late_lookup):
+            response = self.post(generate_orders_data([30]))
+
+        self.assertEqual(response.json(), [{'vehicle_type': 'bike'}])
+        self.assertFalse(SlotDelivery.objects.exists())
+
+
+class InstrumentationTestCases(TestCase):
+
+    def post(self, weights):
+        return self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": 1}), data=json.dumps(
+            generate_orders_data(weights)), content_type="application/json")
+
+    def test_disabled(self):
+        self.assertFalse(self.post([30, 10, 20]).has_header('Server-Timing'))
+
+    @override_settings(ORDERS_INSTRUMENTATION=True)
+    def test_server_timing(self):
+        """Test the response times each phase, and the log line counts every query of the request, per phase
+        """
+
+        with self.assertLogs('orders.instrumentation', level='INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.post([30, 10, 20])
+
+        self.assertEqual(response.status_code, 200)
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual(metrics[:2], ['validation', 'idempotency'])
+        self.assertTrue({'fleet', 'packing', 'persist', 'bind', 'serialization'} <= set(metrics))
+        self.assertEqual(metrics[-1], 'total')
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['view'], line['status']), ('AssignSlotOrders', 200))
+        self.assertEqual(line['queries'], len(queries))
+        self.assertEqual(sum(phase['queries'] for phase in line['phases'].values()), len(queries))
+        self.assertEqual(line['phases']['validation']['queries'], 0)
+        self.assertGreater(line['phases']['persist']['rows'], 0)
+
+    def test_nested_phases(self):
+        """Test a phase's time leaves out the phases nested in it
+        """
+
+        with mock.patch.object(instrumentation.time, 'perf_counter', side_effect=[0, 1, 2, 5, 7, 10]):
+            recorder = instrumentation.Recorder('view')
+            with recorder.phase('persist'):
+                with recorder.phase('bind'):
+                    pass
+            total, phases = recorder.summary()
+
+        self.assertEqual(total, 10000)
+        self.assertEqual({name: phase['ms'] for name, phase in phases.items()}, {'persist': 3000, 'bind': 3000})
+
+    @override_settings(ORDERS_INSTRUMENTATION=True)
+    def test_error_responses_are_timed(self):
+        response = self.post([60])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+
+class MetricsTestCases(TestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_packing_metrics(self):
+        """Test assignments publish their orders, vehicles and fill ratios, and quotes their orders only
+        """
+
+        for name in ("assign_slot_orders", "quote_slot_orders"):
+            self.client.post(reverse(name, kwargs={"slot_number": 1}), data=json.dumps(
+                generate_orders_data([30, 10, 20])), content_type="application/json")
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        lines = response.content.decode().splitlines()
+        self.assertIn('orders_packed_total{strategy="ffd"} 6', lines)
+        self.assertIn('orders_vehicles_opened_total{vehicle_type="bike"} 2', lines)
+        self.assertIn('orders_vehicle_fill_ratio_bucket{vehicle_type="bike",le="1.0"} 2', lines)
+        self.assertIn('orders_vehicle_fill_ratio_sum{vehicle_type="bike"} 2.0', lines)
+        self.assertIn('orders_packing_seconds_count{strategy="ffd"} 2', lines)
+        self.assertIn('# TYPE orders_plan_cache_lookups_total counter', lines)
+        self.assertTrue(any(line.startswith('orders_plan_cache_lookups_total{result="hits"} ') for line in lines))
+        self.assertIn('# TYPE orders_plan_cache_hit_rate gauge', lines)
+
+    def test_packing_failures(self):
+        self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": 1}), data=json.dumps(
+            generate_orders_data([10, 20, 60])), content_type="application/json")
+
+        self.assertEqual(metrics.packing_failures.value(strategy='ffd'), 1)
+        self.assertEqual(metrics.packing_seconds.count(strategy='ffd'), 0)
+
+    def test_access(self):
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+        with override_settings(ORDERS_METRICS={'ENABLED': False, 'ALLOWED_IPS': ['127.0.0.1']}):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+
+class ProfilingTestCases(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def post(self, **extra):
+        with override_settings(ORDERS_PROFILING={
+                'ENABLED': True, 'DIRECTORY': self.directory, 'SAMPLE_INTERVAL': 0.0001}):
+            return self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": 1}), data=json.dumps(
+                generate_orders_data([30, 10, 20])), content_type="application/json", **extra)
+
+    def test_cprofile(self):
+        response = self.post(HTTP_PROFILE='cprofile')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(os.path.dirname(response['Profile-File']), self.directory)
+        stats = pstats.Stats(response['Profile-File'])
+        self.assertTrue(any(function == 'plan_delivery' for _, _, function in stats.stats))
+
+    def test_sample(self):
+        response = self.post(HTTP_PROFILE='sample')
+
+        self.assertTrue(response['Profile-File'].endswith('.folded'))
+        with open(response['Profile-File']) as profile:
+            for line in profile:
+                stack, count = line.rsplit(' ', 1)
+                self.assertGreater(int(count), 0)
+
+    def test_not_profiled(self):
+        self.assertFalse(self.post().has_header('Profile-File'))
+        self.assertFalse(self.post(HTTP_PROFILE='unknown').has_header('Profile-File'))
+
+        response = self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": 2}), data=json.dumps(
+            generate_orders_data([30])), content_type="application/json", HTTP_PROFILE='cprofile')
+        self.assertFalse(response.has_header('Profile-File'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class AddOrdersTestCases(TestCase):
+
+    def assign(self, slot_number, weights):
+        response = self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": slot_number}),
+                                    data=json.dumps(generate_orders_data(weights)), content_type="application/json")
+
+        return int(response['Slot-Delivery-Id'])
+
+    def add(self, slot_delivery_id, orders_api_data):
+        return self.client.post(reverse("add_slot_delivery_orders", kwargs={"slot_delivery_id": slot_delivery_id}),
+                                data=json.dumps(orders_api_data), content_type="application/json")
+
+    def test_orders_fill_the_room_left(self):
+        """Test added orders go into the vehicle they leave the least room in, without loading the delivery's
+        orders, and a vehicle is opened only when none has room
+        """
+
+        slot_delivery_id = self.assign(1, [25, 20])  # 2 bikes, 5 and 10 kgs left
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.add(slot_delivery_id, [{'order_id': 3, 'order_weight': 5},
+                                                   {'order_id': 4, 'order_weight': 10}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'vehicle_type': 'bike', 'delivery_vendor_id': 2, 'list_order_ids_added': [4], 'remaining_capacity': 0,
+             'opened': False},
+            {'vehicle_type': 'bike', 'delivery_vendor_id': 1, 'list_order_ids_added': [3], 'remaining_capacity': 0,
+             'opened': False},
+        ])
+        # Only the orders with the added ids are looked up, to refuse repeats
+        for query in context.captured_queries:
+            if query['sql'].startswith('SELECT') and '"orders_order"' in query['sql']:
+                self.assertIn('"orders_order"."order_id" IN (3, 4)', query['sql'])
+
+        response = self.add(slot_delivery_id, [{'order_id': 5, 'order_weight': 40}])
+        self.assertEqual(response.json(), [
+            {'vehicle_type': 'scooter', 'delivery_vendor_id': 1, 'list_order_ids_added': [5],
+             'remaining_capacity': 10, 'opened': True},
+        ])
+
+        slot_delivery = SlotDelivery.objects.get(id=slot_delivery_id)
+        self.assertEqual([[order.order_id for order in delivery_vehicle_order.orders.all()]
+                          for delivery_vehicle_order in slot_delivery.get_delivery_vehicle_orders()],
+                         [[1, 3], [2, 4], [5]])
+        self.assertEqual(VehicleReservation.objects.filter(slot_delivery=slot_delivery).count(), 3)
+
+    def test_cannot_add_orders(self):
+        """Test nothing is written if an order fits in no vehicle of the delivery, nor in a vehicle left
+        """
+
+        slot_delivery_id = self.assign(4, [40])
+
+        response = self.add(slot_delivery_id, [{'order_id': 2, 'order_weight': 10},
+                                               {'order_id': 3, 'order_weight': 60}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(DeliveryVehicleOrders.objects.get().remaining_capacity, 60)
+
+    def test_repeated_order_ids(self):
+        """Test order ids repeated in the request, or already in the delivery, are refused, and nothing is written
+        """
+
+        slot_delivery_id = self.assign(1, [25, 20])
+
+        response = self.add(slot_delivery_id, [{'order_id': 3, 'order_weight': 1}, {'order_id': 3, 'order_weight': 2}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [{}, {'order_id': ['This value is already used by another item.']}])
+
+        response = self.add(slot_delivery_id, [{'order_id': 3, 'order_weight': 1}, {'order_id': 2, 'order_weight': 2}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [{}, {'order_id': ['The delivery already has an order with this id.']}])
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_delivery_not_open(self):
+        slot_delivery_id = self.assign(1, [30])
+        SlotDelivery.objects.update(created=timezone.now() - datetime.timedelta(days=1))
+
+        self.assertEqual(self.add(slot_delivery_id, [{'order_id': 2, 'order_weight': 10}]).status_code, 404)
+        self.assertEqual(self.add(slot_delivery_id + 1, [{'order_id': 2, 'order_weight': 10}]).status_code, 404)
+
+
+class CancelOrderTestCases(TestCase):
+
+    def assign(self, slot_number, weights):
+        response = self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": slot_number}),
+                                    data=json.dumps(generate_orders_data(weights)), content_type="application/json")
+
+        return int(response['Slot-Delivery-Id'])
+
+    def cancel(self, slot_delivery_id, order_id):
+        return self.client.post(reverse("cancel_slot_delivery_order", kwargs={
+            "slot_delivery_id": slot_delivery_id, "order_id": order_id}))
+
+    def test_least_loaded_vehicle_is_released(self):
+        """Test the orders of the least utilized vehicle are moved into the room left in the others, and the
+        vehicle is released
+        """
+
+        slot_delivery_id = self.assign(3, [20, 20, 5, 5])  # bike 1 : orders 1, 3, 4; bike 2 : order 2
+
+        response = self.cancel(slot_delivery_id, 1)
+
+        bike = {'vehicle_type': 'bike', 'delivery_vendor_id': 1}
+        other_bike = {'vehicle_type': 'bike', 'delivery_vendor_id': 2}
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'cancelled_order_id': 1,
+            'moved_orders': [{'order_id': 3, 'from_vehicle': bike, 'to_vehicle': other_bike},
+                             {'order_id': 4, 'from_vehicle': bike, 'to_vehicle': other_bike}],
+            'released_vehicles': [bike],
+            'updated_vehicles': [dict(other_bike, remaining_capacity=0)],
+        })
+
+        delivery_vehicle_order = DeliveryVehicleOrders.objects.get()
+        self.assertEqual([order.order_id for order in delivery_vehicle_order.orders.all()], [2, 3, 4])
+        self.assertEqual(VehicleReservation.objects.get().delivery_vehicle_id,
+                         delivery_vehicle_order.delivery_vehicle_id)
+
+    def test_emptied_vehicle_is_released(self):
+        slot_delivery_id = self.assign(3, [25, 20, 10])  # bike 1 : order 1; bike 2 : orders 2, 3
+
+        response = self.cancel(slot_delivery_id, 1)
+
+        self.assertEqual(response.json()['moved_orders'], [])
+        self.assertEqual(response.json()['released_vehicles'], [{'vehicle_type': 'bike', 'delivery_vendor_id': 1}])
+        self.assertEqual(response.json()['updated_vehicles'], [])
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_no_repair(self):
+        """Test the capacity is freed when the vehicle's orders have nowhere to go
+        """
+
+        slot_delivery_id = self.assign(4, [40, 30])
+
+        response = self.cancel(slot_delivery_id, 2)
+
+        self.assertEqual(response.json(), {
+            'cancelled_order_id': 2,
+            'moved_orders': [],
+            'released_vehicles': [],
+            'updated_vehicles': [{'vehicle_type': 'truck', 'delivery_vendor_id': 1, 'remaining_capacity': 60}],
+        })
+        self.assertEqual(DeliveryVehicleOrders.objects.get().remaining_capacity, 60)
+
+    def test_unknown_order(self):
+        slot_delivery_id = self.assign(1, [30])
+
+        self.assertEqual(self.cancel(slot_delivery_id, 2).status_code, 404)
+        self.assertEqual(self.cancel(slot_delivery_id + 1, 1).status_code, 404)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_ambiguous_order(self):
+        """Test an order id the delivery has twice (stored before repeats were refused) is not cancelled
+        """
+
+        slot_delivery_id = self.assign(1, [30])
+        order = Order.objects.get()
+        Order.objects.create(order_id=order.order_id, weight=10,
+                             delivery_vehicle_order_id=order.delivery_vehicle_order_id)
+
+        response = self.cancel(slot_delivery_id, order.order_id)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['detail'],
+                         "Several orders with this id in the delivery")
+        self.assertEqual(Order.objects.count(), 2)
+
+
+@override_settings(ORDERS_ASYNC={'DB_WORKERS': 0, 'PACKING_WORKERS': 1})
+class AsyncAssignmentTestCases(TestCase):
+
+    def post(self, name, slot_number, data, query='', **headers):
+        url = reverse(name, kwargs={"slot_number": slot_number}) + query
+
+        return async_to_sync(self.async_client.post)(url, data=json.dumps(data), content_type="application/json",
+                                                     **headers)
+
+    def test_assign(self):
+        """Test the async view assigns as `AssignSlotOrders` does, and replays repeats
+        """
+
+        response = self.post("async_assign_slot_orders", 1, generate_orders_data([30, 10, 20]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'vehicle_type': 'bike', 'delivery_vendor_id': 1, 'list_order_ids_assigned': [1]},
+            {'vehicle_type': 'bike', 'delivery_vendor_id': 2, 'list_order_ids_assigned': [2, 3]}
+        ])
+        self.assertEqual(response['Slot-Delivery-Id'], str(SlotDelivery.objects.get().id))
+
+        repeat = self.client.post(reverse("assign_slot_orders", kwargs={"slot_number": 1}), data=json.dumps(
+            generate_orders_data([30, 10, 20])), content_type="application/json")
+        self.assertEqual(repeat.json(), response.json())
+        self.assertEqual(repeat['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_idempotency_key_reused(self):
+        # The async client of Django 3.1 takes header names as sent
+        headers = {'Idempotency-Key': 'abc'}
+        self.post("async_assign_slot_orders", 1, generate_orders_data([30]), **headers)
+        reused = self.post("async_assign_slot_orders", 1, generate_orders_data([50]), **headers)
+
+        self.assertEqual(reused.status_code, 422)
+        self.assertEqual(reused.json(), {'detail': 'Idempotency-Key already used for another request'})
+        self.assertEqual(SlotDelivery.objects.count(), 1)
+
+    def test_quote_matches_sync_quote(self):
+        orders_api_data = generate_orders_data([10, 10, 10, 5, 5, 2, 1, 2, 25])
+
+        response = self.post("async_quote_slot_orders", 3, orders_api_data, query='?strategy=bfd')
+        sync_response = self.client.post(reverse("quote_slot_orders", kwargs={"slot_number": 3}) + '?strategy=bfd',
+                                         data=json.dumps(orders_api_data), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync_response.json())
+        self.assertFalse(SlotDelivery.objects.exists())
+
+    def test_errors_match_sync_views(self):
+        cases = (
+            (1, [10, 20, 30, 40, 50], ''),
+            (7, [10, 20], ''),
+            (1, [10, 20, 60], ''),
+            (1, [{"order_id": 1, "order_weight": 0}], ''),
+            (1, [10], '?strategy=unknown'),
+        )
+        for slot_number, weights, query in cases:
+            orders_api_data = [weights[0]] if isinstance(weights[0], dict) else generate_orders_data(weights)
+            for name, sync_name in (("async_assign_slot_orders", "assign_slot_orders"),
+                                    ("async_quote_slot_orders", "quote_slot_orders")):
+                with self.subTest(slot_number=slot_number, weights=weights, view=name):
+                    response = self.post(name, slot_number, orders_api_data, query=query)
+                    sync_response = self.client.post(
+                        reverse(sync_name, kwargs={"slot_number": slot_number}) + query,
+                        data=json.dumps(orders_api_data), content_type="application/json")
+
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json(), sync_response.json())
+
+        self.assertFalse(SlotDelivery.objects.exists())
+        self.assertFalse(IdempotentResponse.objects.exists())
+
+    def test_invalid_requests(self):
+        url = reverse("async_quote_slot_orders", kwargs={"slot_number": 1})
+
+        response = async_to_sync(self.async_client.post)(url, data='[{', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error'))
+
+        self.assertEqual(async_to_sync(self.async_client.get)(url).status_code, 405)
+
+    def test_claim_conflict(self):
+        """Test the orders are planned again when a concurrent request reserved a planned vehicle first
+        """
+
+        persist_plan = SlotDelivery.persist_plan
+        calls = []
+
+        def conflicting_persist_plan(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise VehicleReservation.AlreadyReserved
+            return persist_plan(*args, **kwargs)
+
+        with mock.patch.object(SlotDelivery, 'persist_plan', side_effect=conflicting_persist_plan):
+            response = self.post("async_assign_slot_orders", 1, generate_orders_data([30]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(SlotDelivery.objects.count(), 1)
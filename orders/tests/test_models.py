@@ -1,5 +1,13 @@
-from django.test import TestCase
-from orders.models import Order, SlotDelivery, VehicleType, Slot
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from orders import fleet, jobs, packing
+from orders.plan_cache import build_plan_cache
+from orders.models import (AssignmentJob, Order, SlotDelivery, VehicleType, Slot, DeliveryVehicle,
+                           DeliveryVehicleOrders, VehicleReservation)
+from unittest import mock
 import json
 
 
@@ -58,3 +66,277 @@ class DeliveryTestCases(TestCase):
 
         self.assertRaises(SlotDelivery.OrdersWeightLimitError,
                           SlotDelivery.assign_new_batch_order_delivery, slot_number=1, orders=orders_data)
+
+    def test_orders_are_persisted_with_their_vehicle(self):
+        """Test that every order is saved along with the `DeliveryVehicleOrders` carrying it
+        """
+
+        orders_data = generate_orders_data([30, 10, 20])
+        assigned_delivery_vehicles = SlotDelivery.assign_new_batch_order_delivery(
+            slot_number=1, orders=orders_data)
+
+        self.assertEqual(
+            [[order.order_id for order in dv.orders.all()] for dv in assigned_delivery_vehicles],
+            [[1], [2, 3]]
+        )
+        self.assertEqual([dv.capacity for dv in assigned_delivery_vehicles], [0, 0])
+
+    def test_get_delivery_vehicle_orders(self):
+        """Test that a saved delivery's vehicles and orders are loaded in 2 queries
+        """
+
+        assigned_delivery_vehicles = SlotDelivery.assign_new_batch_order_delivery(
+            slot_number=3, orders=generate_orders_data([30, 10, 50]))
+        slot_delivery = SlotDelivery.objects.get()
+
+        with self.assertNumQueries(2):
+            delivery_vehicle_orders = [
+                (dv.delivery_vehicle.vehicle_type.name, [order.order_id for order in dv.orders.all()])
+                for dv in slot_delivery.get_delivery_vehicle_orders()
+            ]
+
+        self.assertEqual(delivery_vehicle_orders, [('scooter', [3]), ('bike', [1]), ('bike', [2])])
+        self.assertEqual([dv.pk for dv in slot_delivery.get_delivery_vehicle_orders()],
+                         [dv.pk for dv in assigned_delivery_vehicles])
+
+    def test_cannot_assign_orders_writes_nothing(self):
+        """Test that nothing is written when the orders cannot be assigned
+        """
+
+        orders_data = generate_orders_data([10, 20, 60])
+
+        self.assertRaises(SlotDelivery.CannotAssignOrders,
+                          SlotDelivery.assign_new_batch_order_delivery, slot_number=1, orders=orders_data)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(SlotDelivery.objects.exists())
+        self.assertFalse(DeliveryVehicleOrders.objects.exists())
+
+
+class FleetSnapshotTestCases(TestCase):
+    def tearDown(self):
+        # fleet changes made by a test are rolled back without any signal
+        fleet.invalidate()
+
+    def test_snapshot_is_sorted_by_capacity(self):
+        """Test that the snapshot counts the slot's vehicles per type, in ascending order of capacity
+        """
+
+        snapshot = fleet.get_snapshot(3)
+
+        self.assertEqual(snapshot.type_names, ('bike', 'scooter', 'truck'))
+        self.assertEqual(snapshot.counts, (3, 2, 1))
+        self.assertEqual(snapshot.capacities, (30, 30, 30, 50, 50, 100))
+        self.assertEqual([snapshot.vehicle_class(idx) for idx in range(len(snapshot))], [0, 0, 0, 1, 1, 2])
+        self.assertEqual(snapshot.without({snapshot.type_ids[0]: 2}).capacities, (30, 50, 50, 100))
+        self.assertIsNone(fleet.get_snapshot(7))
+
+    def test_bind_vehicles(self):
+        """Test that vehicle positions are bound to the free vehicles of their type, lowest ids first
+        """
+
+        snapshot = fleet.get_snapshot(3)
+        bikes = list(DeliveryVehicle.objects.filter(vehicle_type__name='bike').order_by('id'))
+
+        delivery_vehicles = fleet.bind_vehicles(snapshot, [5, 0, 1], timezone.localdate(), exclude=[bikes[0].id])
+
+        self.assertEqual([delivery_vehicle.id for delivery_vehicle in delivery_vehicles[1:]],
+                         [bikes[1].id, bikes[2].id])
+        self.assertEqual(delivery_vehicles[0].vehicle_type.name, 'truck')
+        self.assertEqual(delivery_vehicles[0].delivery_vendor_id, 1)
+        with self.assertRaises(VehicleReservation.AlreadyReserved):
+            fleet.bind_vehicles(snapshot, [0, 1, 2], timezone.localdate(), exclude=[bikes[0].id])
+
+    def test_warm_cache_does_no_fleet_queries(self):
+        """Test that assigning orders does not load the fleet once the cache is warm : only the vehicles used
+        are looked up, to bind them
+        """
+
+        fleet.get_snapshots()
+        fleet_tables = ('"orders_slot"', '"orders_vehicletype"')
+
+        with CaptureQueriesContext(connection) as context:
+            SlotDelivery.assign_new_batch_order_delivery(
+                slot_number=1, orders=generate_orders_data([30, 10, 20]))
+
+        bindings = [query['sql'] for query in context.captured_queries
+                    if query['sql'].startswith('SELECT "orders_deliveryvehicle"')]
+        self.assertEqual(len(bindings), 1)
+        self.assertIn('LIMIT 2', bindings[0])
+        for query in context.captured_queries:
+            self.assertFalse(any(table in query['sql'] for table in fleet_tables), query['sql'])
+
+    def test_fleet_changes_invalidate_the_cache(self):
+        """Test that adding a vehicle, or assigning a vehicle type to a slot, reloads the snapshot
+        """
+
+        truck = VehicleType.objects.get(name='truck')
+        self.assertEqual(fleet.get_snapshot(1).capacities, (30, 30, 30, 50, 50))
+
+        DeliveryVehicle.objects.create(vehicle_type=VehicleType.objects.get(name='bike'), delivery_vendor_id=4)
+        self.assertEqual(fleet.get_snapshot(1).capacities, (30, 30, 30, 30, 50, 50))
+
+        Slot.objects.get(slot_number=1).vehicle_types_assigned.add(truck)
+        self.assertEqual(fleet.get_snapshot(1).capacities, (30, 30, 30, 30, 50, 50, 100))
+
+    @override_settings(ORDERS_FLEET_CACHE='default')
+    def test_other_processes_invalidate_the_cache(self):
+        """Test that the snapshots are reloaded once another process changed the shared version, or it was evicted
+        """
+
+        snapshots = fleet.get_snapshots()
+        self.assertIs(fleet.get_snapshots(), snapshots)
+
+        caches['default'].set(fleet.VERSION_KEY, 'changed by another worker')
+        reloaded = fleet.get_snapshots()
+        self.assertIsNot(reloaded, snapshots)
+        self.assertIs(fleet.get_snapshots(), reloaded)
+
+        caches['default'].delete(fleet.VERSION_KEY)
+        self.assertIsNot(fleet.get_snapshots(), reloaded)
+
+
+class PlanCacheTestCases(SimpleTestCase):
+
+    def test_django_cache_backend(self):
+        """Test that plans are shared through the Django cache
+        """
+
+        capacities = [30, 30, 30, 50, 50]
+        packing.pack([30, 10, 20], capacities, cache=build_plan_cache({'BACKEND': 'django', 'TTL': 60}))
+        cache = build_plan_cache({'BACKEND': 'django', 'TTL': 60})
+
+        plan = packing.pack([10, 20, 30], capacities, cache=cache)
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual([(vehicle.vehicle, vehicle.items) for vehicle in plan], [(0, [2]), (1, [1, 0])])
+
+    def test_disabled(self):
+        self.assertIsNone(build_plan_cache({'BACKEND': None}))
+
+
+class AssignmentJobTestCases(TestCase):
+
+    def create_job(self, slot_number, weights):
+        return AssignmentJob.objects.create(slot_number=slot_number, orders=generate_orders_data(weights))
+
+    def test_run(self):
+        """Test a job persists its assignment, and records the response data and timings
+        """
+
+        job = self.create_job(1, [30, 10, 20])
+        jobs.run(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, AssignmentJob.SUCCEEDED)
+        self.assertEqual(job.slot_delivery.delivery_vehicle_orders.count(), 2)
+        self.assertEqual([vehicle['list_order_ids_assigned'] for vehicle in job.result], [[1], [2, 3]])
+        self.assertEqual(set(job.timings), {'queued', 'packing', 'persisting', 'total'})
+        self.assertIsNotNone(job.finished)
+
+    def test_run_failure(self):
+        """Test a job that cannot be assigned fails with the error detail, and writes nothing
+        """
+
+        job = self.create_job(1, [10, 20, 60])
+        jobs.run(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, AssignmentJob.FAILED)
+        self.assertEqual(job.result, {'detail': 'Unable to assign to the available delivery vehicles'})
+        self.assertFalse(SlotDelivery.objects.exists())
+
+    def test_cancel_pending(self):
+        """Test a job cancelled before it starts never runs
+        """
+
+        job = self.create_job(1, [30, 10, 20])
+
+        self.assertEqual(AssignmentJob.cancel(job.id), AssignmentJob.CANCELLED)
+        self.assertFalse(AssignmentJob.claim(job.id))
+        jobs.run(job.id)
+        self.assertFalse(SlotDelivery.objects.exists())
+
+    def test_cancel_running(self):
+        """Test a job cancelled while running does not persist its assignment
+        """
+
+        job = self.create_job(1, [30, 10, 20])
+        AssignmentJob.objects.filter(id=job.id).update(cancel_requested=True)
+        jobs.run(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, AssignmentJob.CANCELLED)
+        self.assertIsNone(job.result)
+        self.assertFalse(SlotDelivery.objects.exists())
+
+    def test_cancel_while_packing(self):
+        """Test a job cancelled once its orders are packed, before the assignment is persisted, persists nothing
+        """
+
+        job = self.create_job(1, [30, 10, 20])
+        quote = SlotDelivery.quote_new_batch_order_delivery
+
+        def quote_then_cancel(*args, **kwargs):
+            try:
+                return quote(*args, **kwargs)
+            finally:
+                AssignmentJob.cancel(job.id)
+
+        with mock.patch.object(SlotDelivery, 'quote_new_batch_order_delivery', side_effect=quote_then_cancel):
+            jobs.run(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, AssignmentJob.CANCELLED)
+        self.assertIsNotNone(job.finished)
+        self.assertFalse(SlotDelivery.objects.exists())
+
+    def test_cancel_unknown_job(self):
+        self.assertIsNone(AssignmentJob.cancel(1))
+
+
+class VehicleReservationTestCases(TestCase):
+
+    def test_reserved_vehicles_are_not_reassigned(self):
+        """Test a slot's vehicles are assigned at most once a day, and freed with their delivery
+        """
+
+        first = SlotDelivery.assign_new_batch_order_delivery(4, generate_orders_data([40]))
+        self.assertEqual(VehicleReservation.objects.count(), 1)
+
+        with self.assertRaises(SlotDelivery.CannotAssignOrders):
+            SlotDelivery.assign_new_batch_order_delivery(4, generate_orders_data([10]))
+
+        # The same truck serves another slot
+        SlotDelivery.assign_new_batch_order_delivery(2, generate_orders_data([60]))
+
+        first[0].slot_delivery.delete()
+        SlotDelivery.assign_new_batch_order_delivery(4, generate_orders_data([10]))
+
+    def test_quote_leaves_reserved_vehicles_out(self):
+        SlotDelivery.assign_new_batch_order_delivery(1, generate_orders_data([30, 30]))
+
+        quote = SlotDelivery.quote_new_batch_order_delivery(1, generate_orders_data([30]))
+
+        self.assertEqual(len(quote.snapshot), 3)
+        self.assertEqual(quote.delivery_vehicles[0].delivery_vendor_id, 3)
+
+    def test_claim_conflict(self):
+        """Test a vehicle reserved between planning and persisting is planned around
+        """
+
+        SlotDelivery.assign_new_batch_order_delivery(1, generate_orders_data([30, 30, 30]))
+        reserved_vehicles = VehicleReservation.reserved_vehicles
+        calls = []
+
+        def stale_reserved_vehicles(slot_ids, date):
+            # The first lookup misses the reservations, as if they were committed right after
+            calls.append(slot_ids)
+            return {slot_id: {} for slot_id in slot_ids} if len(calls) == 1 else reserved_vehicles(slot_ids, date)
+
+        with mock.patch.object(VehicleReservation, 'reserved_vehicles', side_effect=stale_reserved_vehicles):
+            assigned = SlotDelivery.assign_new_batch_order_delivery(1, generate_orders_data([30]))
+
+        # Planned on a bike first, none of which was left to bind
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(assigned[0].delivery_vehicle.vehicle_type.name, 'scooter')
+        self.assertEqual(VehicleReservation.objects.count(), 4)
@@ -0,0 +1,600 @@
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from io import StringIO
+from unittest import mock, skipUnless
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from orders import packing
+from orders.packing import exact, integer, vectorized, workloads
+
+
+def linear_first_fit_decreasing(weights, capacities):
+    """The original O(n.m) First Fit Decreasing, kept as a reference
+    Returns the (vehicle, items) of each opened vehicle
+    """
+
+    opened = []
+    available_vehicles = list(range(len(capacities)))
+    for item in sorted(range(len(weights)), key=weights.__getitem__, reverse=True):
+        for vehicle in opened:
+            if weights[item] <= vehicle[2]:
+                vehicle[1].append(item)
+                vehicle[2] -= weights[item]
+                break
+        else:
+            for idx, vehicle in enumerate(available_vehicles):
+                if capacities[vehicle] >= weights[item]:
+                    available_vehicles.pop(idx)
+                    opened.append([vehicle, [item], capacities[vehicle] - weights[item]])
+                    break
+            else:
+                raise packing.CannotPack(item)
+
+    return [(vehicle, items) for vehicle, items, _ in opened]
+
+
+class FirstFitDecreasingTestCases(SimpleTestCase):
+
+    # bikes, scooters then a truck; as ordered for slots 2 and 3
+    capacities = [30, 30, 30, 50, 50, 100]
+
+    def assertPlan(self, plan, expected):
+        self.assertEqual([(vehicle.vehicle, vehicle.items) for vehicle in plan], expected)
+
+    def test_opens_smallest_vehicle_that_fits(self):
+        """[30, 50] uses a scooter and a bike
+        """
+
+        plan = packing.pack([30, 50], self.capacities)
+
+        self.assertPlan(plan, [(3, [1]), (0, [0])])
+
+    def test_fills_opened_vehicles_first(self):
+        """[10, 10, 10, 5, 5, 2, 1, 2, 25] uses 3 bikes; ties keep their input order
+        """
+
+        plan = packing.pack([10, 10, 10, 5, 5, 2, 1, 2, 25], self.capacities)
+
+        self.assertPlan(plan, [(0, [8, 3]), (1, [0, 1, 2]), (2, [4, 5, 7, 6])])
+        self.assertEqual([vehicle.load for vehicle in plan], [30, 30, 10])
+
+    def test_cannot_pack(self):
+        """An item heavier than every vehicle cannot be packed
+        """
+
+        with self.assertRaises(packing.CannotPack) as context:
+            packing.pack([10, 60], [30, 50])
+
+        self.assertEqual(context.exception.item, 1)
+
+    def test_runs_out_of_vehicles(self):
+        """Items cannot be packed once every vehicle is used
+        """
+
+        self.assertRaises(packing.CannotPack, packing.pack, [30, 30, 30], [30, 30])
+
+    def test_matches_linear_first_fit_decreasing(self):
+        """The indexed implementation opens the same vehicles, with the same items, as the linear one
+        """
+
+        rng = random.Random(6)
+        for _ in range(200):
+            capacities = sorted(rng.choice([30, 50, 100]) for _ in range(rng.randint(1, 40)))
+            weights = [rng.choice([rng.randint(1, 30), round(rng.uniform(0.5, 49.5), 1)])
+                       for _ in range(rng.randint(0, 60))]
+
+            try:
+                expected = linear_first_fit_decreasing(weights, capacities)
+            except packing.CannotPack:
+                self.assertRaises(packing.CannotPack, packing.first_fit_decreasing, weights, capacities)
+                continue
+
+            self.assertPlan(packing.first_fit_decreasing(weights, capacities), expected)
+
+    def test_unknown_strategy(self):
+        self.assertRaises(packing.UnknownStrategy, packing.pack, [10], [30], strategy='nope')
+
+
+@skipUnless(vectorized.available, "NumPy is not installed")
+class VectorizedFirstFitDecreasingTestCases(SimpleTestCase):
+
+    def test_matches_first_fit_decreasing(self):
+        """The NumPy backend opens the same vehicles, with the same items, as `first_fit_decreasing`
+        """
+
+        rng = random.Random(7)
+        for _ in range(200):
+            capacities = [rng.choice([30, 50, 100]) for _ in range(rng.randint(1, 40))]
+            weights = [rng.randint(1, 60) for _ in range(rng.randint(0, 80))]
+
+            try:
+                expected = packing.first_fit_decreasing(weights, capacities)
+            except packing.CannotPack as error:
+                with self.assertRaises(packing.CannotPack) as context:
+                    vectorized.vectorized_first_fit_decreasing(weights, capacities)
+                self.assertEqual(context.exception.item, error.item)
+                continue
+
+            plan = vectorized.vectorized_first_fit_decreasing(weights, capacities)
+            self.assertEqual([(vehicle.vehicle, vehicle.items, vehicle.remaining) for vehicle in plan],
+                             [(vehicle.vehicle, vehicle.items, vehicle.remaining) for vehicle in expected])
+
+    def test_large_whole_weight_batches_switch_backend(self):
+        """'ffd' switches to the NumPy backend from `VECTORIZED_THRESHOLD` items, for whole weights only
+        """
+
+        backend = mock.patch.object(vectorized, 'vectorized_first_fit_decreasing',
+                                    wraps=vectorized.vectorized_first_fit_decreasing)
+        with mock.patch.object(packing, 'VECTORIZED_THRESHOLD', 3), backend as vectorized_ffd:
+            packing.pack([10, 20], [30, 30])
+            packing.pack([10, 20, 5.5], [30, 30])
+            self.assertEqual(vectorized_ffd.call_count, 0)
+
+            packing.pack([10, 20, 5], [30, 30])
+            self.assertEqual(vectorized_ffd.call_count, 1)
+
+
+class FixedPointTestCases(SimpleTestCase):
+
+    def test_fixed_point(self):
+        self.assertEqual(integer.fixed_point([10, 20], [30]), ([10, 20], [30], 1))
+        self.assertEqual(integer.fixed_point([0.5, 1.25], [30]), ([50, 125], [3000], 100))
+        self.assertIsNone(integer.fixed_point([1 / 3], [30]))
+        self.assertIsNone(integer.fixed_point([-1], [30]))
+
+    def test_counting_sort_decreasing(self):
+        self.assertEqual(list(integer.counting_sort_decreasing([5, 10, 5, 0, 10])),
+                         [(10, [1, 4]), (5, [0, 2]), (0, [3])])
+
+    def test_matches_float_strategies_for_whole_weights(self):
+        """The fixed point strategies open the same vehicles, with the same items, as the float ones
+        """
+
+        rng = random.Random(8)
+        for _ in range(200):
+            capacities = sorted(rng.choice([30, 50, 100]) for _ in range(rng.randint(1, 40)))
+            weights = [rng.randint(0, 60) for _ in range(rng.randint(0, 80))]
+
+            for float_strategy, integer_strategy in (
+                    (packing.first_fit_decreasing, integer.bucketed_first_fit_decreasing),
+                    (packing.best_fit_decreasing, integer.bucketed_best_fit_decreasing)):
+                try:
+                    expected = float_strategy(weights, capacities)
+                except packing.CannotPack:
+                    self.assertRaises(packing.CannotPack, integer_strategy, weights, capacities)
+                    continue
+
+                self.assertEqual(
+                    [(vehicle.vehicle, vehicle.items, vehicle.remaining) for vehicle in integer_strategy(
+                        weights, capacities)],
+                    [(vehicle.vehicle, vehicle.items, vehicle.remaining) for vehicle in expected])
+
+    def test_no_float_drift(self):
+        """Three 0.1 kg items fill a 0.3 kg vehicle exactly, where repeated float subtraction leaves 0.0999...
+        """
+
+        for strategy in ('ffd', 'bfd'):
+            plan = packing.pack([0.1, 0.1, 0.1], [0.3, 0.3], strategy=strategy)
+
+            self.assertEqual([(vehicle.vehicle, vehicle.items, vehicle.remaining) for vehicle in plan],
+                             [(0, [0, 1, 2], 0)])
+        self.assertEqual(packing.first_fit_decreasing([0.1, 0.1, 0.1], [0.3, 0.3]).vehicle_count, 2)
+
+
+class BestFitDecreasingTestCases(SimpleTestCase):
+
+    def test_picks_the_tightest_vehicle(self):
+        """[25, 20, 5] : 5 goes in the vehicle left with 5, not the first opened one
+        """
+
+        plan = packing.pack([20, 25, 5], [30, 30], strategy='bfd')
+
+        self.assertEqual([(vehicle.vehicle, vehicle.items) for vehicle in plan], [(0, [1, 2]), (1, [0])])
+
+    def test_matches_linear_best_fit_decreasing(self):
+        """The heaps open the same vehicles, with the same items, as a linear scan of the opened vehicles
+        """
+
+        rng = random.Random(8)
+        for _ in range(200):
+            capacities = [rng.choice([30, 50, 100]) for _ in range(rng.randint(1, 40))]
+            weights = [rng.choice([rng.randint(1, 30), round(rng.uniform(0.5, 49.5), 1)])
+                       for _ in range(rng.randint(0, 60))]
+
+            opened, free = [], list(range(len(capacities)))
+            try:
+                for item in sorted(range(len(weights)), key=weights.__getitem__, reverse=True):
+                    fits = [vehicle for vehicle in opened if vehicle[2] >= weights[item]]
+                    if fits:
+                        vehicle = min(fits, key=lambda vehicle: vehicle[2])
+                    else:
+                        large_enough = [idx for idx in free if capacities[idx] >= weights[item]]
+                        if not large_enough:
+                            raise packing.CannotPack(item)
+                        idx = min(large_enough, key=lambda idx: (capacities[idx], idx))
+                        free.remove(idx)
+                        vehicle = [idx, [], capacities[idx]]
+                        opened.append(vehicle)
+                    vehicle[1].append(item)
+                    vehicle[2] -= weights[item]
+            except packing.CannotPack:
+                self.assertRaises(packing.CannotPack, packing.best_fit_decreasing, weights, capacities)
+                continue
+
+            plan = packing.best_fit_decreasing(weights, capacities)
+            self.assertEqual([(vehicle.vehicle, vehicle.items) for vehicle in plan],
+                             [(vehicle, items) for vehicle, items, _ in opened])
+
+    def test_packs_every_item_within_capacity(self):
+        rng = random.Random(7)
+        weights = [rng.randint(1, 50) for _ in range(500)]
+        plan = packing.pack(weights, [30] * 300 + [50] * 300, strategy='bfd')
+
+        self.assertEqual(sorted(item for vehicle in plan for item in vehicle.items), list(range(500)))
+        self.assertTrue(all(0 <= vehicle.remaining for vehicle in plan))
+
+
+class OnlineFirstFitTestCases(SimpleTestCase):
+
+    def test_first_fit_in_arrival_order(self):
+        """[10, 25, 20, 5] : vehicles are opened largest first, 5 goes back in the first one
+        """
+
+        packer = packing.OnlineFirstFit([30, 30, 50])
+
+        self.assertEqual([packer.add(weight) for weight in (10, 25, 20, 5)], [0, 0, 1, 0])
+        self.assertEqual(packer.vehicles, [2, 0])
+        self.assertEqual(packer.counts, [3, 1])
+        self.assertEqual(packer.loads(), [40, 20])
+
+    def test_downsize(self):
+        """The loads move to the smallest vehicles that can carry them
+        """
+
+        packer = packing.OnlineFirstFit([30, 30, 50, 100])
+        for weight in (40, 30, 20, 25):
+            packer.add(weight)
+
+        self.assertEqual(packer.downsize(), [3, 0])
+        self.assertEqual(packer.remaining, [10, 5])
+
+    def test_cannot_pack(self):
+        packer = packing.OnlineFirstFit([30, 50])
+        packer.add(40)
+
+        with self.assertRaises(packing.CannotPack) as context:
+            packer.add(35)
+        self.assertEqual(context.exception.item, 1)
+
+
+class BranchAndBoundTestCases(SimpleTestCase):
+
+    capacities = [30, 30, 30, 50, 50, 100]
+
+    def test_uses_one_truck_over_two_scooters(self):
+        """[50, 50] fits in one truck, where First Fit Decreasing uses 2 scooters
+        """
+
+        plan = packing.pack([50, 50], self.capacities, strategy='exact')
+
+        self.assertEqual([(vehicle.vehicle, vehicle.items) for vehicle in plan], [(5, [0, 1])])
+        self.assertEqual(plan.lower_bound, 1)
+        self.assertTrue(plan.optimal)
+
+    def test_prefers_less_capacity_for_as_many_vehicles(self):
+        """[10, 20, 30, 40] without a truck uses 2 scooters, not a scooter and 2 bikes
+        """
+
+        plan = packing.pack([10, 20, 30, 40], [30, 30, 30, 50, 50], strategy='exact')
+
+        self.assertEqual(sorted(vehicle.capacity for vehicle in plan), [50, 50])
+        self.assertEqual(sorted(sorted(vehicle.items) for vehicle in plan), [[0, 3], [1, 2]])
+        self.assertEqual(plan.gap, 0)
+
+    def test_never_worse_than_first_fit_decreasing(self):
+        """The exact plan never uses more vehicles, or more capacity, than First Fit Decreasing
+        """
+
+        capacities = [30] * 6 + [50] * 4 + [100] * 2
+        for weights in ([10, 10, 10, 5, 5, 2, 1, 2, 25], [30, 10, 20, 40], [26, 26, 26, 24, 24, 24],
+                        [7, 13, 29, 31, 17, 3, 11, 19, 23, 5], [49, 51, 33, 33, 34, 1]):
+            ffd = packing.pack(weights, capacities)
+            exact = packing.pack(weights, capacities, strategy='exact')
+
+            self.assertLessEqual((exact.vehicle_count, exact.total_capacity),
+                                 (ffd.vehicle_count, ffd.total_capacity))
+            self.assertEqual(sorted(item for vehicle in exact for item in vehicle.items), list(range(len(weights))))
+            self.assertTrue(all(vehicle.load <= vehicle.capacity for vehicle in exact))
+
+    def test_time_budget_returns_best_plan_found(self):
+        """When the time budget runs out, a valid plan comes back with its lower bound
+        """
+
+        weights = [(item * 7919) % 29 + 1 for item in range(60)]
+        plan = packing.pack(weights, [30] * 40 + [50] * 20 + [100] * 10, strategy='exact', time_budget=0)
+
+        self.assertLessEqual(plan.lower_bound, plan.vehicle_count)
+        self.assertGreaterEqual(plan.gap, 0)
+        self.assertEqual(sorted(item for vehicle in plan for item in vehicle.items), list(range(60)))
+
+    def test_deep_batch(self):
+        """The search is not bound by the recursion limit : one level per item
+        """
+
+        plan = packing.pack([50] * 2 + [1] * 1200, [50] * 2 + [100] * 20, strategy='exact', time_budget=5)
+
+        self.assertEqual(plan.vehicle_count, 13)
+        self.assertTrue(plan.optimal)
+
+    def test_vehicle_mixes_in_cost_order(self):
+        """The lazily generated mixes are every mix of the fleet that could carry the items, cheapest first
+        """
+
+        classes, limits = [30, 50, 100], [4, 2, 3]
+        class_vehicles = [[None] * limit for limit in limits]
+        expected = sorted(
+            ((sum(mix), sum(capacity * count for capacity, count in zip(classes, mix))), mix)
+            for mix in itertools.product(*(range(limit + 1) for limit in limits))
+            if 3 <= sum(mix) <= 6 and mix[2] and sum(capacity * count for capacity, count in zip(classes, mix)) >= 150)
+
+        mixes = list(exact._vehicle_mixes(classes, class_vehicles, 150, 80, 3, (6, 0), None))
+
+        self.assertEqual(mixes, expected)
+
+    def test_time_budget_covers_the_vehicle_mixes(self):
+        """Enumerating a large fleet's vehicle mixes stops with the time budget too
+        """
+
+        weights = [(item * 7919) % 100 + 1 for item in range(800)]
+        start = time.perf_counter()
+        plan = packing.pack(weights, [30] * 2000 + [50] * 2000 + [100] * 2000, strategy='exact', time_budget=0.01)
+
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertFalse(plan.optimal)
+
+    def test_cannot_pack(self):
+        self.assertRaises(packing.CannotPack, packing.pack, [60], [30, 50], strategy='exact')
+        self.assertRaises(packing.CannotPack, packing.pack, [50, 50, 50], [50, 50], strategy='exact')
+
+
+class LocalSearchTestCases(SimpleTestCase):
+
+    capacities = [30, 30, 30, 50, 50, 100]
+
+    def assertValidPlan(self, plan, weights, capacities):
+        self.assertEqual(sorted(item for vehicle in plan for item in vehicle.items), list(range(len(weights))))
+        self.assertEqual(len({vehicle.vehicle for vehicle in plan}), plan.vehicle_count)
+        for vehicle in plan:
+            self.assertEqual(vehicle.capacity, capacities[vehicle.vehicle])
+            self.assertEqual(vehicle.remaining, vehicle.capacity - sum(weights[item] for item in vehicle.items))
+            self.assertGreaterEqual(vehicle.remaining, 0)
+
+    def build_plan(self, weights, capacities, vehicles):
+        """Returns the plan loading each vehicle of `vehicles` with its items"""
+
+        plan = packing.Plan(strategy='ffd')
+        for vehicle, items in vehicles:
+            planned_vehicle = plan.open(vehicle, capacities[vehicle])
+            for item in items:
+                planned_vehicle.add(item, weights[item])
+
+        return plan
+
+    def test_merges_two_scooters_into_a_truck(self):
+        """[50, 50] goes in one truck, where First Fit Decreasing uses 2 scooters
+        """
+
+        plan = packing.pack([50, 50], self.capacities, strategy='ffd-ls')
+
+        self.assertEqual([(vehicle.vehicle, sorted(vehicle.items)) for vehicle in plan], [(5, [0, 1])])
+        self.assertEqual(plan.moves, 1)
+
+    def test_downsize(self):
+        """A vehicle is swapped for the smallest free one carrying its load
+        """
+
+        weights = [20, 10]
+        capacities = [100, 50, 30]
+        plan = packing.improve(self.build_plan(weights, capacities, [(0, [0, 1])]), weights, capacities)
+
+        self.assertEqual([(vehicle.vehicle, vehicle.items) for vehicle in plan], [(2, [0, 1])])
+        self.assertEqual(plan.moves, 1)
+        self.assertValidPlan(plan, weights, capacities)
+
+    def test_swap(self):
+        """Items are exchanged when it lets the lightened vehicle be downsized
+        """
+
+        weights = [25, 10, 20, 15]
+        capacities = [50, 50, 30]
+        # 2 scooters loaded with 35 kgs each : they cannot be merged, nor downsized
+        plan = self.build_plan(weights, capacities, [(0, [0, 1]), (1, [2, 3])])
+        plan = packing.improve(plan, weights, capacities)
+
+        self.assertEqual(sorted((vehicle.capacity, sorted(vehicle.items)) for vehicle in plan),
+                         [(30, [1, 2]), (50, [0, 3])])
+        self.assertEqual(plan.moves, 1)
+        self.assertValidPlan(plan, weights, capacities)
+
+    def test_never_worse_than_construction(self):
+        """The improved plan is valid, and never uses more vehicles, or more capacity, than the one it started from
+        """
+
+        rng = random.Random(7)
+        capacities = [30] * 20 + [50] * 10 + [100] * 5
+        for _ in range(50):
+            weights = [rng.randint(1, 45) for _ in range(rng.randint(1, 25))]
+            for strategy in ('ffd', 'bfd'):
+                plan = packing.pack(weights, capacities, strategy=strategy)
+                improved = packing.pack(weights, capacities, strategy=f'{strategy}-ls')
+
+                self.assertLessEqual((improved.vehicle_count, improved.total_capacity),
+                                     (plan.vehicle_count, plan.total_capacity))
+                self.assertValidPlan(improved, weights, capacities)
+
+    def test_time_budget(self):
+        """Once the time budget runs out, the plan comes back valid, as improved so far
+        """
+
+        weights = [(item * 7919) % 29 + 1 for item in range(2000)]
+        capacities = [30] * 1500 + [50] * 500 + [100] * 100
+        plan = packing.first_fit_decreasing(weights, capacities)
+
+        with mock.patch.object(packing.local_search, 'CLOCK_CHECK_INTERVAL', 1):
+            improved = packing.improve(plan, weights, capacities, time_budget=0)
+
+        self.assertEqual(improved.moves, 0)
+        self.assertValidPlan(improved, weights, capacities)
+
+
+class PlanCacheTestCases(SimpleTestCase):
+
+    capacities = [30, 30, 30, 50, 50, 100]
+
+    def assertSamePlan(self, plan, expected):
+        self.assertEqual([(vehicle.vehicle, vehicle.items, vehicle.remaining) for vehicle in plan],
+                         [(vehicle.vehicle, vehicle.items, vehicle.remaining) for vehicle in expected])
+
+    def test_hit_remaps_items(self):
+        """A batch with the same weights, in another order, gets the cached plan mapped onto its items
+        """
+
+        cache = packing.PlanCache(packing.LocalMemoryBackend())
+        packing.pack([10, 10, 10, 5, 5, 2, 1, 2, 25], self.capacities, cache=cache)
+        weights = [2, 25, 10, 5, 1, 10, 2, 5, 10]
+
+        plan = packing.pack(weights, self.capacities, cache=cache)
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertSamePlan(plan, packing.pack(weights, self.capacities))
+
+    def test_hit_keeps_moves(self):
+        cache = packing.PlanCache(packing.LocalMemoryBackend())
+        packing.pack([50, 50], self.capacities, strategy='ffd-ls', cache=cache)
+
+        plan = packing.pack([50, 50], self.capacities, strategy='ffd-ls', cache=cache)
+
+        self.assertEqual((cache.hits, plan.moves), (1, 1))
+        self.assertSamePlan(plan, packing.pack([50, 50], self.capacities, strategy='ffd-ls'))
+
+    def test_key_covers_fleet_and_strategy(self):
+        cache = packing.PlanCache(packing.LocalMemoryBackend())
+        packing.pack([50, 50], self.capacities, cache=cache)
+        packing.pack([50, 50], self.capacities[:-1], cache=cache)
+        packing.pack([50, 50], self.capacities, strategy='exact', cache=cache)
+
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+    def test_time_boxed_plans_are_not_cached(self):
+        """A plan cut short by its time budget is not served to a later request with a larger budget
+        """
+
+        cache = packing.PlanCache(packing.LocalMemoryBackend())
+        with mock.patch.object(exact, 'CLOCK_CHECK_INTERVAL', 1):
+            plan = packing.pack([50, 50], self.capacities, strategy='exact', time_budget=0, cache=cache)
+        self.assertTrue(plan.timed_out)
+        self.assertEqual(plan.vehicle_count, 2)
+
+        plan = packing.pack([50, 50], self.capacities, strategy='exact', time_budget=1, cache=cache)
+        self.assertEqual([(vehicle.vehicle, vehicle.items) for vehicle in plan], [(5, [0, 1])])
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        packing.pack([50, 50], self.capacities, strategy='exact', time_budget=1, cache=cache)
+        self.assertEqual(cache.hits, 1)
+
+    def test_local_memory_backend_bounds(self):
+        """Entries are evicted least recently used first, and expire after the TTL
+        """
+
+        now = [0]
+        backend = packing.LocalMemoryBackend(max_size=2, ttl=10, clock=lambda: now[0])
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+
+        self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (1, None, 3))
+
+        now[0] = 10
+        self.assertIsNone(backend.get('a'))
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = packing.PlanCache(packing.FileBackend(directory))
+            packing.pack([30, 10, 20], self.capacities, cache=cache)
+            plan = packing.pack([20, 30, 10], self.capacities, cache=packing.PlanCache(packing.FileBackend(directory)))
+
+            self.assertSamePlan(plan, packing.pack([20, 30, 10], self.capacities))
+
+            backend = packing.FileBackend(directory, max_size=1)
+            backend.set('other', 1)
+            backend.prune()
+            self.assertEqual(backend.get('other'), 1)
+            self.assertIsNone(cache.backend.get(cache.key([30, 20, 10], self.capacities, 'ffd')))
+
+            expired = packing.FileBackend(directory, ttl=0)
+            self.assertIsNone(expired.get('other'))
+
+
+class WorkloadTestCases(SimpleTestCase):
+
+    def test_generate_weights(self):
+        """Test the weights are whole, within the fleet's largest capacity, and the same for a seed
+        """
+
+        for workload in workloads.WORKLOADS:
+            weights = workloads.generate_weights(workload, 1000, 50, random.Random(0))
+
+            self.assertEqual(len(weights), 1000)
+            self.assertTrue(all(isinstance(weight, int) and 1 <= weight <= 50 for weight in weights))
+            self.assertEqual(weights, workloads.generate_weights(workload, 1000, 50, random.Random(0)))
+
+        self.assertTrue(all(weight <= 3 for weight in workloads.generate_weights('tiny', 100, 50, random.Random(0))))
+
+    def test_scale_fleet(self):
+        """Test the fleet keeps the mix's proportions, and carries the batch even when most orders only fit the
+        largest vehicles
+        """
+
+        weights = [60] * 50 + [10] * 50
+        capacities = workloads.scale_fleet(workloads.FLEET_MIXES['slot-2'], weights)
+
+        self.assertEqual(capacities, sorted(capacities))
+        self.assertEqual(capacities.count(30), 3 * capacities.count(100))
+        self.assertEqual(capacities.count(50), 2 * capacities.count(100))
+        for strategy in ('ffd', 'bfd'):
+            packing.pack(weights, capacities, strategy)
+
+    def test_benchmark_command(self):
+        """Test the results are written as JSON, and compared with a baseline
+        """
+
+        options = {'sizes': [10, 1000], 'strategies': ['ffd', 'exact'], 'workloads': ['uniform'],
+                   'fleets': ['slot-1'], 'repeat': 1, 'max_size': ['exact=10'], 'stdout': StringIO()}
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark_packing', output=output, **options)
+            with open(output) as results:
+                report = json.load(results)
+
+            self.assertEqual([(result['size'], result['strategy']) for result in report['results']],
+                             [(10, 'ffd'), (10, 'exact'), (1000, 'ffd')])
+            for result in report['results']:
+                self.assertGreaterEqual(result['gap'], 0)
+                self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+
+            call_command('benchmark_packing', baseline=output, threshold=float('inf'), **options)
+
+            for result in report['results']:
+                result['vehicles'] -= 1
+            with open(output, 'w') as results:
+                json.dump(report, results)
+
+            with self.assertRaisesMessage(CommandError, '3 regression(s)'):
+                call_command('benchmark_packing', baseline=output, threshold=float('inf'), stderr=StringIO(),
+                             **options)
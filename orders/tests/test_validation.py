@@ -0,0 +1,77 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from rest_framework import serializers
+from orders.validation import ListValidator
+from orders.views import AssignSlotOrders
+
+
+class ListValidatorTestCases(SimpleTestCase):
+
+    # Payloads validated alike by DRF and `ListValidator`
+    PAYLOADS = (
+        [],
+        [{'order_id': 1, 'order_weight': 10}, {'order_id': 2, 'order_weight': 20}],
+        [{'order_id': '1', 'order_weight': 10.0}, {'order_id': ' 2 ', 'order_weight': '20.00'}],
+        [{'order_id': 1, 'order_weight': 10, 'extra': 'ignored'}],
+        [{'order_id': 1}, {'order_weight': 10}],
+        [{'order_id': None, 'order_weight': 10}],
+        [{'order_id': 1, 'order_weight': 10.5}, {'order_id': True, 'order_weight': 'ten'}],
+        [{'order_id': -1, 'order_weight': 0}],
+        [{'order_id': 'x' * 1001, 'order_weight': 10}],
+        [{'order_id': 1, 'order_weight': 10}, [1, 10], 'order', None],
+        {'order_id': 1, 'order_weight': 10},
+        'orders',
+    )
+
+    def setUp(self):
+        self.validator = AssignSlotOrders.orders_validator
+
+    def drf_validate(self, data):
+        serializer = AssignSlotOrders.InputSerializer(data=data, many=True)
+        if serializer.is_valid():
+            return serializer.validated_data, None
+        return None, serializer.errors
+
+    def list_validate(self, data):
+        try:
+            return self.validator.validate(data), None
+        except serializers.ValidationError as error:
+            return None, error.detail
+
+    def test_same_as_drf(self):
+        for payload in self.PAYLOADS:
+            with self.subTest(payload=payload):
+                drf_validated, drf_errors = self.drf_validate(payload)
+                validated, errors = self.list_validate(payload)
+
+                self.assertEqual(validated, drf_validated)
+                self.assertEqual(errors, drf_errors)
+                if errors:
+                    self.assertEqual(serializers.as_serializer_error(serializers.ValidationError(errors)),
+                                     serializers.as_serializer_error(serializers.ValidationError(drf_errors)))
+
+    def test_duplicate_order_ids(self):
+        """Repeated order ids are reported on the repeating items
+        """
+
+        validated, errors = self.list_validate(
+            [{'order_id': 1, 'order_weight': 10}, {'order_id': 2, 'order_weight': 10},
+             {'order_id': '1', 'order_weight': 20}])
+
+        self.assertIsNone(validated)
+        self.assertEqual(errors, [{}, {}, {'order_id': ['This value is already used by another item.']}])
+        self.assertEqual(errors[2]['order_id'][0].code, 'unique')
+
+    def test_unsupported_serializer(self):
+        class CharSerializer(serializers.Serializer):
+            name = serializers.CharField()
+
+        with self.assertRaises(TypeError):
+            ListValidator(CharSerializer)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_validation', sizes=[10], repeat=1, stdout=out)
+
+        self.assertIn('speedup', out.getvalue())
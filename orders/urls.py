@@ -1,6 +1,25 @@
-from .views import AssignSlotOrders
+from . import async_views
+from .metrics import MetricsView
+from .views import (AddSlotDeliveryOrders, AssignmentJobDetail, AssignSlotOrders, AssignSlotsOrders,
+                    CancelAssignmentJob, CancelSlotDeliveryOrder, QuoteSlotOrders, StreamSlotOrders,
+                    SubmitSlotOrdersJob)
 from django.urls import path
 
 urlpatterns = [
-    path('assign-slot-orders/<int:slot_number>', AssignSlotOrders.as_view(), name="assign_slot_orders")
+    path('assign-slot-orders/<int:slot_number>', AssignSlotOrders.as_view(), name="assign_slot_orders"),
+    path('assign-slots-orders', AssignSlotsOrders.as_view(), name="assign_slots_orders"),
+    path('quote-slot-orders/<int:slot_number>', QuoteSlotOrders.as_view(), name="quote_slot_orders"),
+    path('stream-slot-orders/<int:slot_number>', StreamSlotOrders.as_view(), name="stream_slot_orders"),
+    path('slot-deliveries/<int:slot_delivery_id>/orders', AddSlotDeliveryOrders.as_view(),
+         name="add_slot_delivery_orders"),
+    path('slot-deliveries/<int:slot_delivery_id>/orders/<int:order_id>/cancel', CancelSlotDeliveryOrder.as_view(),
+         name="cancel_slot_delivery_order"),
+    path('async/assign-slot-orders/<int:slot_number>', async_views.assign_slot_orders,
+         name="async_assign_slot_orders"),
+    path('async/quote-slot-orders/<int:slot_number>', async_views.quote_slot_orders,
+         name="async_quote_slot_orders"),
+    path('metrics', MetricsView.as_view(), name="metrics"),
+    path('assign-slot-orders-jobs/<int:slot_number>', SubmitSlotOrdersJob.as_view(), name="submit_slot_orders_job"),
+    path('assignment-jobs/<int:job_id>', AssignmentJobDetail.as_view(), name="assignment_job"),
+    path('assignment-jobs/<int:job_id>/cancel', CancelAssignmentJob.as_view(), name="cancel_assignment_job"),
 ]
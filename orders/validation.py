@@ -0,0 +1,210 @@
+"""Fast validation of lists of flat, integer only payloads, eg : orders
+
+DRF validates `Serializer(data=..., many=True)` by running each item through a tree of field instances
+and their validators, which dominates the request time for large batches. `ListValidator` reads the
+fields of such a serializer once, as plain field checks, and runs them over a whole list a field at a
+time for the common case : every item a dict of in range ints. Lists it rejects are validated again item
+by item, with the same validated data and the same errors (messages and codes) as the serializer.
+"""
+
+import math
+import operator
+import re
+from collections.abc import Mapping
+
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.settings import api_settings
+
+# Same coercion as `IntegerField` : '1.0' is accepted as 1, but not '1.2'
+_DECIMAL_RE = re.compile(r'\.0*\s*$')
+
+
+class _IntegerRule:
+    """The checks of an `IntegerField`, with its error messages resolved"""
+
+    __slots__ = ('name', 'required', 'allow_null', 'min_value', 'max_value', 'messages')
+
+    def __init__(self, name, field):
+        self.name = name
+        self.required = field.required
+        self.allow_null = field.allow_null
+        self.min_value = field.min_value
+        self.max_value = field.max_value
+        self.messages = {
+            code: str(message).format(min_value=field.min_value, max_value=field.max_value)
+            for code, message in field.error_messages.items()
+            if code in ('required', 'null', 'invalid', 'max_string_length', 'min_value', 'max_value')
+        }
+
+    def error(self, code):
+        return [ErrorDetail(self.messages[code], code=code)]
+
+    def to_int(self, value):
+        """Returns the value as an int, or the error code if it is not one"""
+
+        if type(value) is int:
+            return value, None
+        if isinstance(value, str) and len(value) > serializers.IntegerField.MAX_STRING_LENGTH:
+            return None, 'max_string_length'
+        try:
+            return int(_DECIMAL_RE.sub('', str(value))), None
+        except (ValueError, TypeError):
+            return None, 'invalid'
+
+
+class ListValidator:
+    """Class that represents a single pass validator for `serializer_class(data=..., many=True)`
+
+    Only serializers made of writable `IntegerField`s are supported. Fields listed in `unique` must not
+    repeat a value across the items of a list; later repeats are reported on the repeating items
+    """
+
+    def __init__(self, serializer_class, unique=()):
+        self.rules = []
+        for name, field in serializer_class().fields.items():
+            if type(field) is not serializers.IntegerField or field.read_only or field.source != name:
+                raise TypeError(f"{serializer_class.__name__}.{name} is not a plain IntegerField")
+            self.rules.append(_IntegerRule(name, field))
+
+        self.unique = tuple(unique)
+        self._validate_fast = self._build_fast_validator()
+        self.item_messages = {
+            'invalid': str(serializers.Serializer.default_error_messages['invalid']),
+            'null': str(serializers.Field.default_error_messages['null']),
+            'not_a_list': str(serializers.ListSerializer.default_error_messages['not_a_list']),
+            'unique': "This value is already used by another item.",
+        }
+
+    def _build_fast_validator(self):
+        """Returns a function validating a list of dicts of in range ints : the list of validated items, or
+        None if an item is anything else (or repeats a unique value)
+        The list is checked a field at a time, over the column of its values, with builtins looping in C
+        """
+
+        names = tuple(rule.name for rule in self.rules)
+        # (name, lowest, highest, whether unique) per field, unbounded ends as infinities
+        checks = tuple(
+            (rule.name,
+             -math.inf if rule.min_value is None else rule.min_value,
+             math.inf if rule.max_value is None else rule.max_value,
+             rule.name in self.unique)
+            for rule in self.rules)
+
+        def validate_fast(data):
+            if not data:
+                return []
+            if set(map(type, data)) != {dict}:
+                return None
+
+            columns = []
+            for name, lowest, highest, unique in checks:
+                values = list(map(operator.methodcaller('get', name), data))
+                if set(map(type, values)) != {int} or min(values) < lowest or max(values) > highest:
+                    return None
+                if unique and len(set(values)) != len(values):
+                    return None
+                columns.append(values)
+
+            if set(map(len, data)) == {len(names)}:
+                # No other key than the fields'
+                return list(map(dict, data))
+
+            return [dict(zip(names, row)) for row in zip(*columns)]
+
+        return validate_fast
+
+    def validate_item(self, item):
+        """Validates an item, as `serializer_class(data=item)` would
+
+        :param item: parsed item
+        :return: (validated data, None) if the item is valid, else (None, errors)
+        :rtype: Tuple[Optional[dict], Optional[Union[dict, list]]]
+        """
+
+        if item is None:
+            return None, [ErrorDetail(self.item_messages['null'], code='null')]
+        if not isinstance(item, Mapping):
+            return None, {api_settings.NON_FIELD_ERRORS_KEY: [ErrorDetail(
+                self.item_messages['invalid'].format(datatype=type(item).__name__), code='invalid')]}
+
+        validated = {}
+        errors = None
+        for rule in self.rules:
+            value = item.get(rule.name, serializers.empty)
+
+            if value is serializers.empty:
+                if not rule.required:
+                    continue
+                code = 'required'
+            elif value is None:
+                if rule.allow_null:
+                    validated[rule.name] = None
+                    continue
+                code = 'null'
+            else:
+                value, code = rule.to_int(value)
+                if code is None:
+                    if rule.min_value is not None and value < rule.min_value:
+                        code = 'min_value'
+                    elif rule.max_value is not None and value > rule.max_value:
+                        code = 'max_value'
+
+            if code is None:
+                validated[rule.name] = value
+            else:
+                if errors is None:
+                    errors = {}
+                errors[rule.name] = rule.error(code)
+
+        if errors is not None:
+            return None, errors
+
+        return validated, None
+
+    def validate(self, data):
+        """Validates a list of items, as `serializer_class(data=data, many=True)` would
+
+        :param data: parsed request data
+        :raises ValidationError: raised with the same errors as the serializer, if any item is invalid
+        :return: validated items
+        :rtype: List[dict]
+        """
+
+        if not isinstance(data, list):
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                self.item_messages['not_a_list'].format(input_type=type(data).__name__)
+            ]}, code='not_a_list')
+
+        validated_items = self._validate_fast(data)
+        if validated_items is not None:
+            return validated_items
+
+        validated_items = []
+        errors = []
+        invalid = False
+        seen = {name: set() for name in self.unique}
+
+        for item in data:
+            validated, item_errors = self.validate_item(item)
+
+            if item_errors is None:
+                for name, values in seen.items():
+                    value = validated[name]
+                    if value in values:
+                        item_errors = item_errors or {}
+                        item_errors[name] = [ErrorDetail(self.item_messages['unique'], code='unique')]
+                    else:
+                        values.add(value)
+
+            if item_errors is None:
+                validated_items.append(validated)
+                errors.append({})
+            else:
+                invalid = True
+                errors.append(item_errors)
+
+        if invalid:
+            raise serializers.ValidationError(errors)
+
+        return validated_items
@@ -1,11 +1,36 @@
-from django.shortcuts import render
+import json
+from django.db import transaction
+from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework import exceptions
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from .models import SlotDelivery
-from .serializers import DeliveryVehicleOrdersSerializer
+from rest_framework import status
+from . import instrumentation, jobs, packing, profiling
+from .models import AssignmentJob, IdempotentResponse, Order, SlotDelivery
+from .serializers import (ASSIGNMENT_ERROR_MESSAGES, AddedOrdersSerializer, AssignmentJobSerializer,
+                          DeliveryVehicleOrdersSerializer, QuoteSerializer, RepairSerializer,
+                          StreamAssignmentSerializer)
+from .validation import ListValidator
+
+
+class IdempotencyKeyReused(exceptions.APIException):
+    """Responded if an `Idempotency-Key` is sent again with another payload
+    """
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Idempotency-Key already used for another request"
+    default_code = 'idempotency_key_reused'
+
+
+class AmbiguousOrder(exceptions.APIException):
+    """Responded if several orders of the delivery have the id of the order to cancel
+    """
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Several orders with this id in the delivery"
+    default_code = 'ambiguous_order'
 
 
 class AssignSlotOrders(APIView):
@@ -14,11 +39,110 @@ class AssignSlotOrders(APIView):
 
     class InputSerializer(serializers.Serializer):
 
-        order_id = serializers.IntegerField(allow_null=False)
-        order_weight = serializers.IntegerField(allow_null=False)
+        # Negative order ids, and weights below 1 kg, are refused (they were accepted before the bounds)
+        order_id = serializers.IntegerField(allow_null=False, min_value=0)
+        order_weight = serializers.IntegerField(allow_null=False, min_value=1)
+
+    # Validates a list of orders as `InputSerializer(many=True)` would, in a single pass; order ids are unique
+    orders_validator = ListValidator(InputSerializer, unique=('order_id',))
+
+    class QuerySerializer(serializers.Serializer):
+
+        strategy = serializers.ChoiceField(choices=sorted(packing.STRATEGIES), required=False)
+        time_budget_ms = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+
+    ERROR_MESSAGES = ASSIGNMENT_ERROR_MESSAGES
+
+    def dispatch(self, request, *args, **kwargs):
+        """Records the request's phases, if `ORDERS_INSTRUMENTATION` is on (see `orders.instrumentation`), and
+        profiles the request if it asks to, with a `Profile` header (see `orders.profiling`)
+        """
+
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return self.instrumented_dispatch(request, *args, **kwargs)
+
+        with profiling.profile(mode, type(self).__name__) as written:
+            response = self.instrumented_dispatch(request, *args, **kwargs)
+        response['Profile-File'] = written[0]
+
+        return response
+
+    def instrumented_dispatch(self, request, *args, **kwargs):
+        with instrumentation.record(type(self).__name__) as recorder:
+            response = super().dispatch(request, *args, **kwargs)
+            if recorder is not None:
+                recorder.finish(response)
+
+        return response
+
+    def get_validated_request(self, request):
+        """Validates the request's orders and packing options
+
+        :param request: DRF request object
+        :raises ValidationError: raised if the orders or query parameters are invalid
+        :return: orders, and the packing strategy and time budget (in seconds) to use
+        :rtype: Tuple[List[dict], Optional[str], Optional[float]]
+        """
+
+        with instrumentation.phase('validation'):
+            orders = self.orders_validator.validate(request.data)
+
+            return (orders,) + self.get_packing_options(request)
+
+    def get_packing_options(self, request):
+        """Validates the request's packing options
+
+        :param request: DRF request object
+        :raises ValidationError: raised if the query parameters are invalid
+        :return: the packing strategy and time budget (in seconds) to use
+        :rtype: Tuple[Optional[str], Optional[float]]
+        """
+
+        query_serializer = self.QuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        time_budget_ms = query_serializer.validated_data.get('time_budget_ms')
+
+        return query_serializer.validated_data.get('strategy'), time_budget_ms / 1000 if time_budget_ms else None
+
+    @staticmethod
+    def lookup(key, request_hash):
+        """Returns the response recorded for the request, if any (see `IdempotentResponse.lookup`)
+
+        :raises IdempotencyKeyReused: raised if the response recorded for the key is that of another payload
+        :rtype: Optional[Tuple[int, Any, Dict[str, str]]]
+        """
+
+        try:
+            return IdempotentResponse.lookup(key, request_hash)
+        except IdempotentResponse.KeyReused:
+            raise IdempotencyKeyReused
+
+    @staticmethod
+    def replay(recorded):
+        """Returns a recorded response, flagged with an `Idempotent-Replayed` header
+
+        :param recorded: (status code, response data, response headers), as returned by `IdempotentResponse.lookup`
+        :type recorded: Tuple[int, Any, Dict[str, str]]
+        :return: JSON response
+        """
+
+        status_code, data, headers = recorded
+
+        return Response(data, status=status_code, headers={**headers, 'Idempotent-Replayed': 'true'})
 
     def post(self, request, slot_number, *args, **kwargs):
         """View to post a new Orders Delivery request
+        The packing strategy and its time budget may be picked with the `strategy` and
+        `time_budget_ms` query parameters.
+
+        The `Slot-Delivery-Id` response header identifies the delivery, eg : to add orders to it later
+        (see `AddSlotDeliveryOrders`).
+
+        Requests are idempotent : repeats of an assigned request (same `Idempotency-Key` header, or without
+        one, same slot number, orders and options) get the recorded response back, without assigning
+        anything, for `ORDERS_IDEMPOTENCY_TTL` seconds. An `Idempotency-Key` sent again with other orders or
+        options is refused, with a 422
 
         :param request: Django request object
         :param slot_number: slot number
@@ -26,20 +150,297 @@ class AssignSlotOrders(APIView):
         :return: JSON response
         """
 
-        serializer = self.InputSerializer(data=request.data, many=True)
-        serializer.is_valid(raise_exception=True)
+        orders, strategy, time_budget = self.get_validated_request(request)
+
+        request_hash = IdempotentResponse.hash_request(slot_number, orders, options=(strategy, time_budget))
+        key = IdempotentResponse.request_key(slot_number, orders, options=(strategy, time_budget),
+                                             idempotency_key=request.headers.get('Idempotency-Key'))
+        with instrumentation.phase('idempotency'):
+            recorded = self.lookup(key, request_hash)
+        if recorded is not None:
+            return self.replay(recorded)
+
+        try:
+            with transaction.atomic():
+                assigned_delivery_vehicle_orders = SlotDelivery.assign_new_batch_order_delivery(
+                    slot_number=slot_number, orders=orders, strategy=strategy, time_budget=time_budget)
+
+                with instrumentation.phase('serialization'):
+                    serialized_response = DeliveryVehicleOrdersSerializer(
+                        assigned_delivery_vehicle_orders, many=True)
+                    headers = {}
+                    if assigned_delivery_vehicle_orders:
+                        headers['Slot-Delivery-Id'] = str(assigned_delivery_vehicle_orders[0].slot_delivery_id)
+                    data = serialized_response.data
+                with instrumentation.phase('idempotency'):
+                    IdempotentResponse.record(key, status.HTTP_200_OK, data, headers=headers,
+                                              request_hash=request_hash)
+        except tuple(self.ERROR_MESSAGES) as error:
+            raise exceptions.ParseError(self.ERROR_MESSAGES[type(error)])
+        except IdempotentResponse.AlreadyRecorded:
+            # A concurrent repeat was assigned first; this assignment is rolled back
+            return self.replay(self.lookup(key, request_hash))
+
+        return Response(data, headers=headers)
+
+
+class QuoteSlotOrders(AssignSlotOrders):
+    """Read only counterpart of `AssignSlotOrders` : same validation and packing, nothing is written
+    """
+
+    def post(self, request, slot_number, *args, **kwargs):
+        """View to quote the delivery vehicles an Orders Delivery request would use
+
+        :param request: Django request object
+        :param slot_number: slot number
+        :type slot_number: int
+        :return: JSON response
+        """
+
+        orders, strategy, time_budget = self.get_validated_request(request)
 
         try:
-            assigned_delivery_vehicle_orders = SlotDelivery.assign_new_batch_order_delivery(
-                slot_number=slot_number, orders=serializer.validated_data)
-        except SlotDelivery.OrdersWeightLimitError:
-            raise exceptions.ParseError("Order weights exceeds limit (100 kgs)")
-        except SlotDelivery.InvalidSlotNumber:
-            raise exceptions.ParseError("Invalid Slot number provided")
-        except SlotDelivery.CannotAssignOrders:
-            raise exceptions.ParseError("Unable to assign to the available delivery vehicles")
-
-        serialized_response = DeliveryVehicleOrdersSerializer(
-            assigned_delivery_vehicle_orders, many=True)
-
-        return Response(serialized_response.data)
+            quote = SlotDelivery.quote_new_batch_order_delivery(
+                slot_number=slot_number, orders=orders, strategy=strategy, time_budget=time_budget)
+        except tuple(self.ERROR_MESSAGES) as error:
+            raise exceptions.ParseError(self.ERROR_MESSAGES[type(error)])
+
+        with instrumentation.phase('serialization'):
+            data = QuoteSerializer(quote).data
+
+        return Response(data)
+
+
+class AssignSlotsOrders(AssignSlotOrders):
+    """Bulk counterpart of `AssignSlotOrders` : assigns the orders of several slots in one request
+    The body maps slot numbers to their orders, eg : {"1": [...], "3": [...]}
+    """
+
+    def get_validated_request(self, request):
+        """Validates the orders of every slot, in one pass
+
+        :param request: DRF request object
+        :raises ValidationError: raised if the orders (of any slot) or query parameters are invalid
+        :return: orders by slot number, and the packing strategy and time budget (in seconds) to use
+        :rtype: Tuple[Dict[int, List[dict]], Optional[str], Optional[float]]
+        """
+
+        slot_orders = serializers.DictField(allow_empty=False).run_validation(request.data)
+
+        validated_slot_orders, errors = {}, {}
+        for key, orders in slot_orders.items():
+            if not key.isdigit():
+                errors[key] = ["A valid slot number is required."]
+                continue
+            try:
+                validated_slot_orders[int(key)] = self.orders_validator.validate(orders)
+            except exceptions.ValidationError as error:
+                errors[key] = error.detail
+
+        if errors:
+            raise exceptions.ValidationError(errors)
+
+        return (validated_slot_orders,) + self.get_packing_options(request)
+
+    def post(self, request, *args, **kwargs):
+        """View to post the Orders Delivery requests of several slots
+        Responds with, per slot number, its assigned vehicles or the error that prevented assigning its orders
+
+        :param request: Django request object
+        :return: JSON response
+        """
+
+        slot_orders, strategy, time_budget = self.get_validated_request(request)
+
+        results = SlotDelivery.assign_batch_order_deliveries(
+            slot_orders, strategy=strategy, time_budget=time_budget)
+
+        response_data = {}
+        for slot_number, result in results.items():
+            if isinstance(result, Exception):
+                response_data[slot_number] = {'detail': self.ERROR_MESSAGES[type(result)]}
+            else:
+                response_data[slot_number] = DeliveryVehicleOrdersSerializer(result, many=True).data
+
+        return Response(response_data)
+
+
+class StreamSlotOrders(AssignSlotOrders):
+    """Streaming counterpart of `AssignSlotOrders`, for batches of any size
+    The body is newline delimited JSON, one order per line; orders are validated and assigned as they are
+    read, without loading the whole body (see `SlotDelivery.assign_order_stream`)
+    """
+
+    ERROR_MESSAGES = {
+        **ASSIGNMENT_ERROR_MESSAGES,
+        SlotDelivery.OrdersWeightLimitError: "Order weights exceeds the slot's fleet capacity",
+    }
+
+    def read_orders(self, stream):
+        """Yields the orders of a newline delimited JSON stream, validated one line at a time
+        Order ids are not checked for duplicates, which would take memory growing with the stream
+
+        :param stream: request body, as a file like object
+        :raises ValidationError: raised on the first invalid line, along with its line number
+        :rtype: Iterator[dict]
+        """
+
+        for line_number, line in enumerate(stream or (), 1):
+            if not line.strip():
+                continue
+
+            try:
+                order = json.loads(line)
+            except ValueError:
+                raise exceptions.ValidationError({'line': line_number, 'errors': ["Invalid JSON."]})
+
+            order, errors = self.orders_validator.validate_item(order)
+            if errors:
+                raise exceptions.ValidationError({'line': line_number, 'errors': errors})
+
+            yield order
+
+    def post(self, request, slot_number, *args, **kwargs):
+        """View to post a new Orders Delivery request as newline delimited JSON
+        Responds with a summary of the vehicles used : their orders count and load
+
+        :param request: Django request object
+        :param slot_number: slot number
+        :type slot_number: int
+        :return: JSON response
+        """
+
+        try:
+            assignment = SlotDelivery.assign_order_stream(slot_number, self.read_orders(request.stream))
+        except tuple(self.ERROR_MESSAGES) as error:
+            raise exceptions.ParseError(self.ERROR_MESSAGES[type(error)])
+
+        return Response(StreamAssignmentSerializer(assignment).data)
+
+
+class AddSlotDeliveryOrders(AssignSlotOrders):
+    """Incremental counterpart of `AssignSlotOrders` : adds orders to a delivery assigned earlier today
+    Orders go into the room left in the delivery's vehicles, and vehicles are opened only when needed
+    (see `SlotDelivery.add_orders`)
+    """
+
+    ALREADY_ADDED_MESSAGE = "The delivery already has an order with this id."
+
+    def post(self, request, slot_delivery_id, *args, **kwargs):
+        """View to add orders to an open delivery
+        Responds with the vehicles the orders went into, and the capacity they have left. Order ids repeated in
+        the request, or already in the delivery, are reported on their items as `InputSerializer` errors
+
+        :param request: Django request object
+        :param slot_delivery_id: `SlotDelivery` id
+        :type slot_delivery_id: int
+        :return: JSON response
+        """
+
+        orders = self.orders_validator.validate(request.data)
+
+        try:
+            added_orders = SlotDelivery.add_orders(slot_delivery_id, orders)
+        except SlotDelivery.DeliveryNotOpen:
+            raise exceptions.NotFound(detail="No delivery with this id was assigned today")
+        except SlotDelivery.OrdersAlreadyAdded as error:
+            raise exceptions.ValidationError([
+                {'order_id': [self.ALREADY_ADDED_MESSAGE]} if order['order_id'] in error.order_ids else {}
+                for order in orders
+            ], code='unique')
+        except tuple(self.ERROR_MESSAGES) as error:
+            raise exceptions.ParseError(self.ERROR_MESSAGES[type(error)])
+
+        return Response(AddedOrdersSerializer(added_orders, many=True).data)
+
+
+class CancelSlotDeliveryOrder(APIView):
+
+    permission_classes = (AllowAny,)
+
+    def post(self, request, slot_delivery_id, order_id, *args, **kwargs):
+        """View to cancel an order of a delivery assigned earlier today
+        The delivery is repaired locally (see `SlotDelivery.cancel_order`); responds with the changes made :
+        orders moved, vehicles released and remaining capacities updated
+
+        :param request: Django request object
+        :param slot_delivery_id: `SlotDelivery` id
+        :type slot_delivery_id: int
+        :param order_id: order id
+        :type order_id: int
+        :return: JSON response
+        """
+
+        try:
+            repair = SlotDelivery.cancel_order(slot_delivery_id, order_id)
+        except SlotDelivery.DeliveryNotOpen:
+            raise exceptions.NotFound(detail="No delivery with this id was assigned today")
+        except Order.DoesNotExist:
+            raise exceptions.NotFound(detail="No order with this id in the delivery")
+        except SlotDelivery.AmbiguousOrder:
+            raise AmbiguousOrder()
+
+        return Response(RepairSerializer(repair).data)
+
+
+class SubmitSlotOrdersJob(AssignSlotOrders):
+    """Background counterpart of `AssignSlotOrders` : the orders are assigned by a job (see `orders.jobs`)
+    """
+
+    def post(self, request, slot_number, *args, **kwargs):
+        """View to submit a new Orders Delivery request as a job
+        Responds right away with the job, whose status and result are then read from `AssignmentJobDetail`
+
+        :param request: Django request object
+        :param slot_number: slot number
+        :type slot_number: int
+        :return: JSON response
+        """
+
+        orders, strategy, time_budget = self.get_validated_request(request)
+
+        try:
+            job = jobs.submit(slot_number, orders, strategy=strategy, time_budget=time_budget)
+        except jobs.QueueFull:
+            raise exceptions.Throttled(detail="Too many assignment jobs queued")
+
+        return Response(AssignmentJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class AssignmentJobDetail(APIView):
+
+    permission_classes = (AllowAny,)
+
+    def get(self, request, job_id, *args, **kwargs):
+        """View to get an assignment job's status, timings and, once finished, result
+
+        :param request: Django request object
+        :param job_id: job id
+        :type job_id: int
+        :return: JSON response
+        """
+
+        job = get_object_or_404(AssignmentJob, id=job_id)
+
+        return Response(AssignmentJobSerializer(job).data)
+
+
+class CancelAssignmentJob(APIView):
+
+    permission_classes = (AllowAny,)
+
+    def post(self, request, job_id, *args, **kwargs):
+        """View to cancel an assignment job
+        A pending job is cancelled right away; a running one ends `cancelled` without persisting its assignment.
+        Finished jobs are left as they are
+
+        :param request: Django request object
+        :param job_id: job id
+        :type job_id: int
+        :return: JSON response
+        """
+
+        if AssignmentJob.cancel(job_id) is None:
+            raise exceptions.NotFound
+
+        return Response(AssignmentJobSerializer(AssignmentJob.objects.get(id=job_id)).data)